@@ -0,0 +1,164 @@
+"""
+Per-message overhead of MessageRouter on a synthetic firehose.
+
+Compares the router with the previous setup, where discord.py scheduled a
+task for every ``on_message`` listener (the bot's command handler and the
+Ai cog) and each listener did its own checks. Messages are plain
+namespaces carrying the attributes the router reads, so no gateway
+connection is needed.
+
+Usage: python benchmarks/message_router.py [--rate 1000] [--seconds 5] [--rounds 5]
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+import os
+import random
+import statistics
+import sys
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "bot"))
+
+from utils.router import MessageRouter  # noqa: E402
+
+BOT_ID = 1
+PREFIX = "?"
+
+
+def make_messages(count: int, *, mention_rate: float, prefix_rate: float) -> list:
+    me = SimpleNamespace(id=BOT_ID)
+    guild = SimpleNamespace(id=1020830000104099860)
+    messages = []
+    for i in range(count):
+        roll = random.random()
+        author = SimpleNamespace(id=random.randint(2, 5000), bot=random.random() < 0.05)
+        mentions = [me] if roll < mention_rate else []
+        content = (
+            f"{PREFIX}ping"
+            if mention_rate <= roll < mention_rate + prefix_rate
+            else f"hello {i}"
+        )
+        messages.append(
+            SimpleNamespace(
+                author=author,
+                mentions=mentions,
+                mention_everyone=False,
+                content=content,
+                guild=guild,
+            )
+        )
+    return messages
+
+
+class Counter:
+    def __init__(self) -> None:
+        self.calls = 0
+
+    async def __call__(self, message) -> None:
+        self.calls += 1
+
+
+def legacy_listeners(commands: Counter, mentions: Counter) -> list:
+    async def on_message(message) -> None:
+        # Bot.on_message -> process_commands -> get_context prefix check.
+        if message.author.bot:
+            return
+        if message.content.startswith(PREFIX):
+            await commands(message)
+
+    async def ai_on_message(message) -> None:
+        if message.author.id == BOT_ID or message.mention_everyone:
+            return
+        if any(user.id == BOT_ID for user in message.mentions):
+            await mentions(message)
+
+    return [on_message, ai_on_message]
+
+
+def routed_listeners(commands: Counter, mentions: Counter) -> list:
+    router = MessageRouter(logging.getLogger("bench"), PREFIX)
+    router.user_id = BOT_ID
+    router.register(commands, has_prefix=True)
+    router.register(mentions, mentions_me=True)
+    return [router.dispatch]
+
+
+async def firehose(listeners: list, messages: list, rate: float) -> tuple[float, float]:
+    """
+    Feeds ``messages`` at ``rate`` per second (as fast as possible if 0),
+    scheduling one task per listener per message the way discord.py does.
+    Returns wall and CPU seconds.
+    """
+    loop = asyncio.get_running_loop()
+    pending: set[asyncio.Task] = set()
+    wall, cpu = time.perf_counter(), time.process_time()
+    start = loop.time()
+    for i, message in enumerate(messages):
+        for listener in listeners:
+            task = asyncio.create_task(listener(message))
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+        if rate:
+            delay = start + (i + 1) / rate - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        elif i % 100 == 0:
+            await asyncio.sleep(0)
+    await asyncio.gather(*pending)
+    return time.perf_counter() - wall, time.process_time() - cpu
+
+
+def positive(value: str) -> float:
+    number = float(value)
+    if number <= 0:
+        raise argparse.ArgumentTypeError(f"must be greater than 0, got {value}")
+    return number
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rate", type=positive, default=1000.0)
+    parser.add_argument("--seconds", type=positive, default=5.0)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--mention-rate", type=float, default=0.01)
+    parser.add_argument("--prefix-rate", type=float, default=0.05)
+    args = parser.parse_args()
+
+    count = max(1, int(args.rate * args.seconds))
+    messages = make_messages(
+        count, mention_rate=args.mention_rate, prefix_rate=args.prefix_rate
+    )
+    print(
+        f"{count} messages, {args.mention_rate:.0%} mentions, "
+        f"{args.prefix_rate:.0%} commands, median of {args.rounds} rounds"
+    )
+    setups = {"legacy": legacy_listeners, "router": routed_listeners}
+    burst: dict[str, list[float]] = {name: [] for name in setups}
+    for name, build in setups.items():
+        # Warm up caches and the allocator before anything is measured.
+        await firehose(build(Counter(), Counter()), messages, 0)
+    # Alternate the setups so drift on the machine hits both alike.
+    for _ in range(args.rounds):
+        for name, build in setups.items():
+            wall, _ = await firehose(build(Counter(), Counter()), messages, 0)
+            burst[name].append(wall / count * 1e6)
+    for name, build in setups.items():
+        commands, mentions = Counter(), Counter()
+        paced_wall, paced_cpu = await firehose(
+            build(commands, mentions), messages, args.rate
+        )
+        print(
+            f"{name:>6}: {statistics.median(burst[name]):6.2f} us/msg unpaced "
+            f"(min {min(burst[name]):.2f}), "
+            f"{paced_cpu / paced_wall:6.1%} CPU at {args.rate:.0f} msg/s "
+            f"({commands.calls} commands, {mentions.calls} mentions)"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
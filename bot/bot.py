@@ -1,22 +1,33 @@
+import asyncio
 import datetime
 import logging
 import os
 import random
+import signal
 import time
-from typing import Union
+from typing import Any, Optional, Union
 
 import discord
 import psutil
-from aiohttp import ClientSession, ClientTimeout
+from aiohttp import ClientSession, ClientTimeout, TCPConnector
+from cluster import ClusterSupervisor
 from cogs import EXTENSIONS
 from discord.ext import tasks
-from discord.ext.commands import Bot
+from discord.ext.commands import AutoShardedBot
 from dotenv import load_dotenv
-from models.db import Base
+from models.db import DatabaseConfig
+from models.migrations import run_migrations
+from models.repositories import Repositories
 from sqlalchemy import URL
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import AsyncEngine
 from utils.consts import activities
+from utils.context import Context
+from utils.http_cache import HTTPCache
+from utils.http_client import HTTPClient
+from utils.intents import member_cache_policy, message_cache_size, plan_intents
+from utils.ipc import ClusterClient
+from utils.router import MessageRouter
+from utils.tag_counter import TagCallCounter
 
 load_dotenv()
 
@@ -24,18 +35,38 @@ logging.basicConfig(level=logging.INFO)
 log = logging.getLogger("Discord")
 
 
-class Konikotaka(Bot):
+class Konikotaka(AutoShardedBot):
     bot_app_info: discord.AppInfo
 
-    def __init__(self, *args, **options) -> None:
+    def __init__(
+        self,
+        *args,
+        cluster_id: Optional[int] = None,
+        ipc_port: Optional[int] = None,
+        ipc_secret: Optional[str] = None,
+        **options,
+    ) -> None:
         super().__init__(*args, **options)
+        self.cluster_id: Optional[int] = cluster_id
+        self.ipc: Optional[ClusterClient] = None
+        if cluster_id is not None and ipc_port is not None:
+            self.ipc = ClusterClient(
+                ipc_port,
+                ipc_secret,
+                cluster_id,
+                {"stats": self.cluster_stats},
+                log,
+            )
         self.log = log
         self.session = None
         self.pid = os.getpid()
+        self.startup_memory: int = self.memory_usage
         self.start_time = time.time()
         self.main_guild: int = 1020830000104099860
         self.general_channel: int = 1145087802141315093
         self.version: str = "1.0.6"
+        self.router: MessageRouter = MessageRouter(self.log, self.command_prefix)
+        self.router.register(self.process_commands, has_prefix=True)
         self.db_url: URL = URL.create(
             drivername="postgresql+asyncpg",
             username=os.getenv("PGUSER"),
@@ -44,31 +75,119 @@ class Konikotaka(Bot):
             port=os.getenv("PGPORT"),
             database=os.getenv("POSTGRES_DB"),
         )
-        self.engine: create_async_engine = create_async_engine(
-            self.db_url,
-            echo=False,
-            future=True,
-            connect_args={"server_settings": {"application_name": "Konikotaka"}},
+        self.db_config: DatabaseConfig = DatabaseConfig.from_env()
+        self.engine: AsyncEngine = self.db_config.create_engine(
+            self.db_url, "Konikotaka"
         )
+        self.repositories: Repositories = Repositories.from_engine(self.engine)
 
     async def start(self, *args, **kwargs) -> None:
-        self.session: ClientSession = ClientSession(timeout=ClientTimeout(total=30))
-        self.async_session: sessionmaker = sessionmaker(
-            self.engine, expire_on_commit=False, class_=AsyncSession
+        self.session: ClientSession = ClientSession(
+            timeout=ClientTimeout(total=30),
+            connector=TCPConnector(limit=100, limit_per_host=10),
         )
+        self.http_client: HTTPClient = HTTPClient(self.session, self.log)
+        self.http_cache: HTTPCache = HTTPCache(self.http_client)
+        self.tag_counter: TagCallCounter = TagCallCounter(
+            self.repositories.tags, self.log
+        )
+        self.tag_counter.start()
+        if self.ipc is not None:
+            self.ipc.start()
         await super().start(*args, **kwargs)
 
     async def close(self) -> None:
+        # Unload cogs first so their pending writes flush before the pool goes away.
+        await super().close()
         await self.session.close()
+        await self.tag_counter.close()
         await self.engine.dispose()
-        await super().close()
+        if self.ipc is not None:
+            await self.ipc.close()
 
     async def on_ready(self) -> None:
-        self.log.info(f"Ready: {self.user} ID: {self.user.id}")
+        self.log.info(f"{self.user.name} has connected to Discord!")
+        if not self.change_activity.is_running():
+            self.change_activity.start()
+        await self.chunk_main_guild()
+
+    @tasks.loop(minutes=30)
+    async def change_activity(self) -> None:
+        await self.change_presence(
+            activity=discord.Game(name=random.choice(activities))
+        )
+
+    async def init_database(self) -> None:
+        try:
+            applied = await run_migrations(self.engine, self.log)
+        except Exception as exc:
+            # Cogs rely on the schema; better to not start than run half-migrated.
+            self.log.critical(f"Could not migrate the database: {exc}")
+            raise
+        self.log.info(f"Database initialized! Applied {applied} migration(s).")
+
+    async def cluster_stats(self) -> dict[str, Any]:
+        """
+        Returns this process's share of the bot: its shards, guilds and
+        resource usage.
+        """
+        return {
+            "cluster": self.cluster_id or 0,
+            "shards": sorted(self.shards),
+            "guilds": len(self.guilds),
+            "users": sum(guild.member_count or 0 for guild in self.guilds),
+            "latency": self.get_bot_latency,
+            "uptime": int(time.time() - self.start_time),
+            "memory": self.memory_usage,
+        }
+
+    async def gather_cluster_stats(self) -> list[dict[str, Any]]:
+        """
+        Returns ``cluster_stats`` of every cluster, or just this one when it
+        is not running under a cluster supervisor.
+        """
+        if self.ipc is not None:
+            try:
+                return await self.ipc.query("stats")
+            except (ConnectionError, asyncio.TimeoutError) as exc:
+                self.log.warning(f"Could not gather cluster stats: {exc!r}")
+        return [await self.cluster_stats()]
+
+    async def on_message(self, message: discord.Message) -> None:
+        await self.router.dispatch(message)
+
+    async def get_context(
+        self,
+        origin: Union[discord.Message, discord.Interaction],
+        /,
+        *,
+        cls: type[Context] = Context,
+    ) -> Context:
+        return await super().get_context(origin, cls=cls)
+
+    async def chunk_main_guild(self) -> None:
+        """
+        Fetches the main guild's member list when guilds are not chunked at
+        startup, and logs resident memory before and after.
+        """
+        ready_memory = self.memory_usage
+        guild = self.get_guild(self.main_guild)
+        if guild is None or guild.chunked or not self.intents.members:
+            return
+        if os.getenv("MEMBER_CACHE", "main") == "none":
+            return
+        await guild.chunk()
+        self.log.info(
+            f"Resident memory: {self.startup_memory}MB at startup, "
+            f"{ready_memory}MB when ready, {self.memory_usage}MB after "
+            f"caching {guild.member_count} members of {guild}"
+        )
 
     async def setup_hook(self) -> None:
         self.bot_app_info = await self.application_info()
         self.owner_id = self.bot_app_info.owner.id
+        self.router.user_id = self.user.id
+        await self.init_database()
         for cog in EXTENSIONS:
             try:
                 await self.load_extension(cog)
@@ -115,36 +234,86 @@ class Konikotaka(Bot):
         return f"[{short}]({url})"
 
 
-client: Konikotaka = Konikotaka(
-    command_prefix=os.getenv("PREFIX", "?"),
-    intents=discord.Intents.all(),
-    max_messages=10000,
-    description=str(
-        "Hello! I am Konikotaka, a Discord bot written in Python. I am a general purpose bot with a variety of commands."
-    ),
-    allowed_mentions=discord.AllowedMentions(roles=False, everyone=False, users=True),
-)
+def create_client(
+    *,
+    cluster_id: Optional[int] = None,
+    shard_ids: Optional[list[int]] = None,
+    shard_count: Optional[int] = None,
+    ipc_port: Optional[int] = None,
+    ipc_secret: Optional[str] = None,
+) -> Konikotaka:
+    intents = plan_intents(EXTENSIONS, log)
+    member_cache_flags, chunk_guilds_at_startup = member_cache_policy(intents)
+    return Konikotaka(
+        command_prefix=os.getenv("PREFIX", "?"),
+        intents=intents,
+        max_messages=message_cache_size(),
+        member_cache_flags=member_cache_flags,
+        chunk_guilds_at_startup=chunk_guilds_at_startup,
+        description=str(
+            "Hello! I am Konikotaka, a Discord bot written in Python. I am a general purpose bot with a variety of commands."
+        ),
+        allowed_mentions=discord.AllowedMentions(
+            roles=False, everyone=False, users=True
+        ),
+        shard_ids=shard_ids,
+        shard_count=shard_count,
+        cluster_id=cluster_id,
+        ipc_port=ipc_port,
+        ipc_secret=ipc_secret,
+    )
 
 
-@tasks.loop(minutes=30)
-async def change_activity() -> None:
-    await client.change_presence(activity=discord.Game(name=random.choice(activities)))
+def run_cluster(**options: Any) -> None:
+    """
+    Runs one bot process. Called directly in single process mode and as the
+    entry point of every cluster process.
+    """
+    client = create_client(**options)
+    asyncio.run(serve(client, os.environ["DISCORD_TOKEN"]))
+    client.log.info("Disconnected from Discord!")
 
 
-@tasks.loop(count=1)
-async def init_database() -> None:
-    async with client.engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
-        client.log.info("Database initialized!")
-        await conn.close()
+async def serve(client: Konikotaka, token: str) -> None:
+    """
+    Runs ``client`` until it disconnects or the process receives SIGTERM or
+    SIGINT, then closes it and waits for the close to finish, so pending
+    tag counters and member changes are written before the process exits.
+    """
+    loop = asyncio.get_running_loop()
+    stop = asyncio.Event()
+    signals = (signal.SIGINT, signal.SIGTERM)
+    for sig in signals:
+        loop.add_signal_handler(sig, stop.set)
+    try:
+        async with client:
+            runner = asyncio.create_task(client.start(token, reconnect=True))
+            stopper = asyncio.create_task(stop.wait())
+            await asyncio.wait({runner, stopper}, return_when=asyncio.FIRST_COMPLETED)
+            stopper.cancel()
+            await client.close()
+            await runner
+    finally:
+        for sig in signals:
+            loop.remove_signal_handler(sig)
 
 
-@client.event
-async def on_ready() -> None:
-    client.log.info(f"{client.user.name} has connected to Discord!")
-    change_activity.start()
-    init_database.start()
+def main() -> None:
+    clusters = int(os.getenv("CLUSTERS", 1))
+    if clusters <= 1:
+        run_cluster()
+        return
+    shard_count = os.getenv("SHARD_COUNT")
+    supervisor = ClusterSupervisor(
+        run_cluster,
+        clusters,
+        os.environ["DISCORD_TOKEN"],
+        log,
+        shard_count=int(shard_count) if shard_count else None,
+        ipc_port=int(os.getenv("IPC_PORT", 0)),
+    )
+    asyncio.run(supervisor.run())
 
 
-client.run(token=os.environ["DISCORD_TOKEN"], reconnect=True, log_handler=None)
-client.log.info(f"{client.user.name} has disconnected from Discord!")
+if __name__ == "__main__":
+    main()
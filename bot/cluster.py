@@ -0,0 +1,301 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import multiprocessing
+import secrets
+import signal
+import time
+from dataclasses import dataclass, field
+from itertools import count
+from logging import Logger
+from multiprocessing.process import BaseProcess
+from typing import Any, Callable, Optional
+
+from aiohttp import ClientSession
+from utils.ipc import send
+
+ClusterTarget = Callable[..., None]
+
+
+def split_shards(shard_count: int, clusters: int) -> list[list[int]]:
+    """
+    Splits ``range(shard_count)`` into ``clusters`` contiguous, nearly equal
+    runs of shard ids.
+    """
+    clusters = max(1, min(clusters, shard_count))
+    size, extra = divmod(shard_count, clusters)
+    runs, start = [], 0
+    for index in range(clusters):
+        end = start + size + (index < extra)
+        runs.append(list(range(start, end)))
+        start = end
+    return runs
+
+
+async def recommended_shards(token: str) -> int:
+    async with ClientSession() as session:
+        async with session.get(
+            "https://discord.com/api/v10/gateway/bot",
+            headers={"Authorization": f"Bot {token}"},
+            raise_for_status=True,
+        ) as response:
+            data = await response.json()
+    return data["shards"]
+
+
+@dataclass
+class Cluster:
+    """
+    Bookkeeping for one worker process.
+
+    Attributes:
+    - id: int
+        The cluster id, also its index in the supervisor's list
+    - shard_ids: list
+        The shards this cluster connects
+    - process: BaseProcess | None
+        The current worker process, replaced on every restart
+    - started_at: float
+        Monotonic time the current process was started
+    - restarts: int
+        Consecutive quick crashes, drives the restart backoff
+    - restart_at: float
+        Monotonic time at which a crashed cluster is started again
+    - writer: StreamWriter | None
+        The cluster's IPC connection, once it identified itself
+    """
+
+    id: int
+    shard_ids: list[int]
+    process: Optional[BaseProcess] = None
+    started_at: float = 0.0
+    restarts: int = 0
+    restart_at: float = 0.0
+    writer: Optional[asyncio.StreamWriter] = field(default=None, repr=False)
+
+
+class PendingQuery:
+    """
+    Answers to one relayed query, complete once every targeted cluster
+    answered.
+    """
+
+    def __init__(self, expected: int) -> None:
+        self.expected: int = expected
+        self.responses: dict[int, Any] = {}
+        self.done: asyncio.Future = asyncio.get_running_loop().create_future()
+        if expected == 0:
+            self.done.set_result(None)
+
+    def add(self, cluster_id: int, data: Any) -> None:
+        self.responses[cluster_id] = data
+        if len(self.responses) >= self.expected and not self.done.done():
+            self.done.set_result(None)
+
+
+class ClusterSupervisor:
+    """
+    Runs the bot as several processes, each an ``AutoShardedBot`` owning a
+    contiguous run of shards with its own event loop, HTTP session and
+    database pool.
+
+    The supervisor itself stays small: it starts the clusters, restarts any
+    that exit with exponential backoff (reset once a cluster stayed up for
+    ``stable_after`` seconds), and relays IPC queries between them over a
+    localhost socket.
+    """
+
+    def __init__(
+        self,
+        target: ClusterTarget,
+        clusters: int,
+        token: str,
+        log: Logger,
+        *,
+        shard_count: Optional[int] = None,
+        ipc_port: int = 0,
+        stable_after: float = 600.0,
+        max_backoff: float = 300.0,
+        query_timeout: float = 3.0,
+    ) -> None:
+        self.target: ClusterTarget = target
+        self.cluster_count: int = clusters
+        self.token: str = token
+        self.log: Logger = log
+        self.shard_count: Optional[int] = shard_count
+        self.ipc_port: int = ipc_port
+        self.stable_after: float = stable_after
+        self.max_backoff: float = max_backoff
+        self.query_timeout: float = query_timeout
+        self.secret: str = secrets.token_hex(16)
+        self.clusters: list[Cluster] = []
+        self._context = multiprocessing.get_context("spawn")
+        self._nonces = count()
+        self._collecting: dict[int, PendingQuery] = {}
+        self._stopping: asyncio.Event = asyncio.Event()
+
+    async def run(self) -> None:
+        if self.shard_count is None:
+            self.shard_count = await recommended_shards(self.token)
+        runs = split_shards(self.shard_count, self.cluster_count)
+        self.clusters = [Cluster(index, run) for index, run in enumerate(runs)]
+
+        server = await asyncio.start_server(self._serve, "127.0.0.1", self.ipc_port)
+        self.ipc_port = server.sockets[0].getsockname()[1]
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, self._stopping.set)
+        self.log.info(
+            f"Starting {len(self.clusters)} clusters for {self.shard_count} shards, "
+            f"IPC on port {self.ipc_port}"
+        )
+
+        async with server:
+            for cluster in self.clusters:
+                self._start(cluster)
+            while not self._stopping.is_set():
+                self._check()
+                try:
+                    await asyncio.wait_for(self._stopping.wait(), timeout=1.0)
+                except asyncio.TimeoutError:
+                    pass
+            await self._shutdown()
+
+    def _start(self, cluster: Cluster) -> None:
+        cluster.process = self._context.Process(
+            target=self.target,
+            kwargs={
+                "cluster_id": cluster.id,
+                "shard_ids": cluster.shard_ids,
+                "shard_count": self.shard_count,
+                "ipc_port": self.ipc_port,
+                "ipc_secret": self.secret,
+            },
+            name=f"cluster-{cluster.id}",
+            daemon=False,
+        )
+        cluster.process.start()
+        cluster.started_at = time.monotonic()
+        self.log.info(
+            f"Cluster {cluster.id} started (pid {cluster.process.pid}, "
+            f"shards {cluster.shard_ids[0]}-{cluster.shard_ids[-1]})"
+        )
+
+    def _check(self) -> None:
+        now = time.monotonic()
+        for cluster in self.clusters:
+            process = cluster.process
+            if process is None:
+                if now >= cluster.restart_at:
+                    self._start(cluster)
+                continue
+            if process.is_alive():
+                if now - cluster.started_at >= self.stable_after:
+                    cluster.restarts = 0
+                continue
+            process.join()
+            cluster.process = None
+            cluster.restarts += 1
+            backoff = min(self.max_backoff, 5 * 2 ** (cluster.restarts - 1))
+            cluster.restart_at = now + backoff
+            self.log.error(
+                f"Cluster {cluster.id} exited with code {process.exitcode}, "
+                f"restarting in {backoff:.0f}s"
+            )
+
+    async def _shutdown(self) -> None:
+        """
+        Sends every cluster SIGTERM, which makes it close the bot and flush
+        its pending writes, and kills those still running after 30 seconds.
+        """
+        self.log.info("Stopping clusters...")
+        for cluster in self.clusters:
+            if cluster.process is not None and cluster.process.is_alive():
+                cluster.process.terminate()
+        for cluster in self.clusters:
+            if cluster.process is not None:
+                await asyncio.to_thread(cluster.process.join, 30)
+                if cluster.process.is_alive():
+                    cluster.process.kill()
+
+    def _identify(self, line: bytes) -> Optional[Cluster]:
+        """
+        Returns the cluster a connection's first line identifies, or None
+        if it is not a well-formed hello carrying the IPC secret.
+        """
+        try:
+            hello = json.loads(line)
+        except ValueError:
+            return None
+        if not isinstance(hello, dict) or hello.get("op") != "identify":
+            return None
+        secret, cluster_id = hello.get("secret"), hello.get("cluster")
+        if not isinstance(secret, str) or not secrets.compare_digest(
+            secret, self.secret
+        ):
+            return None
+        if type(cluster_id) is not int or not 0 <= cluster_id < len(self.clusters):
+            return None
+        return self.clusters[cluster_id]
+
+    async def _serve(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        cluster: Optional[Cluster] = None
+        try:
+            cluster = self._identify(await reader.readline())
+            if cluster is None:
+                self.log.warning("Dropped an IPC connection with an invalid hello")
+                return
+            cluster.writer = writer
+            while line := await reader.readline():
+                message = json.loads(line)
+                if not isinstance(message, dict):
+                    continue
+                if message.get("op") == "request":
+                    asyncio.create_task(self._relay(writer, message))
+                elif message.get("op") == "response":
+                    query = self._collecting.get(message.get("nonce"))
+                    if query is not None:
+                        query.add(cluster.id, message.get("data"))
+        except (OSError, ValueError) as e:
+            self.log.warning(f"IPC connection error: {e!r}")
+        finally:
+            if cluster is not None and cluster.writer is writer:
+                cluster.writer = None
+            writer.close()
+
+    async def _relay(self, writer: asyncio.StreamWriter, request: dict) -> None:
+        """
+        Forwards a query to every connected cluster and sends the collected
+        answers back to the cluster that asked, once all of them answered
+        or ``query_timeout`` passed.
+        """
+        nonce = next(self._nonces)
+        targets = {
+            cluster.id: cluster.writer
+            for cluster in self.clusters
+            if cluster.writer is not None
+        }
+        query = self._collecting[nonce] = PendingQuery(len(targets))
+        try:
+            for target in targets.values():
+                await send(
+                    target,
+                    {"op": "query", "nonce": nonce, "query": request.get("query")},
+                )
+            try:
+                await asyncio.wait_for(asyncio.shield(query.done), self.query_timeout)
+            except asyncio.TimeoutError:
+                pass
+            data = [
+                query.responses[cluster_id] for cluster_id in sorted(query.responses)
+            ]
+            await send(
+                writer, {"op": "result", "nonce": request.get("nonce"), "data": data}
+            )
+        except OSError as e:
+            self.log.warning(f"Could not relay IPC query: {e!r}")
+        finally:
+            del self._collecting[nonce]
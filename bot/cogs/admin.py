@@ -11,6 +11,9 @@ if TYPE_CHECKING:
     from ..bot import Konikotaka
 
 
+INTENTS: tuple[str, ...] = ("emojis_and_stickers",)
+
+
 class Admin(commands.Cog):
     def __init__(self, client: Konikotaka) -> None:
         self.client: Konikotaka = client
@@ -88,9 +91,9 @@ class Admin(commands.Cog):
             name = emoji.name
         guild: Guild = ctx.guild
         try:
-            res = await self.client.session.get(emoji.url)
+            res = await self.client.http_client.get(emoji.url)
             if res.status == 200:
-                image_data = await res.read()
+                image_data = res.body
                 new_emoji = await guild.create_custom_emoji(name=name, image=image_data)
                 embed = Embed()
                 embed.title = "Emoji Added"
@@ -109,6 +112,58 @@ class Admin(commands.Cog):
             )
             return
 
+    @commands.command(name="httpcache", hidden=True)
+    @commands.is_owner()
+    async def http_cache(self, ctx: Context) -> None:
+        """
+        Show hit/miss counters of the shared HTTP response cache.
+        """
+        stats = self.client.http_cache.stats
+        await ctx.entry_to_code([(name, str(value)) for name, value in stats.items()])
+
+    @commands.command(name="circuits", hidden=True)
+    @commands.is_owner()
+    async def circuits(self, ctx: Context) -> None:
+        """
+        Show the circuit breaker state of every upstream host.
+        """
+        stats = self.client.http_client.stats
+        if not stats:
+            return await ctx.send("No upstream requests yet.")
+        await ctx.entry_to_code(stats.items())
+
+    @commands.command(name="aiqueue", hidden=True)
+    @commands.is_owner()
+    async def ai_queue(self, ctx: Context) -> None:
+        """
+        Show the load and queue wait times of the AI request scheduler.
+        """
+        cog = self.client.get_cog("Ai")
+        if cog is None:
+            return await ctx.send("The Ai cog is not loaded.")
+        await ctx.entry_to_code(cog.scheduler.stats.items())
+
+    @commands.command(name="aicache", hidden=True)
+    @commands.is_owner()
+    async def ai_cache(self, ctx: Context) -> None:
+        """
+        Show hit/miss counters of the AI reply cache.
+        """
+        cog = self.client.get_cog("Ai")
+        if cog is None:
+            return await ctx.send("The Ai cog is not loaded.")
+        stats = cog.response_cache.stats
+        await ctx.entry_to_code([(name, str(value)) for name, value in stats.items()])
+
+    @commands.command(name="dbpool", hidden=True)
+    @commands.is_owner()
+    async def db_pool(self, ctx: Context) -> None:
+        """
+        Show how much of the database connection pool is in use.
+        """
+        stats = self.client.db_config.pool_stats(self.client.engine)
+        await ctx.entry_to_code(stats.items())
+
     @commands.command(name="git", aliases=["gr"], hidden=True)
     @commands.guild_only()
     async def git_revision(self, ctx: Context) -> None:
@@ -1,27 +1,50 @@
 from __future__ import annotations
 
+import asyncio
 import os
+import tempfile
 import time
-from typing import TYPE_CHECKING, Literal
+from typing import TYPE_CHECKING, Any, Literal, Optional
 
+from aiohttp import ClientError
 from discord import (
     Attachment,
     Colour,
     Embed,
+    File,
     Interaction,
     Message,
     app_commands,
     ui,
 )
 from discord.ext import commands
-from openai import AsyncOpenAI
+from openai import AsyncOpenAI, OpenAIError
+from utils.blobs import BlobStore
 from utils.consts import ai_ban_words
+from utils.conversations import ConversationStore
 from utils.gpt import about_text
+from utils.http_client import PayloadTooLarge
+from utils.moderation import PromptModerator
+from utils.preprocess import ImagePreprocessor
+from utils.response_cache import (
+    NAME_PLACEHOLDER,
+    ResponseCache,
+    name_template,
+    persona_hash,
+)
+from utils.scheduler import AIScheduler, QueuedHandler, QueueFullError, TokenBucket
+from utils.streaming import StreamedReply
 
 if TYPE_CHECKING:
+    from utils.context import Context
+
     from ..bot import Konikotaka
 
 
+# Source images are shrunk before upload, so only the download is capped.
+MAX_DESCRIBE_BYTES: int = 50 * 1024**2
+
+
 class Download(ui.View):
     def __init__(self, url: str):
         super().__init__()
@@ -32,34 +55,178 @@ class Ai(commands.Cog):
     def __init__(self, client: Konikotaka) -> None:
         self.client: Konikotaka = client
         self.openai_token: str = os.environ["OPENAI_TOKEN"]
-        self.openai_client = AsyncOpenAI(
-            api_key=self.openai_token
+        self.openai_client = AsyncOpenAI(api_key=self.openai_token)
+        self.conversations: ConversationStore = ConversationStore(
+            self.client.log, summarize=self.summarize
+        )
+        self.persona: str = persona_hash(about_text)
+        self.response_cache: ResponseCache = ResponseCache(
+            ttl=float(os.getenv("AI_CACHE_TTL", 3600)),
+            threshold=(
+                float(os.environ["AI_CACHE_THRESHOLD"])
+                if os.getenv("AI_CACHE_THRESHOLD")
+                else None
+            ),
         )
+        self.images: BlobStore = BlobStore(
+            os.getenv(
+                "IMAGE_STORE_DIR",
+                os.path.join(tempfile.gettempdir(), "konikotaka", "images"),
+            ),
+            self.client.http_client,
+            self.client.log,
+            suffix=".png",
+        )
+        self.preprocessor: ImagePreprocessor = ImagePreprocessor()
+        self.moderator: PromptModerator = PromptModerator(
+            self.client.repositories.banned_words, self.client.log, ai_ban_words
+        )
+        self.scheduler: AIScheduler = AIScheduler(
+            self.client.log,
+            concurrency=int(os.getenv("AI_CONCURRENCY", 4)),
+            limits={
+                "chat": TokenBucket.per_minute(
+                    float(os.getenv("AI_CHAT_RPM", 60)), burst=5
+                ),
+                "image": TokenBucket.per_minute(float(os.getenv("AI_IMAGE_RPM", 5))),
+                "describe": TokenBucket.per_minute(
+                    float(os.getenv("AI_DESCRIBE_RPM", 60)), burst=5
+                ),
+            },
+        )
+
+    async def cog_load(self) -> None:
+        self.client.router.register(self.on_mention, mentions_me=True)
 
-    @commands.Cog.listener()
-    async def on_message(self, message: Message):
-        if message.author == self.client.user:
+    async def cog_unload(self) -> None:
+        self.client.router.unregister(self.on_mention)
+        self.preprocessor.close()
+
+    @commands.hybrid_group(name="banword", fallback="list")
+    @commands.guild_only()
+    @app_commands.guild_only()
+    async def banword(self, ctx: Context) -> None:
+        """
+        List the words this server added to the image prompt filter
+        """
+        words = await self.moderator.guild_words(ctx.guild.id)
+        if not words:
+            await ctx.send("No extra banned words in this server.", ephemeral=True)
             return
-        if message.mention_everyone:
+        await ctx.safe_send(", ".join(f"`{word}`" for word in words))
+
+    @banword.command(name="add")
+    @commands.guild_only()
+    @app_commands.guild_only()
+    @app_commands.describe(word="The word or phrase to ban from image prompts")
+    @commands.has_permissions(manage_guild=True)
+    @app_commands.checks.has_permissions(manage_guild=True)
+    async def banword_add(self, ctx: Context, *, word: str) -> None:
+        """
+        Ban a word from image prompts in this server
+        """
+        if len(word) > 100:
+            await ctx.send(
+                "Banned words can be at most 100 characters.", ephemeral=True
+            )
+            return
+        if await self.moderator.add(ctx.guild.id, word, ctx.author.id):
+            await ctx.send(
+                f"`{word}` is now banned from image prompts.", ephemeral=True
+            )
+        else:
+            await ctx.send(f"`{word}` is already banned.", ephemeral=True)
+
+    @banword.command(name="remove")
+    @commands.guild_only()
+    @app_commands.guild_only()
+    @app_commands.describe(word="The word or phrase to allow again")
+    @commands.has_permissions(manage_guild=True)
+    @app_commands.checks.has_permissions(manage_guild=True)
+    async def banword_remove(self, ctx: Context, *, word: str) -> None:
+        """
+        Allow a word this server banned from image prompts again
+        """
+        if await self.moderator.remove(ctx.guild.id, word):
+            await ctx.send(f"`{word}` is no longer banned.", ephemeral=True)
+        else:
+            await ctx.send(f"`{word}` was not banned in this server.", ephemeral=True)
+
+    def queued_feedback(self, interaction: Interaction) -> QueuedHandler:
+        async def on_queued(position: int) -> None:
+            await interaction.edit_original_response(
+                content=f"You're #{position} in the queue, hang tight..."
+            )
+
+        return on_queued
+
+    async def on_mention(self, message: Message) -> None:
+        name = message.author.nick if message.author.nick else message.author.name
+        prompt = message.content.strip(f"<@!{self.client.user.id}>")
+        content = f"{name}: {prompt}"
+        reply = StreamedReply(message.channel)
+        # Cached replies only make sense when there is no history to follow.
+        fresh = self.conversations.is_empty(message.channel.id)
+        cached = self.response_cache.get(self.persona, prompt) if fresh else None
+        if cached is not None:
+            await reply.feed(cached.replace(NAME_PLACEHOLDER, name))
+            await reply.finish()
+            await self.conversations.record(message.channel.id, content, reply.text)
             return
-        if self.client.user.mentioned_in(message):
-            name = message.author.nick if message.author.nick else message.author.name
-            chat_completion = await self.openai_client.chat.completions.create(
+        async with message.channel.typing():
+            try:
+                async with self.scheduler.slot(message.author.id, "chat"):
+                    stream = await self.openai_client.chat.completions.create(
+                        messages=self.conversations.prompt(
+                            message.channel.id,
+                            about_text
+                            + f"when you answer someone, answer them by {name}",
+                            content,
+                        ),
+                        model="gpt-4o",
+                        stream=True,
+                    )
+                    async for chunk in stream:
+                        if chunk.choices and chunk.choices[0].delta.content:
+                            await reply.feed(chunk.choices[0].delta.content)
+                    await reply.finish()
+            except QueueFullError:
+                await message.add_reaction("⏳")
+                return
+            except OpenAIError as e:
+                self.client.log.error(f"Error generating reply: {e}")
+                if not reply.messages:
+                    await message.channel.send(
+                        "Sorry, I couldn't come up with a reply right now."
+                    )
+                return
+        template = name_template(reply.text, name) if fresh else None
+        if template is not None:
+            self.response_cache.put(self.persona, prompt, template)
+        await self.conversations.record(message.channel.id, content, reply.text)
+
+    async def summarize(self, summary: str, turns: list[dict[str, str]]) -> str:
+        """Folds older turns into the running summary of a conversation."""
+        transcript = "\n".join(f"{turn['role']}: {turn['content']}" for turn in turns)
+        # Summaries queue as their own "user", so round-robin keeps them from
+        # crowding out live replies. They still share the chat slots and rate.
+        async with self.scheduler.slot(0, "chat"):
+            completion = await self.openai_client.chat.completions.create(
                 messages=[
                     {
                         "role": "system",
-                        "content": about_text
-                        + f"when you answer someone, answer them by {name}",
+                        "content": "Summarize this chat in at most five sentences. "
+                        "Keep names, facts and open questions.",
                     },
                     {
                         "role": "user",
-                        "content": message.content.strip(f"<@!{self.client.user.id}>"),
+                        "content": f"Previous summary: {summary or 'none'}\n\n{transcript}",
                     },
                 ],
-                model="gpt4o",
+                model="gpt-4o",
+                max_tokens=200,
             )
-            await message.channel.typing()
-            await message.channel.send(chat_completion.choices[0].message.content)
+        return completion.choices[0].message.content or summary
 
     @app_commands.command(
         name="imagine", description="Generate an image using OpenAI's DALL-E"
@@ -74,24 +241,43 @@ class Ai(commands.Cog):
         style: Literal["vivid", "natural"],
     ) -> None:
         await interaction.response.defer()
-        if any(word in prompt for word in ai_ban_words):
+        banned = await self.moderator.check(interaction.guild_id, prompt)
+        if banned is not None:
             await interaction.edit_original_response(
-                content="Your prompt contains a banned word. Please try again."
+                content=f"Your prompt contains a banned word (`{banned}`). Please try again."
             )
             return
 
-        start_time = time.time()
+        key = self.images.key(
+            "dall-e-3", "hd", size, style, " ".join(prompt.split()).casefold()
+        )
+        path = self.images.get(key)
+        if path is not None:
+            await self.send_image(interaction, prompt, path, "Served from the archive")
+            return
+
         try:
-            image_data = await self.openai_client.images.generate(
-                prompt=prompt,
-                model="dall-e-3",
-                n=1,
-                quality="hd",
-                response_format="url",
-                size=size,
-                style=style,
-                user=interaction.user.name,
+            async with self.scheduler.slot(
+                interaction.user.id,
+                "image",
+                on_queued=self.queued_feedback(interaction),
+            ):
+                start_time = time.time()
+                image_data = await self.openai_client.images.generate(
+                    prompt=prompt,
+                    model="dall-e-3",
+                    n=1,
+                    quality="hd",
+                    response_format="url",
+                    size=size,
+                    style=style,
+                    user=interaction.user.name,
+                )
+        except QueueFullError:
+            await interaction.edit_original_response(
+                content="You already have requests waiting, please try again in a bit."
             )
+            return
         except Exception as e:
             self.client.log.error(f"Error generating image: {e}")
             await interaction.edit_original_response(
@@ -99,84 +285,131 @@ class Ai(commands.Cog):
             )
             return
 
-        if image_data.data[0].url:
-            self.client.log.info(
-                f"Image generated generated by {interaction.user.name} with prompt: {prompt}"
+        url = image_data.data[0].url
+        if not url:
+            self.client.log.error(f"Error generating image: {image_data.data}")
+            await interaction.edit_original_response(
+                content=f"An error occurred during generation. This has been reported to the developers - {interaction.user.mention}"
             )
-
-            elapsed_time = time.time() - start_time
-            embed = Embed()
-            embed.title = "Result for your prompt"
-            embed.colour = Colour.blurple()
-            embed.description = f"```{prompt}```"
-            embed.set_image(url=image_data.data[0].url)
+            return
+        self.client.log.info(
+            f"Image generated generated by {interaction.user.name} with prompt: {prompt}"
+        )
+        elapsed_time = time.time() - start_time
+        try:
+            path = await self.images.fetch(key, url)
+        except (ClientError, PayloadTooLarge) as e:
+            self.client.log.error(f"Could not archive generated image: {e}")
+            embed = self.image_embed(prompt)
+            embed.set_image(url=url)
             embed.set_footer(
                 text=f"Took {elapsed_time:.2f}s - Note: This URL will expire in 60 minutes"
             )
             await interaction.edit_original_response(
-                embed=embed, view=Download(url=image_data.data[0].url)
+                content=None, embed=embed, view=Download(url=url)
             )
-        else:
-            self.client.log.error(f"Error generating image: {image_data.data}")
-            await interaction.edit_original_response(
-                content=f"An error occurred during generation. This has been reported to the developers - {interaction.user.mention}"
+            return
+        await self.send_image(interaction, prompt, path, f"Took {elapsed_time:.2f}s")
+
+    def image_embed(self, prompt: str) -> Embed:
+        embed = Embed()
+        embed.title = "Result for your prompt"
+        embed.colour = Colour.blurple()
+        embed.description = f"```{prompt}```"
+        return embed
+
+    async def send_image(
+        self, interaction: Interaction, prompt: str, path: str, footer: str
+    ) -> None:
+        embed = self.image_embed(prompt)
+        embed.set_image(url="attachment://imagine.png")
+        embed.set_footer(text=footer)
+        await interaction.edit_original_response(
+            content=None,
+            embed=embed,
+            attachments=[File(path, filename="imagine.png")],
+        )
+
+    async def classify(self, photo: Attachment) -> list[dict[str, Any]]:
+        """
+        Streams an attachment to disk, shrinks it and returns the labels the
+        classifier gives it.
+        """
+        url = f"{os.getenv('CLOUDFLARE_AI_URL')}/@cf/microsoft/resnet-50"
+        headers = {"Authorization": f"Bearer {os.getenv('CLOUDFLARE_AI_TOKEN')}"}
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "source")
+            await self.client.http_client.download(
+                photo.url, path, max_bytes=MAX_DESCRIBE_BYTES
             )
+            image = await self.preprocessor.prepare(path)
+        response = await self.client.http_client.post(
+            url, headers=headers, data=image, timeout=30, raise_for_status=True
+        )
+        return response.json()["result"]
 
     @app_commands.command(
         name="describe", description="Describe an image using MicrosoftAI"
     )
     @app_commands.guild_only()
-    @app_commands.describe(photo="The photo to describe")
-    async def describe(self, interaction: Interaction, photo: Attachment) -> None:
+    @app_commands.describe(
+        photo="The photo to describe",
+        photo2="Another photo to describe",
+        photo3="Another photo to describe",
+        photo4="Another photo to describe",
+    )
+    async def describe(
+        self,
+        interaction: Interaction,
+        photo: Attachment,
+        photo2: Optional[Attachment] = None,
+        photo3: Optional[Attachment] = None,
+        photo4: Optional[Attachment] = None,
+    ) -> None:
         await interaction.response.defer()
-        url = f"{os.getenv('CLOUDFLARE_AI_URL')}/@cf/microsoft/resnet-50"
-        headers = {"Authorization": f"Bearer {os.getenv('CLOUDFLARE_AI_TOKEN')}"}
-        try:
-            image_binary = await photo.read()
-        except Exception as e:
-            self.client.log.error(f"Error reading image: {e}")
+        photos = [p for p in (photo, photo2, photo3, photo4) if p is not None]
+        if any(p.size > MAX_DESCRIBE_BYTES for p in photos):
             await interaction.edit_original_response(
-                content="An error occurred while reading your image"
+                content="Your image is too large. Please try again with an image smaller than 50MB"
             )
             return
-        if len(image_binary) > 4_000_000:
-            await interaction.edit_original_response(
-                content="Your image is too large. Please try again with an image smaller than 4MB"
-            )
-            return
-        start_time = time.time()
         try:
-            response = await self.client.session.post(
-                url=url, headers=headers, data=image_binary
-            )
-        except Exception as e:
-            self.client.log.error(f"Error describing image: {e}")
+            async with self.scheduler.slot(
+                interaction.user.id,
+                "describe",
+                on_queued=self.queued_feedback(interaction),
+            ):
+                start_time = time.time()
+                results = await asyncio.gather(
+                    *(self.classify(p) for p in photos), return_exceptions=True
+                )
+        except QueueFullError:
             await interaction.edit_original_response(
-                content="An error occurred while describing your image, please try again"
+                content="You already have requests waiting, please try again in a bit."
             )
             return
-        if response.status == 200:
-            data = await response.json()
-            image_description = data["result"]
+        elapsed_time = time.time() - start_time
+
+        embeds = []
+        for p, result in zip(photos, results):
             embed = Embed()
-            embed.title = "Description for your image"
             embed.colour = Colour.blurple()
-            description = ""
-            for i in image_description:
-                description += f"Label: **{i['label']}** Score: **{round(i['score'] * 100, 2)}**\n\n"
-
-            embed.description = description
-            embed.set_image(url=photo.url)
-            elapsed_time = time.time() - start_time
-            embed.set_footer(text=f"Took {elapsed_time:.2f}s")
-            await interaction.edit_original_response(embed=embed)
-        else:
-            self.client.log.error(
-                f"Error describing image: {response.status} {response.reason}"
-            )
-            await interaction.edit_original_response(
-                content="An error occurred while describing your image"
-            )
+            embed.set_image(url=p.url)
+            if isinstance(result, Exception):
+                self.client.log.error(f"Error describing image {p.filename}: {result}")
+                embed.title = "Could not describe this image"
+                embed.description = (
+                    "An error occurred while describing your image, please try again"
+                )
+            else:
+                embed.title = "Description for your image"
+                embed.description = "".join(
+                    f"Label: **{i['label']}** Score: **{round(i['score'] * 100, 2)}**\n\n"
+                    for i in result
+                )
+            embeds.append(embed)
+        embeds[-1].set_footer(text=f"Took {elapsed_time:.2f}s")
+        await interaction.edit_original_response(content=None, embeds=embeds)
 
 
 async def setup(client: Konikotaka) -> None:
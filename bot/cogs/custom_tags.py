@@ -1,16 +1,16 @@
 from __future__ import annotations
 
 import asyncio
-import random
 from datetime import datetime
-from typing import TYPE_CHECKING, Union
+from typing import TYPE_CHECKING, Any, Optional, Union
 
 import discord
 from discord import Colour, Embed, TextStyle, app_commands
-from discord.ext import commands
+from discord.ext import commands, menus
 from discord.interactions import Interaction
-from models.tags import CustomTags
-from sqlalchemy.future import select
+from sqlalchemy import Row
+from utils.paginator import Paginator
+from utils.tag_cache import CachedTag, TagCache
 
 if TYPE_CHECKING:
     from utils.context import Context
@@ -42,6 +42,55 @@ class TagName(commands.clean_content):
         return converted.strip() if not self.lower else lower
 
 
+class TagPageSource(menus.PageSource):
+    """
+    Keyset paginated listing of a guild's tag names.
+
+    Only ``name`` and ``called`` are selected, one page per query, using the
+    last name of the previous page as the cursor.
+    """
+
+    def __init__(self, client: Konikotaka, guild_id: int, *, per_page: int = 20):
+        self.client: Konikotaka = client
+        self.guild_id: int = guild_id
+        self.per_page: int = per_page
+        self.cursors: list[Optional[str]] = [None]
+        self.last_page: Optional[int] = None
+
+    def is_paginating(self) -> bool:
+        return self.last_page != 0
+
+    def get_max_pages(self) -> Optional[int]:
+        return None if self.last_page is None else self.last_page + 1
+
+    async def get_page(self, page_number: int) -> list[Row]:
+        after = self.cursors[page_number]
+        rows = await self.client.repositories.tags.page(
+            self.guild_id, after=after, limit=self.per_page + 1
+        )
+        if len(rows) > self.per_page:
+            rows = rows[: self.per_page]
+            if page_number == len(self.cursors) - 1:
+                self.cursors.append(str(rows[-1].name).lower())
+        else:
+            self.last_page = page_number
+        return rows
+
+    async def format_page(self, menu: Any, rows: list[Row]) -> Union[Embed, str]:
+        if not rows:
+            return "There are no tags."
+        embed = Embed(title="Here are all the tags:", colour=Colour.blurple())
+        start = menu.current_page * self.per_page
+        embed.description = "\n".join(
+            f"{start + i}. `{row.name}` ({row.called} uses)"
+            for i, row in enumerate(rows, start=1)
+        )
+        max_pages = self.get_max_pages()
+        page = f"Page {menu.current_page + 1}"
+        embed.set_footer(text=page if max_pages is None else f"{page}/{max_pages}")
+        return embed
+
+
 class CreateTagModel(discord.ui.Modal):
     tag_name = discord.ui.TextInput(
         label="Tag Name",
@@ -119,97 +168,63 @@ class EditTagModel(discord.ui.Modal):
 class Tags(commands.Cog):
     def __init__(self, client: Konikotaka) -> None:
         self.client: Konikotaka = client
+        self.cache: TagCache = TagCache(self.client.repositories.tags, self.client.log)
 
     async def add_tag(self, ctx: Context, tag_name: str, tag_content: str):
-        async with self.client.async_session() as session:
-            async with session.begin():
-                query = await session.execute(
-                    select(CustomTags).filter(
-                        CustomTags.name == tag_name.lower()
-                        and CustomTags.location_id == ctx.guild.id
-                    )
-                )
-                tag = query.scalar_one_or_none()
-                if tag:
-                    return await ctx.reply(
-                        f"Tag `{tag_name}` already exists 👎", ephemeral=True
-                    )
-                new_tag = CustomTags(
-                    name=tag_name.strip().lower(),
-                    content=tag_content,
-                    discord_id=str(ctx.author.id),
-                    date_added=ctx.message.created_at.strftime(
-                        "%Y-%m-%d %H:%M:%S %Z%z"
-                    ),
-                    location_id=ctx.guild.id,
-                )
-                try:
-                    session.add(new_tag)
-                    await session.flush()
-                    await session.commit()
-                    await ctx.reply(f"Tag `{tag_name}` added! 👍")
-                except Exception as e:
-                    self.client.log.error(e)
-                    await session.rollback()
-                    await ctx.reply(
-                        "An error occurred while adding the tag.", ephemeral=True
-                    )
+        if await self.cache.get(ctx.guild.id, tag_name) is not None:
+            return await ctx.reply(
+                f"Tag `{tag_name}` already exists 👎", ephemeral=True
+            )
+        try:
+            tag = await self.client.repositories.tags.create(
+                ctx.guild.id,
+                tag_name,
+                tag_content,
+                ctx.author.id,
+                ctx.message.created_at.strftime("%Y-%m-%d %H:%M:%S %Z%z"),
+            )
+        except Exception as e:
+            self.client.log.error(e)
+            return await ctx.reply(
+                "An error occurred while adding the tag.", ephemeral=True
+            )
+        if tag is None:
+            return await ctx.reply(
+                f"Tag `{tag_name}` already exists 👎", ephemeral=True
+            )
+        self.cache.put(ctx.guild.id, CachedTag.from_model(tag))
+        await ctx.reply(f"Tag `{tag_name}` added! 👍")
 
     async def edit_tag(self, ctx: Context, tag_name: str, tag_content: str):
-        async with self.client.async_session() as session:
-            async with session.begin():
-                query = await session.execute(
-                    select(CustomTags).filter(
-                        CustomTags.name == tag_name
-                        and CustomTags.location_id == ctx.guild.id
-                    )
-                )
-                tag = query.scalar_one_or_none()
-                if tag is None:
-                    return await ctx.reply(
-                        f"Tag `{tag_name}` does not exist 👎", ephemeral=True
-                    )
-                if tag:
-                    if int(str(tag.discord_id).strip()) != ctx.author.id:
-                        return await ctx.reply(
-                            "You are not the owner of this tag.", ephemeral=True
-                        )
-                    new_tag = CustomTags(
-                        name=tag_name.strip().lower(),
-                        content=tag_content,
-                        discord_id=str(ctx.author.id),
-                        date_added=ctx.message.created_at.strftime(
-                            "%Y-%m-%d %H:%M:%S %Z%z"
-                        ),
-                        location_id=ctx.guild.id,
-                    )
-                    try:
-                        session.add(new_tag)
-                        await session.flush()
-                        await session.commit()
-                        await ctx.reply(f"Tag `{tag_name}` has been updated! 👍")
-                    except Exception as e:
-                        self.client.log.error(e)
-                        await session.rollback()
-                        await ctx.reply(
-                            "An error occurred while updating the tag.", ephemeral=True
-                        )
+        cached = await self.cache.get(ctx.guild.id, tag_name)
+        if cached is None:
+            return await ctx.reply(
+                f"Tag `{tag_name}` does not exist 👎", ephemeral=True
+            )
+        if int(cached.discord_id) != ctx.author.id:
+            return await ctx.reply("You are not the owner of this tag.", ephemeral=True)
+        try:
+            tag = await self.client.repositories.tags.update(
+                cached.id, content=tag_content
+            )
+        except Exception as e:
+            self.client.log.error(e)
+            return await ctx.reply(
+                "An error occurred while updating the tag.", ephemeral=True
+            )
+        if tag is None:
+            self.cache.discard(ctx.guild.id, tag_name)
+            return await ctx.reply(
+                f"Tag `{tag_name}` does not exist 👎", ephemeral=True
+            )
+        self.cache.put(ctx.guild.id, CachedTag.from_model(tag))
+        await ctx.reply(f"Tag `{tag_name}` has been updated! 👍")
 
     async def lookup_similar_tags(
         self, ctx: Context, tag_name: str
-    ) -> Union[list[CustomTags], None]:
-        async with self.client.async_session() as session:
-            async with session.begin():
-                query = await session.execute(
-                    select(CustomTags).where(
-                        CustomTags.name.like(f"%{tag_name.lower()}%")
-                    )
-                )
-                tags = query.scalars().all()
-                if tags:
-                    return [tag for tag in tags if tag.location_id == ctx.guild.id]
-                else:
-                    return None
+    ) -> Union[list[CachedTag], None]:
+        tags = await self.cache.similar(ctx.guild.id, tag_name)
+        return tags or None
 
     @commands.hybrid_group(fallback="get")
     @commands.guild_only()
@@ -219,43 +234,20 @@ class Tags(commands.Cog):
         """
         Get a tag
         """
-        async with self.client.async_session() as session:
-            async with session.begin():
-                query = await session.execute(
-                    select(CustomTags).filter(
-                        CustomTags.name == tag_name.lower()
-                        and CustomTags.location_id == ctx.guild.id
-                    )
+        tag = await self.cache.get(ctx.guild.id, tag_name)
+        if tag:
+            await ctx.send(tag.content)
+            tag.called += 1
+            self.client.tag_counter.increment(tag.id)
+        else:
+            tags = await self.lookup_similar_tags(ctx=ctx, tag_name=tag_name)
+            if tags:
+                await ctx.safe_send(
+                    content=f"Tag `{tag_name}` not found. Did you mean one of these?\n"
+                    + "\n".join([f"{tag.name}" for tag in tags])
                 )
-                tag: CustomTags = query.scalar_one_or_none()
-                if tag:
-                    tag.called = int(str(tag.called).strip()) + 1
-                    await ctx.send(str(tag.content))
-                    try:
-                        await session.flush()
-                        await session.commit()
-                    except Exception as e:
-                        self.client.log.error(e)
-                        await session.rollback()
-                        await ctx.reply(
-                            "An error occurred while fetching the tag. 👎",
-                            ephemeral=True,
-                        )
-                else:
-                    tags = await self.lookup_similar_tags(ctx=ctx, tag_name=tag_name)
-                    if tags:
-                        await ctx.safe_send(
-                            content=f"Tag `{tag_name}` not found. Did you mean one of these?\n"
-                            + "\n".join(
-                                [
-                                    f"{tag.name}"
-                                    for tag in tags
-                                    if tag.location_id == ctx.guild.id
-                                ]
-                            )
-                        )
-                    else:
-                        await ctx.reply(f"Tag `{tag_name}` not found", ephemeral=True)
+            else:
+                await ctx.reply(f"Tag `{tag_name}` not found", ephemeral=True)
 
     @tag.command()
     @commands.guild_only()
@@ -397,38 +389,25 @@ class Tags(commands.Cog):
         """
         Get info on a tag
         """
-        async with self.client.async_session() as session:
-            query = await session.execute(
-                select(CustomTags).filter(
-                    CustomTags.name == tag_name.lower()
-                    and CustomTags.location_id == ctx.guild.id
+        tag = await self.cache.get(ctx.guild.id, tag_name)
+        if tag:
+            time = datetime.strptime(tag.date_added, "%Y-%m-%d %H:%M:%S %Z%z")
+            embed = Embed(title=f"Tag: {tag.name}", description=tag.content)
+            embed.colour = Colour.blurple()
+            embed.add_field(name="Owner", value=f"<@{tag.discord_id}>")
+            embed.add_field(name="Date Added", value=time.strftime("%B %d, %Y"))
+            embed.add_field(name="Times Called", value=tag.called)
+            embed.set_footer(text=f"ID: {tag.id}")
+            await ctx.reply(embed=embed)
+        else:
+            tags = await self.lookup_similar_tags(ctx=ctx, tag_name=tag_name)
+            if tags:
+                await ctx.reply(
+                    content=f"Tag `{tag_name}` not found. Did you mean one of these?\n"
+                    + "\n".join([f"`{tag.name}`" for tag in tags])
                 )
-            )
-            tag = query.scalar_one_or_none()
-            if tag:
-                time = datetime.strptime(tag.date_added, "%Y-%m-%d %H:%M:%S %Z%z")
-                embed = Embed(title=f"Tag: {tag.name}", description=tag.content)
-                embed.colour = Colour.blurple()
-                embed.add_field(name="Owner", value=f"<@{tag.discord_id}>")
-                embed.add_field(name="Date Added", value=time.strftime("%B %d, %Y"))
-                embed.add_field(name="Times Called", value=tag.called)
-                embed.set_footer(text=f"ID: {tag.id}")
-                await ctx.reply(embed=embed)
             else:
-                tags = await self.lookup_similar_tags(ctx=ctx, tag_name=tag_name)
-                if tags:
-                    await ctx.reply(
-                        content=f"Tag `{tag_name}` not found. Did you mean one of these?\n"
-                        + "\n".join(
-                            [
-                                f"`{tag.name}`"
-                                for tag in tags
-                                if tag.location_id == ctx.guild.id
-                            ]
-                        )
-                    )
-                else:
-                    await ctx.reply(f"Tag `{tag_name}` not found", ephemeral=True)
+                await ctx.reply(f"Tag `{tag_name}` not found", ephemeral=True)
 
     @tag.command(description="List all tags")
     @commands.guild_only()
@@ -437,25 +416,7 @@ class Tags(commands.Cog):
         """
         List all tags
         """
-        async with self.client.async_session() as session:
-            async with session.begin():
-                query = await session.execute(
-                    select(CustomTags).filter(CustomTags.location_id == ctx.guild.id)
-                )
-                tags = query.scalars().all()
-                if tags:
-                    await ctx.safe_send(
-                        content="Here are all the tags:\n"
-                        + "\n".join(
-                            [
-                                f"`{tag.name}`"
-                                for tag in tags
-                                if tag.location_id == ctx.guild.id
-                            ]
-                        )
-                    )
-                else:
-                    await ctx.reply("There are no tags.", ephemeral=True)
+        await Paginator(TagPageSource(self.client, ctx.guild.id), ctx=ctx).start()
 
     @tag.command(description="Search for a tag")
     @commands.guild_only()
@@ -465,30 +426,14 @@ class Tags(commands.Cog):
         """
         Search for a tag
         """
-        async with self.client.async_session() as session:
-            async with session.begin():
-                query = await session.execute(
-                    select(CustomTags).where(
-                        CustomTags.name.like(f"%{tag_name.lower()}%")
-                    )
-                )
-                tags: CustomTags = query.scalars().all()
-                if tags:
-                    for tag in tags:
-                        if tag.location_id != ctx.guild.id:
-                            tags.remove(tag)
-                        await ctx.safe_send(
-                            content="Here are all the tags:\n"
-                            + "\n".join(
-                                [
-                                    f"`{tag.name}`"
-                                    for tag in tags
-                                    if tag.location_id == ctx.guild.id
-                                ]
-                            )
-                        )
-                    else:
-                        await ctx.reply("There are no tags.", ephemeral=True)
+        tags = await self.cache.similar(ctx.guild.id, tag_name, limit=25)
+        if tags:
+            await ctx.safe_send(
+                content="Here are all the tags:\n"
+                + "\n".join([f"`{tag.name}`" for tag in tags])
+            )
+        else:
+            await ctx.reply("There are no tags.", ephemeral=True)
 
     @tag.command(description="Get a random tag")
     @commands.guild_only()
@@ -497,17 +442,12 @@ class Tags(commands.Cog):
         """
         Get a random tag
         """
-        async with self.client.async_session() as session:
-            async with session.begin():
-                query = await session.execute(
-                    select(CustomTags).filter(CustomTags.location_id == ctx.guild.id)
-                )
-                tags = query.scalars().all()
-                if tags:
-                    tag = tags[random.randint(0, len(tags) - 1)]
-                    await ctx.reply(f"TagName:{tag.name}\nTagContent{tag.content}")
-                else:
-                    await ctx.reply("There are no tags.", ephemeral=True)
+        tags = await self.cache.guild(ctx.guild.id)
+        tag = tags.random()
+        if tag:
+            await ctx.reply(f"TagName:{tag.name}\nTagContent{tag.content}")
+        else:
+            await ctx.reply("There are no tags.", ephemeral=True)
 
     @tag.command(description="Transfer a tag to another user")
     @commands.guild_only()
@@ -523,33 +463,24 @@ class Tags(commands.Cog):
         """
         Transfer a tag to another user
         """
-        async with self.client.async_session() as session:
-            async with session.begin():
-                query = await session.execute(
-                    select(CustomTags).filter(
-                        CustomTags.name == tag_name.lower()
-                        and CustomTags.location_id == ctx.guild.id
-                    )
+        cached = await self.cache.get(ctx.guild.id, tag_name)
+        tag = None
+        if cached is not None:
+            try:
+                tag = await self.client.repositories.tags.update(
+                    cached.id, discord_id=str(member.id)
                 )
-                tag: CustomTags = query.scalar_one_or_none()
-                if tag:
-                    try:
-                        tag.discord_id = member.id
-                        await session.flush()
-                        await session.commit()
-                        await ctx.reply(f"Tag `{tag_name}` transferred!")
-                        self.client.log.info(
-                            f"User {ctx.author} transferred a tag named {tag_name}"
-                        )
-                    except Exception as e:
-                        self.client.log.error(e)
-                        await session.rollback()
-                        await ctx.reply(
-                            "An error occurred while transferring the tag. 👎",
-                            ephemeral=True,
-                        )
-                else:
-                    await ctx.reply(f"Tag `{tag_name}` not found.", ephemeral=True)
+            except Exception as e:
+                self.client.log.error(e)
+                return await ctx.reply(
+                    "An error occurred while transferring the tag. 👎",
+                    ephemeral=True,
+                )
+        if tag is None:
+            return await ctx.reply(f"Tag `{tag_name}` not found.", ephemeral=True)
+        self.cache.put(ctx.guild.id, CachedTag.from_model(tag))
+        await ctx.reply(f"Tag `{tag_name}` transferred!")
+        self.client.log.info(f"User {ctx.author} transferred a tag named {tag_name}")
 
     @tag.command()
     @commands.guild_only()
@@ -559,37 +490,23 @@ class Tags(commands.Cog):
         """
         Delete a tag
         """
-        async with self.client.async_session() as session:
-            async with session.begin():
-                query = await session.execute(
-                    select(CustomTags).filter(
-                        CustomTags.name == tag_name.lower()
-                        and CustomTags.location_id == ctx.guild.id
-                    )
-                )
-                tag: CustomTags = query.scalar_one_or_none()
-                if tag:
-                    if int(str(tag.discord_id).strip()) != ctx.author.id:
-                        return await ctx.reply(
-                            "You are not the owner of this tag.", ephemeral=True
-                        )
-                    try:
-                        await session.delete(tag)
-                        await session.flush()
-                        await session.commit()
-                        await ctx.reply(f"Tag `{tag_name}` deleted!")
-                        self.client.log.info(
-                            f"User {ctx.author} deleted a tag named {tag_name}"
-                        )
-                    except Exception as e:
-                        self.client.log.error(e)
-                        await session.rollback()
-                        await ctx.reply(
-                            "An error occurred while deleting the tag. 👎",
-                            ephemeral=True,
-                        )
-                else:
-                    await ctx.reply(f"Tag `{tag_name}` not found.", ephemeral=True)
+        cached = await self.cache.get(ctx.guild.id, tag_name)
+        if cached is None:
+            return await ctx.reply(f"Tag `{tag_name}` not found.", ephemeral=True)
+        if int(cached.discord_id) != ctx.author.id:
+            return await ctx.reply("You are not the owner of this tag.", ephemeral=True)
+        try:
+            deleted = await self.client.repositories.tags.delete(cached.id)
+        except Exception as e:
+            self.client.log.error(e)
+            return await ctx.reply(
+                "An error occurred while deleting the tag. 👎", ephemeral=True
+            )
+        self.cache.discard(ctx.guild.id, tag_name)
+        if not deleted:
+            return await ctx.reply(f"Tag `{tag_name}` not found.", ephemeral=True)
+        await ctx.reply(f"Tag `{tag_name}` deleted!")
+        self.client.log.info(f"User {ctx.author} deleted a tag named {tag_name}")
 
 
 async def setup(client: Konikotaka):
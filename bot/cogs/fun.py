@@ -6,11 +6,12 @@ import urllib.parse
 from typing import TYPE_CHECKING, Literal, Optional, Union
 
 import upsidedown
+from aiohttp import ClientError
 from async_foaas import Fuck
 from discord import Colour, Embed, Member, User, app_commands
 from discord.ext import commands
-from models.users import DiscordUser
-from sqlalchemy.future import select
+from utils.member_sync import member_row
+from utils.prefetch import PrefetchPool
 from utils.utils import get_year_round, progress_bar
 
 if TYPE_CHECKING:
@@ -19,10 +20,39 @@ if TYPE_CHECKING:
     from ..bot import Konikotaka
 
 
+INTENTS: tuple[str, ...] = ("guild_reactions",)
+
+
+# Random-image endpoints served from a PrefetchPool: name -> (url, payload key)
+PREFETCHED: dict[str, tuple[str, str]] = {
+    "cosmo": ("https://twizy.sh/api/cosmo", "photoUrl"),
+    "cat": ("https://cataas.com/cat?json=true", "_id"),
+    "textcat": ("https://nekos.life/api/v2/cat", "cat"),
+    "dog": ("https://dog.ceo/api/breeds/image/random", "message"),
+    "hug": ("https://nekos.life/api/v2/img/hug", "url"),
+    "slap": ("https://nekos.life/api/v2/img/slap", "url"),
+    "kiss": ("https://nekos.life/api/v2/img/kiss", "url"),
+    "pat": ("https://nekos.life/api/v2/img/pat", "url"),
+}
+
+
 class Fun(commands.Cog):
     def __init__(self, client: Konikotaka) -> None:
         self.client: Konikotaka = client
         self.fuck: Fuck = Fuck()
+        self.pools: dict[str, PrefetchPool] = {}
+
+    async def cog_load(self) -> None:
+        for name, (url, key) in PREFETCHED.items():
+            pool = PrefetchPool(
+                self.client.http_client, url, key=key, log=self.client.log
+            )
+            pool.start()
+            self.pools[name] = pool
+
+    async def cog_unload(self) -> None:
+        for pool in self.pools.values():
+            pool.close()
 
     @commands.hybrid_command(
         name="cosmo", help="Get a random Photo of Cosmo the Cat", with_app_command=True
@@ -33,15 +63,12 @@ class Fun(commands.Cog):
         """
         Get a random photo of my cat Cosmo!
         """
-        async with self.client.session.get("https://twizy.sh/api/cosmo") as response:
-            if response.status == 200:
-                photo = await response.json()
-                await ctx.reply(content=photo["photoUrl"])
-            else:
-                self.client.log.error(
-                    f"An error occurred getting photo of Cosmo: {response.status}"
-                )
-                await ctx.reply("Error getting photo of Cosmo!", ephemeral=True)
+        try:
+            photo_url = await self.pools["cosmo"].get()
+        except ClientError as e:
+            self.client.log.error(f"An error occurred getting photo of Cosmo: {e}")
+            return await ctx.reply("Error getting photo of Cosmo!", ephemeral=True)
+        await ctx.reply(content=photo_url)
 
     @commands.hybrid_command(name="fuckoff", help="Tell Someone to Fuck Off")
     @commands.guild_only()
@@ -62,17 +89,16 @@ class Fun(commands.Cog):
         Get a random photo of Pat and Ash's cats from the twizy.dev API
         """
         self.client.log.info("Getting photo of Pat and Ash's cats")
-        async with self.client.session.get("https://twizy.sh/api/bczs") as response:
-            if response.status == 200:
-                photo = await response.json()
-                await ctx.reply(content=photo["photoUrl"])
-            else:
-                self.client.log.error(
-                    f"An error occurred getting photo of Pat and Ash's cats: {response.status}"
-                )
-                await ctx.reply(
-                    "Error getting photo of Pat and Ash's cats!", ephemeral=True
-                )
+        try:
+            photo = await self.client.http_client.get_json("https://twizy.sh/api/bczs")
+        except ClientError as e:
+            self.client.log.error(
+                f"An error occurred getting photo of Pat and Ash's cats: {e}"
+            )
+            return await ctx.reply(
+                "Error getting photo of Pat and Ash's cats!", ephemeral=True
+            )
+        await ctx.reply(content=photo["photoUrl"])
 
     @commands.hybrid_command(
         name="meme", help="Get a random meme!", with_app_command=True
@@ -82,12 +108,11 @@ class Fun(commands.Cog):
         """
         Get a random meme from the meme-api.com API
         """
-        async with self.client.session.get("https://meme-api.com/gimme") as response:
-            if response.status == 200:
-                meme = await response.json()
-                await ctx.reply(meme["url"])
-            else:
-                await ctx.reply("Error getting meme!", ephemeral=True)
+        try:
+            meme = await self.client.http_cache.get_json("https://meme-api.com/gimme")
+        except ClientError:
+            return await ctx.reply("Error getting meme!", ephemeral=True)
+        await ctx.reply(meme["url"])
 
     @commands.hybrid_command(
         name="gcattalk", help="Be able to speak with G Cat", with_app_command=True
@@ -112,14 +137,13 @@ class Fun(commands.Cog):
         """
         Get a random waifu image from the waifu API
         """
-        response = await self.client.session.get(
-            f"https://api.waifu.pics/sfw/{category}"
-        )
-        if response.status == 200:
-            waifu = await response.json()
-            await ctx.reply(waifu["url"])
-        else:
-            await ctx.reply("Error getting waifu!", ephemeral=True)
+        try:
+            waifu = await self.client.http_client.get_json(
+                f"https://api.waifu.pics/sfw/{category}"
+            )
+        except ClientError:
+            return await ctx.reply("Error getting waifu!", ephemeral=True)
+        await ctx.reply(waifu["url"])
 
     @commands.cooldown(1, 15, commands.BucketType.user)
     @commands.command(name="cat", description="Get a random cat image")
@@ -127,13 +151,11 @@ class Fun(commands.Cog):
         """
         Get a random cat image from the catapi
         """
-        base_url = "https://cataas.com"
-        response = await self.client.session.get(f"{base_url}/cat?json=true")
-        if response.status != 200:
+        try:
+            id = await self.pools["cat"].get()
+        except ClientError:
             return await ctx.reply("Error getting cat!", ephemeral=True)
-        response = await response.json()
-        id = response["_id"]
-        await ctx.reply(f"{base_url}/cat/{id}")
+        await ctx.reply(f"https://cataas.com/cat/{id}")
 
     @commands.hybrid_command(name="roll", description="Roll a dice with NdN")
     @commands.guild_only()
@@ -163,8 +185,12 @@ class Fun(commands.Cog):
         """
         Ask the magic 8ball a question
         """
-        data = await self.client.session.get("https://nekos.life/api/v2/8ball")
-        json_data = await data.json()
+        try:
+            json_data = await self.client.http_cache.get_json(
+                "https://nekos.life/api/v2/8ball"
+            )
+        except ClientError:
+            return await ctx.reply("Error asking the 8ball!", ephemeral=True)
         embed = Embed(
             title="🎱 Meowgical 8ball",
             description=f"Question: {question}\n\nAnswer: {json_data['response']}",
@@ -182,8 +208,12 @@ class Fun(commands.Cog):
         """
         Get a random fact
         """
-        data = await self.client.session.get("https://nekos.life/api/v2/fact")
-        json_data = await data.json()
+        try:
+            json_data = await self.client.http_cache.get_json(
+                "https://nekos.life/api/v2/fact"
+            )
+        except ClientError:
+            return await ctx.reply("Error getting fact!", ephemeral=True)
         embed = Embed(
             title="📖 Fact",
             description=f"{json_data['fact']}",
@@ -236,15 +266,17 @@ class Fun(commands.Cog):
         """
         Hug someone
         """
-        data = await self.client.session.get("https://nekos.life/api/v2/img/hug")
-        json_data = await data.json()
+        try:
+            image_url = await self.pools["hug"].get()
+        except ClientError:
+            return await ctx.reply("Error getting hug!", ephemeral=True)
         embed = Embed(
             title="🫂 Hug",
             description=f"{ctx.author.mention} hugged {member.mention} 😊",
             timestamp=ctx.message.created_at,
         )
         embed.colour = Colour.blurple()
-        embed.set_image(url=json_data["url"])
+        embed.set_image(url=image_url)
         await ctx.send(embed=embed)
 
     @commands.hybrid_command(name="slap", description="Slap someone")
@@ -254,15 +286,17 @@ class Fun(commands.Cog):
         """
         Slap someone
         """
-        data = await self.client.session.get("https://nekos.life/api/v2/img/slap")
-        json_data = await data.json()
+        try:
+            image_url = await self.pools["slap"].get()
+        except ClientError:
+            return await ctx.reply("Error getting slap!", ephemeral=True)
         embed = Embed(
             title="👊 Slap",
             description=f"{ctx.author.mention} slapped {member.mention} 😡",
             timestamp=ctx.message.created_at,
         )
         embed.colour = Colour.blurple()
-        embed.set_image(url=json_data["url"])
+        embed.set_image(url=image_url)
         await ctx.send(embed=embed)
 
     @commands.hybrid_command(name="kiss", description="Kiss someone")
@@ -272,15 +306,17 @@ class Fun(commands.Cog):
         """
         Kiss someone
         """
-        data = await self.client.session.get("https://nekos.life/api/v2/img/kiss")
-        json_data = await data.json()
+        try:
+            image_url = await self.pools["kiss"].get()
+        except ClientError:
+            return await ctx.reply("Error getting kiss!", ephemeral=True)
         embed = Embed(
             title="💋 Kiss",
             description=f"{ctx.author.mention} kissed {member.mention} 😘",
             timestamp=ctx.message.created_at,
         )
         embed.colour = Colour.blurple()
-        embed.set_image(url=json_data["url"])
+        embed.set_image(url=image_url)
         await ctx.send(embed=embed)
 
     @commands.hybrid_command(name="pat", description="Pat someone")
@@ -290,15 +326,17 @@ class Fun(commands.Cog):
         """
         Pat someone
         """
-        data = await self.client.session.get("https://nekos.life/api/v2/img/pat")
-        json_data = await data.json()
+        try:
+            image_url = await self.pools["pat"].get()
+        except ClientError:
+            return await ctx.reply("Error getting pat!", ephemeral=True)
         embed = Embed(
             title="👋 Pat",
             description=f"{ctx.author.mention} patted {member.mention} 😊",
             timestamp=ctx.message.created_at,
         )
         embed.colour = Colour.blurple()
-        embed.set_image(url=json_data["url"])
+        embed.set_image(url=image_url)
         await ctx.send(embed=embed)
 
     @commands.hybrid_command(name="textcat")
@@ -308,9 +346,11 @@ class Fun(commands.Cog):
         """
         Get a random text cat
         """
-        data = await self.client.session.get("https://nekos.life/api/v2/cat")
-        json_data = await data.json()
-        await ctx.reply(json_data["cat"])
+        try:
+            cat = await self.pools["textcat"].get()
+        except ClientError:
+            return await ctx.reply("Error getting text cat!", ephemeral=True)
+        await ctx.reply(cat)
 
     @commands.hybrid_command(name="coffee", description="Get a random coffee image")
     @commands.guild_only()
@@ -319,12 +359,13 @@ class Fun(commands.Cog):
         """
         Get a random coffee image from the twizy.dev API
         """
-        async with self.client.session.get(
-            "https://coffee.alexflipnote.dev/random.json"
-        ) as response:
-            if response.status == 200:
-                coffee = await response.json()
-                await ctx.reply(coffee["file"])
+        try:
+            coffee = await self.client.http_cache.get_json(
+                "https://coffee.alexflipnote.dev/random.json"
+            )
+        except ClientError:
+            return
+        await ctx.reply(coffee["file"])
 
     @commands.hybrid_command(name="slots", description="Play the slots")
     @commands.guild_only()
@@ -433,69 +474,20 @@ class Fun(commands.Cog):
         result = random.randint(0, 100)
         if member is None:
             member: Member = ctx.author
-        async with self.client.async_session() as session:
-            async with session.begin():
-                query = await session.execute(
-                    select(DiscordUser).where(DiscordUser.discord_id == str(member.id))
-                )
-                user: DiscordUser = query.scalar_one_or_none()
-                if user is None:
-                    new_user = DiscordUser(
-                        discord_id=str(member.id),
-                        username=member.name,
-                        joined=member.joined_at,
-                        kira_percentage=result,
-                        guild_id=str(
-                            member.guild.id,
-                        ),
-                    )
-                    session.add(new_user)
-                    await session.flush()
-                    await session.commit()
-                    embed = Embed(
-                        title="✍️️️ Kira",
-                        description=f"There is a **{result}%** chance that {member.mention} is Kira",
-                        timestamp=ctx.message.created_at,
-                    )
-                    embed.colour = Colour.blurple()
-                    embed.set_footer(
-                        text="Try tagging someone else to see if they are Kira"
-                    )
-                    embed.set_thumbnail(
-                        url="https://i.gyazo.com/66470edafe907ac8499c925b5221693d.jpg"
-                    )
-                    return await ctx.reply(embed=embed)
-
-                if user.kira_percentage == 0 or user.kira_percentage is None:
-                    user.kira_percentage = result
-                    await session.flush()
-                    await session.commit()
-                    embed = Embed(
-                        title="✍️️️ Kira",
-                        description=f"There is a **{result}%** chance that {member.mention} is Kira",
-                        timestamp=ctx.message.created_at,
-                    )
-                    embed.colour = Colour.blurple()
-                    embed.set_footer(
-                        text="Try tagging someone else to see if they are Kira"
-                    )
-                    embed.set_thumbnail(
-                        url="https://i.gyazo.com/66470edafe907ac8499c925b5221693d.jpg"
-                    )
-                else:
-                    embed = Embed(
-                        title="✍️️️ Kira",
-                        description=f"There is a **{user.kira_percentage}%** chance that {member.mention} is Kira",
-                        timestamp=ctx.message.created_at,
-                    )
-                    embed.colour = Colour.blurple()
-                    embed.set_footer(
-                        text="Try tagging someone else to see if they are Kira"
-                    )
-                    embed.set_thumbnail(
-                        url="https://i.gyazo.com/66470edafe907ac8499c925b5221693d.jpg"
-                    )
-                    await ctx.reply(embed=embed)
+        percentage = await self.client.repositories.users.kira(
+            member_row(member), result
+        )
+        embed = Embed(
+            title="✍️️️ Kira",
+            description=f"There is a **{percentage}%** chance that {member.mention} is Kira",
+            timestamp=ctx.message.created_at,
+        )
+        embed.colour = Colour.blurple()
+        embed.set_footer(text="Try tagging someone else to see if they are Kira")
+        embed.set_thumbnail(
+            url="https://i.gyazo.com/66470edafe907ac8499c925b5221693d.jpg"
+        )
+        await ctx.reply(embed=embed)
 
     @commands.hybrid_command(name="xkcd", description="Get a Todays XKCD comic")
     @commands.guild_only()
@@ -504,20 +496,21 @@ class Fun(commands.Cog):
         """
         Get a random xkcd comic
         """
-        response = await self.client.session.get("https://xkcd.com/info.0.json")
-        if response.status == 200:
-            comic = await response.json()
-            embed = Embed(
-                title=f"{comic['title']}",
-                description=f"{comic['alt']}",
-                timestamp=ctx.message.created_at,
+        try:
+            comic = await self.client.http_cache.get_json(
+                "https://xkcd.com/info.0.json", ttl=15 * 60
             )
-            embed.colour = Colour.blurple()
-            embed.set_image(url=comic["img"])
-            embed.set_footer(text="Provided by xkcd.com")
-            await ctx.reply(embed=embed)
-        else:
-            await ctx.reply("Error getting xkcd comic!", ephemeral=True)
+        except ClientError:
+            return await ctx.reply("Error getting xkcd comic!", ephemeral=True)
+        embed = Embed(
+            title=f"{comic['title']}",
+            description=f"{comic['alt']}",
+            timestamp=ctx.message.created_at,
+        )
+        embed.colour = Colour.blurple()
+        embed.set_image(url=comic["img"])
+        embed.set_footer(text="Provided by xkcd.com")
+        await ctx.reply(embed=embed)
 
     @commands.hybrid_command(name="year", description="Show the year progress")
     @commands.guild_only()
@@ -558,12 +551,13 @@ class Fun(commands.Cog):
         """
         Get a random inspiro quote
         """
-        async with self.client.session.get(
-            "https://inspirobot.me/api?generate=true"
-        ) as response:
-            if response.status == 200:
-                quote = await response.text()
-                await ctx.reply(quote)
+        try:
+            quote = await self.client.http_cache.get_text(
+                "https://inspirobot.me/api?generate=true"
+            )
+        except ClientError:
+            return
+        await ctx.reply(quote)
 
     @commands.hybrid_command(name="dog", description="Get a random dog image")
     @commands.guild_only()
@@ -572,11 +566,11 @@ class Fun(commands.Cog):
         """
         Get a random dog image
         """
-        async with self.client.session.get(
-            "https://dog.ceo/api/breeds/image/random"
-        ) as response:
-            dog = await response.json()
-            await ctx.send(dog["message"])
+        try:
+            dog = await self.pools["dog"].get()
+        except ClientError:
+            return await ctx.reply("Error getting dog!", ephemeral=True)
+        await ctx.send(dog)
 
     @commands.hybrid_command(name="supreme", description="Make a supreme image")
     @commands.guild_only()
@@ -609,21 +603,20 @@ class Fun(commands.Cog):
         """
         Get a random Quote from The Office
         """
-        async with self.client.session.get(
-            "https://officeapi.twizy.workers.dev/quote/random"
-        ) as response:
-            if response.status == 200:
-                quote = await response.json()
-                embed = Embed(
-                    description=f'"{quote["quote"]}" - {quote["character"]}',
-                    timestamp=ctx.message.created_at,
-                )
-                embed.colour = Colour.blurple()
-                embed.set_image(url=quote["character_avatar_url"])
-                embed.set_footer(text="https://theoffice.foo/")
-                await ctx.reply(embed=embed)
-            else:
-                await ctx.reply("Error getting The Office quote!", ephemeral=True)
+        try:
+            quote = await self.client.http_cache.get_json(
+                "https://officeapi.twizy.workers.dev/quote/random"
+            )
+        except ClientError:
+            return await ctx.reply("Error getting The Office quote!", ephemeral=True)
+        embed = Embed(
+            description=f'"{quote["quote"]}" - {quote["character"]}',
+            timestamp=ctx.message.created_at,
+        )
+        embed.colour = Colour.blurple()
+        embed.set_image(url=quote["character_avatar_url"])
+        embed.set_footer(text="https://theoffice.foo/")
+        await ctx.reply(embed=embed)
 
     @commands.hybrid_command(
         "officeclip", description="Get a random clip from The Office"
@@ -634,15 +627,14 @@ class Fun(commands.Cog):
         """
         Get a random clip from The Office
         """
-        async with self.client.session.get(
-            "https://officeapi.twizy.workers.dev/extras"
-        ) as response:
-            if response.status == 200:
-                data = await response.json()
-                random_clip = random.choice(data)
-                await ctx.reply(random_clip["video_url"])
-            else:
-                await ctx.reply("Error getting The Office clip!", ephemeral=True)
+        try:
+            data = await self.client.http_cache.get_json(
+                "https://officeapi.twizy.workers.dev/extras", ttl=6 * 60 * 60
+            )
+        except ClientError:
+            return await ctx.reply("Error getting The Office clip!", ephemeral=True)
+        random_clip = random.choice(data)
+        await ctx.reply(random_clip["video_url"])
 
 
 async def setup(client: Konikotaka) -> None:
@@ -4,6 +4,7 @@ import os
 from typing import TYPE_CHECKING
 
 import validators
+from aiohttp import ClientError
 from discord import PartialEmoji, app_commands
 from discord.ext import commands, tasks
 
@@ -23,7 +24,11 @@ class General(commands.Cog):
 
     @tasks.loop(hours=1)
     async def health_check(self) -> None:
-        check = await self.client.session.get(os.getenv("HEALTHCHECK_URL", ""))
+        try:
+            check = await self.client.http_client.get(os.getenv("HEALTHCHECK_URL", ""))
+        except ClientError as e:
+            self.client.log.error(f"Health check failed: {e}")
+            return
         if check.status != 200:
             self.client.log.error("Health check failed.")
         else:
@@ -41,9 +46,12 @@ class General(commands.Cog):
         validate_url = validators.url(url)
         if validate_url:
             data = {"url": url}
-            short_url = await self.client.session.post(url=api_url, json=data)
+            try:
+                short_url = await self.client.http_client.post(api_url, json=data)
+            except ClientError:
+                return await ctx.send("Error shortening URL")
             if short_url.status == 200:
-                short_url = await short_url.json()
+                short_url = short_url.json()
                 await ctx.send(f"Shortened URL: {short_url['url']}")
             else:
                 await ctx.send("Error shortening URL")
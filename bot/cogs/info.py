@@ -1,13 +1,17 @@
 from __future__ import annotations
 
+import asyncio
+import datetime
 import os
 import platform
+import time
 from typing import TYPE_CHECKING, Optional, Union
 
 import pkg_resources
 from discord import Colour, Embed, Member, Permissions, User, app_commands
 from discord.ext import commands
 from discord.utils import oauth_url
+from sqlalchemy.exc import SQLAlchemyError
 from utils.utils import date
 
 if TYPE_CHECKING:
@@ -16,10 +20,14 @@ if TYPE_CHECKING:
     from ..bot import Konikotaka
 
 
+INTENTS: tuple[str, ...] = ("members", "presences")
+
+
 class Info(commands.Cog):
     def __init__(self, client: Konikotaka) -> None:
         self.client: Konikotaka = client
         self.client_id: int = int(os.environ["CLIENT_ID"])
+        self._recording: set[asyncio.Task] = set()
 
     @commands.hybrid_command(
         name="info", help="Get info about the bot", with_app_command=True
@@ -136,6 +144,15 @@ class Info(commands.Cog):
             embed.add_field(name="Bots", value=find_bots)
             embed.add_field(name="Owner", value=ctx.guild.owner)
             embed.add_field(name="Created", value=date(ctx.guild.created_at, ago=True))
+            stats = await self.client.gather_cluster_stats()
+            embed.add_field(
+                name="Shard",
+                value=f"{ctx.guild.shard_id} (cluster {self.client.cluster_id or 0})",
+            )
+            embed.add_field(
+                name="Konikotaka Servers",
+                value=f"{sum(cluster['guilds'] for cluster in stats)} across {len(stats)} cluster(s)",
+            )
             await ctx.send(embed=embed)
 
     @commands.hybrid_command(aliases=["joined"])
@@ -189,10 +206,32 @@ class Info(commands.Cog):
         name="ping", help="Returns the latency of the bot.", with_app_command=True
     )
     async def ping(self, ctx: Context) -> None:
-        await ctx.send(
-            f"Pong! 🏓\nNode: **{os.getenv('NODE_NAME')}**\nLatency: **{round(self.client.get_bot_latency)}ms**\nPython Version: **{platform.python_version()}**"
+        start = time.perf_counter()
+        message = await ctx.send("Pong! 🏓")
+        rest = round((time.perf_counter() - start) * 1000)
+        ws = self.client.get_bot_latency
+        task = asyncio.create_task(self.record_ping(ws, rest))
+        self._recording.add(task)
+        task.add_done_callback(self._recording.discard)
+
+        stats = await self.client.gather_cluster_stats()
+        if len(stats) > 1:
+            latency = "\n".join(
+                f"Cluster {cluster['cluster']}: **{cluster['latency']}ms**"
+                for cluster in stats
+            )
+        else:
+            latency = f"Latency: **{ws}ms**"
+        await message.edit(
+            content=f"Pong! 🏓\nNode: **{os.getenv('NODE_NAME')}**\n{latency}\nREST: **{rest}ms**\nPython Version: **{platform.python_version()}**"
         )
 
+    async def record_ping(self, ws: int, rest: int) -> None:
+        try:
+            await self.client.repositories.pings.record(ws, rest)
+        except SQLAlchemyError as e:
+            self.client.log.warning(f"Could not record ping: {e}")
+
     @commands.hybrid_command(
         name="uptime",
         aliases=["up"],
@@ -202,9 +241,16 @@ class Info(commands.Cog):
     @commands.guild_only()
     @app_commands.guild_only()
     async def uptime(self, ctx: Context) -> None:
+        stats = await self.client.gather_cluster_stats()
+        description = self.client.get_uptime
+        if len(stats) > 1:
+            description = "\n".join(
+                f"Cluster {cluster['cluster']}: {datetime.timedelta(seconds=cluster['uptime'])}"
+                for cluster in stats
+            )
         embed = Embed(
             title="Bot Uptime 🕒",
-            description=f"{self.client.get_uptime}",
+            description=description,
             timestamp=ctx.message.created_at,
         )
         embed.colour = Colour.blurple()
@@ -7,14 +7,19 @@ from typing import TYPE_CHECKING, Union
 
 from discord import Colour, Embed, File, Guild, Member, User
 from discord.abc import GuildChannel
-from discord.ext import commands
-from models.users import DiscordUser
-from PIL import Image, ImageDraw, ImageFont
+from discord.ext import commands, tasks
+from utils.avatars import AvatarCache
+from utils.joins import JoinBurstCoalescer
+from utils.member_sync import MemberSync, member_row
+from utils.visa import VisaRenderer
 
 if TYPE_CHECKING:
     from ..bot import Konikotaka
 
 
+INTENTS: tuple[str, ...] = ("members", "moderation")
+
+
 class Meta(commands.Cog):
     def __init__(self, client: Konikotaka) -> None:
         self.client: Konikotaka = client
@@ -24,15 +29,12 @@ class Meta(commands.Cog):
         self.rand_number: int = (
             f"{str(self.random_number)[:-4]}-{str(self.random_number)[-4:]}"
         )
-        self.visa_image = Image.open(f"{self.file_path}/files/visa.jpg")
-        self.width, self.height = self.visa_image.size
-        self.background_color = (255, 255, 255)
-        self.image = Image.new("RGB", (self.width, self.height), self.background_color)
-        self.font = ImageFont.truetype(
-            f"{self.file_path}/files/runescape_uf.ttf", size=34
-        )
-        self.user_font = ImageFont.truetype(
-            f"{self.file_path}/files/runescape_uf.ttf", size=45
+        self.renderer: VisaRenderer = VisaRenderer(f"{self.file_path}/files")
+        self.avatars: AvatarCache = AvatarCache(
+            self.client.http_client,
+            self.client.log,
+            executor=self.renderer.executor,
+            cache_dir=os.getenv("AVATAR_CACHE_DIR"),
         )
         self.iss = random.choice(
             [
@@ -47,6 +49,43 @@ class Meta(commands.Cog):
             ]
         )
         self.log_channel = 1145086136142811249
+        self.joins: JoinBurstCoalescer = JoinBurstCoalescer(
+            self.welcome, self.welcome_batch, self.client.log
+        )
+        self.member_sync: MemberSync = MemberSync(
+            self.client.repositories.users, self.client.log
+        )
+
+    async def cog_unload(self) -> None:
+        self.reconcile_members.cancel()
+        self.joins.close()
+        self.renderer.close()
+        await self.member_sync.close()
+
+    @property
+    def synced_guilds(self) -> set[int]:
+        guilds = os.getenv("MEMBER_SYNC_GUILDS")
+        if not guilds:
+            return {self.client.main_guild}
+        return {int(guild_id) for guild_id in guilds.split(",") if guild_id.strip()}
+
+    @commands.Cog.listener()
+    async def on_ready(self) -> None:
+        if not self.reconcile_members.is_running():
+            self.reconcile_members.start()
+
+    @tasks.loop(hours=6)
+    async def reconcile_members(self) -> None:
+        for guild_id in self.synced_guilds:
+            guild = self.client.get_guild(guild_id)
+            if guild is None:
+                continue
+            try:
+                if not guild.chunked:
+                    await guild.chunk()
+                await self.member_sync.reconcile(guild)
+            except Exception as e:
+                self.client.log.error(f"Could not reconcile members of {guild}: {e}")
 
     def random_birthday(self) -> str:
         """Generates a random birthday."""
@@ -62,25 +101,57 @@ class Meta(commands.Cog):
         day = random.randint(1, 28)
         return f"{month}.{day}.{year}"
 
-    async def create_image(self, member: Union[Member, User]) -> str:
-        discord_avatar = await self.client.session.get(member.avatar.url)
-        discord_avatar = Image.open(BytesIO(await discord_avatar.read()))
-        discord_avatar = discord_avatar.resize((150, 200))
-        draw = ImageDraw.Draw(self.image)
-        self.image.paste(self.visa_image, (0, 0))
-        draw.text((115, 525), str(member.name), fill=(0, 0, 0), font=self.user_font)
-        draw.text((400, 590), self.random_birthday(), fill=(0, 0, 0), font=self.font)
-        draw.text((400, 632), self.sex, fill=(0, 0, 0), font=self.font)
-        draw.text((400, 674), self.iss, fill=(0, 0, 0), font=self.font)
-        draw.text((400, 713), self.random_expiration(), fill=(0, 0, 0), font=self.font)
-        draw.text((75, 880), str(self.rand_number), fill=(1, 20, 20), font=self.font)
-        self.image.paste(discord_avatar, (100, 589))
-        file_path = f"{self.file_path}/files/{member.id}.jpg"
-        self.image.save(file_path)
-        return file_path
+    async def create_image(self, member: Union[Member, User]) -> BytesIO:
+        avatar = await self.avatars.get(member)
+        return await self.renderer.render(
+            avatar,
+            name=str(member.name),
+            birthday=self.random_birthday(),
+            sex=self.sex,
+            iss=self.iss,
+            expiration=self.random_expiration(),
+            number=str(self.rand_number),
+        )
+
+    async def add_users(self, members: list[Member]) -> None:
+        """Upserts a DiscordUser row for every member in one statement."""
+        try:
+            await self.client.repositories.users.upsert(
+                [member_row(member) for member in members]
+            )
+        except Exception as e:
+            self.client.log.error(e)
+
+    async def welcome(self, member: Member) -> None:
+        if member.guild.id in self.synced_guilds:
+            await self.add_users([member])
+        channel = member.guild.system_channel
+        if channel is None:
+            return
+        image = await self.create_image(member)
+        await channel.send(
+            content=f"Welcome {member.mention} to the {member.guild.name} discord server!",
+            file=File(image, filename="visa.jpg"),
+        )
+
+    async def welcome_batch(self, guild: Guild, members: list[Member]) -> None:
+        if guild.id in self.synced_guilds:
+            await self.add_users(members)
+        channel = guild.system_channel
+        if channel is None:
+            return
+        header = f"Welcome to the {guild.name} discord server!\n"
+        message = header
+        for member in members:
+            line = f"{member.mention}\n"
+            if len(message) + len(line) > 2000:
+                await channel.send(message)
+                message = header
+            message += line
+        await channel.send(message)
 
     @commands.Cog.listener()
-    async def on_member_join(self, member: Union[Member, User]) -> None:
+    async def on_member_join(self, member: Member) -> None:
         if member.guild.id == self.client.main_guild:
             role = member.guild.get_role(1159304816531623976)
             if role is not None:
@@ -88,103 +159,41 @@ class Meta(commands.Cog):
                 self.client.log.info(f"Added {role.name} to {member.name}")
             else:
                 self.client.log.error("Role not found.")
-            user = DiscordUser(
-                discord_id=str(member.id),
-                username=member.name,
-                joined=member.joined_at,
-                guild_id=str(member.guild.id),
-                xp=0,
-                level=0,
-            )
-            async with self.client.async_session() as session:
-                async with session.begin():
-                    try:
-                        session.add(user)
-                        await session.flush()
-                        await session.commit()
-                    except Exception as e:
-                        self.client.log.error(e)
-                        await session.rollback()
-
-        image = await self.create_image(member)
-        channel = await self.client.fetch_channel(member.guild.system_channel.id)
-        await channel.send(
-            content=f"Welcome {member.mention} to the {member.guild.name} discord server!",
-            file=File(image),
-        )
-        os.remove(image)
-        if member.guild.id == self.client.main_guild:
-            await member.add_roles(
-                self.client.get_guild(self.client.main_guild).get_role(
-                    1159304816531623976
-                )
-            )
+        await self.joins.add(member)
 
     @commands.Cog.listener()
-    async def on_member_ban(self, guild: Guild, user: Member) -> None:
+    async def on_member_ban(self, guild: Guild, user: Union[Member, User]) -> None:
+        if guild.id not in self.synced_guilds:
+            return
+        self.member_sync.queue_delete(guild.id, user.id)
         if guild.id != self.client.main_guild:
             return
-        async with self.client.async_session() as session:
-            async with session.begin():
-                try:
-                    user = await session.query(DiscordUser, str(user.id))
-                    if user is None:
-                        return
-                    await session.delete(user)
-                    await session.flush()
-                    await session.commit()
-                    embed = Embed(
-                        title="User Banned 🚨",
-                    )
-                    embed.colour = Colour.blurple()
-                    embed.add_field(name="User:", value=user.mention, inline=False)
-                    channel: GuildChannel = self.client.get_channel(
-                        self.general_channel
-                    )
-                    await channel.send(embed=embed)
-                except Exception as e:
-                    self.client.log.error(e)
-                    await session.rollback()
+        embed = Embed(
+            title="User Banned 🚨",
+        )
+        embed.colour = Colour.blurple()
+        embed.add_field(name="User:", value=user.mention, inline=False)
+        channel: GuildChannel = self.client.get_channel(self.client.general_channel)
+        if channel is not None:
+            await channel.send(embed=embed)
 
     @commands.Cog.listener()
     async def on_member_update(self, before: Member, after: Member) -> None:
-        if before.guild.id != self.client.main_guild:
+        if after.guild.id not in self.synced_guilds or before.name == after.name:
             return
-        async with self.client.async_session() as session:
-            async with session.begin():
-                try:
-                    user: DiscordUser = await session.query(DiscordUser, before.id)
-                    if user is None:
-                        return
-                    user.username = after.name
-                    await session.flush()
-                    await session.commit()
-                except Exception as e:
-                    self.client.log.error(e)
-                    await session.rollback()
+        self.member_sync.queue_upsert(after)
 
     @commands.Cog.listener()
-    async def on_member_remove(self, member: Union[Member, User]) -> None:
+    async def on_member_remove(self, member: Member) -> None:
+        if member.guild.id not in self.synced_guilds:
+            return
+        self.member_sync.queue_delete(member.guild.id, member.id)
         if member.guild.id != self.client.main_guild:
             return
-
         await self.client.get_channel(self.log_channel).send(
             f"{member.name} has left the server."
         )
 
-        async with self.client.async_session() as session:
-            async with session.begin():
-                try:
-                    user: DiscordUser = await session.query(DiscordUser, member.id)
-                    if user is None:
-                        return
-                    await session.delete(user)
-                    await session.flush()
-                    await session.commit()
-                except Exception as e:
-                    self.client.log.error(e)
-                    await session.rollback()
-
 
 async def setup(client: Konikotaka) -> None:
     await client.add_cog(Meta(client))
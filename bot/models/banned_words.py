@@ -0,0 +1,33 @@
+from models.db import Base
+from sqlalchemy import BIGINT, VARCHAR, Column, Index, Integer, func
+
+
+class BannedWord(Base):
+    """
+    Banned Word Model
+
+    Attributes:
+    - id: int
+        The primary key of the table
+    - guild_id: int
+        The guild the word is banned in
+    - word: str
+        The banned word or phrase
+    - added_by: str
+        The discord id of the user who banned the word
+    """
+
+    __tablename__ = "banned_words"
+    id = Column(Integer, primary_key=True)
+    guild_id = Column(BIGINT, nullable=False)
+    word = Column(VARCHAR(100), nullable=False)
+    added_by = Column(VARCHAR(255), nullable=False)
+
+    __table_args__ = (
+        Index(
+            "ix_banned_words_guild_id_lower_word",
+            guild_id,
+            func.lower(word),
+            unique=True,
+        ),
+    )
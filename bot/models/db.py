@@ -1,3 +1,101 @@
+from __future__ import annotations
+
+import os
+from dataclasses import dataclass
+
+from sqlalchemy import URL
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
 from sqlalchemy.orm import declarative_base
 
 Base = declarative_base()
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+@dataclass(frozen=True)
+class DatabaseConfig:
+    """
+    Connection pool and driver settings for the Postgres engine.
+
+    Attributes:
+    - pool_size: int
+        Connections kept open in the pool
+    - max_overflow: int
+        Extra connections allowed during bursts, closed once returned
+    - pool_timeout: float
+        Seconds to wait for a free connection before giving up
+    - pool_recycle: int
+        Seconds after which a connection is replaced, -1 to never recycle
+    - pre_ping: bool
+        Test connections when they are checked out, so connections that went
+        stale during a database restart are replaced instead of failing a command
+    - statement_cache_size: int
+        Prepared statements cached per connection, by asyncpg and SQLAlchemy
+    - command_timeout: float
+        Seconds a single query may run before it is cancelled
+    """
+
+    pool_size: int = 5
+    max_overflow: int = 10
+    pool_timeout: float = 10.0
+    pool_recycle: int = 1800
+    pre_ping: bool = True
+    statement_cache_size: int = 256
+    command_timeout: float = 15.0
+
+    @classmethod
+    def from_env(cls) -> DatabaseConfig:
+        return cls(
+            pool_size=int(os.getenv("DB_POOL_SIZE", cls.pool_size)),
+            max_overflow=int(os.getenv("DB_MAX_OVERFLOW", cls.max_overflow)),
+            pool_timeout=float(os.getenv("DB_POOL_TIMEOUT", cls.pool_timeout)),
+            pool_recycle=int(os.getenv("DB_POOL_RECYCLE", cls.pool_recycle)),
+            pre_ping=_env_bool("DB_PRE_PING", cls.pre_ping),
+            statement_cache_size=int(
+                os.getenv("DB_STATEMENT_CACHE_SIZE", cls.statement_cache_size)
+            ),
+            command_timeout=float(os.getenv("DB_COMMAND_TIMEOUT", cls.command_timeout)),
+        )
+
+    def create_engine(self, url: URL, application_name: str) -> AsyncEngine:
+        return create_async_engine(
+            url.update_query_dict(
+                {"prepared_statement_cache_size": str(self.statement_cache_size)}
+            ),
+            echo=False,
+            future=True,
+            pool_size=self.pool_size,
+            max_overflow=self.max_overflow,
+            pool_timeout=self.pool_timeout,
+            pool_recycle=self.pool_recycle,
+            pool_pre_ping=self.pre_ping,
+            connect_args={
+                "server_settings": {"application_name": application_name},
+                "statement_cache_size": self.statement_cache_size,
+                "command_timeout": self.command_timeout,
+            },
+        )
+
+    def pool_stats(self, engine: AsyncEngine) -> dict[str, str]:
+        """
+        Current utilization of the pool of an engine built from this config.
+        """
+        pool = engine.pool
+        size = pool.size()
+        checked_out = pool.checkedout()
+        capacity = size + max(0, self.max_overflow)
+        return {
+            "pool size": str(size),
+            "max overflow": str(self.max_overflow),
+            "checked out": str(checked_out),
+            "idle": str(pool.checkedin()),
+            "overflow": str(max(0, pool.overflow())),
+            "utilization": f"{checked_out / capacity:.0%}" if capacity else "-",
+            "statement cache": str(self.statement_cache_size),
+            "command timeout": f"{self.command_timeout:g}s",
+        }
@@ -0,0 +1,218 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from logging import Logger
+
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+# Arbitrary key for pg_advisory_xact_lock so concurrent replicas migrate one at a time.
+MIGRATION_LOCK_KEY: int = 0x4B6F6E69
+
+
+@dataclass(frozen=True)
+class Migration:
+    """
+    A forward-only schema change.
+
+    Attributes:
+    - version: int
+        Monotonically increasing version, recorded in ``schema_migrations``
+    - description: str
+        Human readable summary of the change
+    - steps: tuple
+        Raw SQL statements, run in order
+    - optional: bool
+        Whether the bot can run without this migration. A failing optional
+        migration is rolled back, logged and retried on the next start;
+        later migrations must not depend on it.
+    """
+
+    version: int
+    description: str
+    steps: tuple[str, ...]
+    optional: bool = False
+
+
+MIGRATIONS: tuple[Migration, ...] = (
+    # Written out rather than generated from the models, so the baseline stays
+    # the schema the bot started with no matter how the models change.
+    Migration(
+        1,
+        "Create baseline tables",
+        (
+            "CREATE TABLE IF NOT EXISTS ping ("
+            "id SERIAL PRIMARY KEY, "
+            "ping_ws INTEGER NOT NULL, "
+            "ping_rest INTEGER NOT NULL, "
+            "date DATE NOT NULL)",
+            "CREATE TABLE IF NOT EXISTS racers ("
+            "id SERIAL PRIMARY KEY, "
+            "discord_id VARCHAR(255) NOT NULL, "
+            "location_id BIGINT NOT NULL, "
+            "wins INTEGER NOT NULL, "
+            "points INTEGER NOT NULL)",
+            "CREATE TABLE IF NOT EXISTS tags ("
+            "id SERIAL PRIMARY KEY, "
+            "discord_id VARCHAR(255) NOT NULL, "
+            "name VARCHAR(255) NOT NULL, "
+            "location_id BIGINT NOT NULL, "
+            "content VARCHAR(2000) NOT NULL, "
+            "called INTEGER NOT NULL, "
+            "date_added VARCHAR(255) NOT NULL)",
+            "CREATE TABLE IF NOT EXISTS discord_users ("
+            "id SERIAL PRIMARY KEY, "
+            "discord_id VARCHAR(255) NOT NULL, "
+            "username VARCHAR(255) NOT NULL, "
+            "joined DATE NOT NULL, "
+            "guild_id VARCHAR(255) NOT NULL, "
+            "kira_percentage INTEGER, "
+            "level INTEGER, "
+            "xp INTEGER)",
+        ),
+    ),
+    Migration(
+        2,
+        "Add lookup indexes for tags, discord_users and racers",
+        (
+            # Keep the newest row of every (guild, name) pair so the unique index
+            # can be built, with the calls of all its duplicates added up. The
+            # rows dropped are copied to tags_duplicates first, so no tag
+            # content is lost.
+            "CREATE TABLE IF NOT EXISTS tags_duplicates AS "
+            "SELECT * FROM tags WITH NO DATA",
+            "INSERT INTO tags_duplicates SELECT a.* FROM tags a "
+            "WHERE EXISTS (SELECT 1 FROM tags b "
+            "WHERE a.location_id = b.location_id "
+            "AND lower(a.name) = lower(b.name) AND a.id < b.id)",
+            "UPDATE tags a SET called = t.called "
+            "FROM (SELECT max(id) AS id, sum(called) AS called "
+            "FROM tags GROUP BY location_id, lower(name)) t WHERE a.id = t.id",
+            "DELETE FROM tags a USING tags b "
+            "WHERE a.location_id = b.location_id "
+            "AND lower(a.name) = lower(b.name) AND a.id < b.id",
+            "CREATE UNIQUE INDEX IF NOT EXISTS ix_tags_location_id_lower_name "
+            "ON tags (location_id, lower(name))",
+            "CREATE INDEX IF NOT EXISTS ix_discord_users_discord_id_guild_id "
+            "ON discord_users (discord_id, guild_id)",
+            "CREATE INDEX IF NOT EXISTS ix_racers_location_id_points "
+            "ON racers (location_id, points DESC)",
+        ),
+    ),
+    Migration(
+        3,
+        "Add trigram index for tag similarity search",
+        (
+            "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+            "CREATE INDEX IF NOT EXISTS ix_tags_name_trgm "
+            "ON tags USING gin (name gin_trgm_ops)",
+        ),
+        # Needs a role allowed to create extensions; without it similar tag
+        # names are only ranked from the in-memory index.
+        optional=True,
+    ),
+    Migration(
+        4,
+        "Make discord_users unique per guild for member sync upserts",
+        (
+            # Keep the oldest row of every (discord_id, guild) pair, it holds the real xp.
+            "DELETE FROM discord_users a USING discord_users b "
+            "WHERE a.discord_id = b.discord_id "
+            "AND a.guild_id = b.guild_id AND a.id > b.id",
+            "DROP INDEX IF EXISTS ix_discord_users_discord_id_guild_id",
+            "CREATE UNIQUE INDEX ix_discord_users_discord_id_guild_id "
+            "ON discord_users (discord_id, guild_id)",
+        ),
+    ),
+    Migration(
+        5,
+        "Add per-guild banned words",
+        (
+            "CREATE TABLE IF NOT EXISTS banned_words ("
+            "id SERIAL PRIMARY KEY, "
+            "guild_id BIGINT NOT NULL, "
+            "word VARCHAR(100) NOT NULL, "
+            "added_by VARCHAR(255) NOT NULL)",
+            "CREATE UNIQUE INDEX IF NOT EXISTS ix_banned_words_guild_id_lower_word "
+            "ON banned_words (guild_id, lower(word))",
+        ),
+    ),
+    Migration(
+        6,
+        "Make racers unique per guild for race result upserts",
+        (
+            # Fold duplicate racers into the oldest row before the unique index is built.
+            "UPDATE racers a SET wins = t.wins, points = t.points "
+            "FROM (SELECT discord_id, location_id, min(id) AS id, "
+            "sum(wins) AS wins, sum(points) AS points "
+            "FROM racers GROUP BY discord_id, location_id) t WHERE a.id = t.id",
+            "DELETE FROM racers a USING racers b "
+            "WHERE a.discord_id = b.discord_id "
+            "AND a.location_id = b.location_id AND a.id > b.id",
+            "CREATE UNIQUE INDEX IF NOT EXISTS ix_racers_discord_id_location_id "
+            "ON racers (discord_id, location_id)",
+        ),
+    ),
+)
+
+
+async def _applied_versions(conn: AsyncConnection) -> set[int]:
+    await conn.execute(
+        text(
+            "CREATE TABLE IF NOT EXISTS schema_migrations ("
+            "version INTEGER PRIMARY KEY, "
+            "description VARCHAR(255) NOT NULL, "
+            "applied_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT CURRENT_TIMESTAMP)"
+        )
+    )
+    query = await conn.execute(text("SELECT version FROM schema_migrations"))
+    return set(query.scalars())
+
+
+async def run_migrations(engine: AsyncEngine, log: Logger) -> int:
+    """
+    Applies every migration newer than the database's current version.
+
+    Each migration runs in its own transaction. A failing migration raises
+    and stops before any later ones run, leaving the earlier ones applied,
+    unless it is optional: then it is rolled back and skipped. Returns the
+    number of migrations applied.
+    """
+    applied = 0
+    for migration in MIGRATIONS:
+        try:
+            applied += await _apply(engine, migration, log)
+        except DBAPIError as exc:
+            if not migration.optional:
+                raise
+            log.warning(
+                f"Skipped optional migration {migration.version} "
+                f"({migration.description}), retrying on the next start: {exc}"
+            )
+    return applied
+
+
+async def _apply(engine: AsyncEngine, migration: Migration, log: Logger) -> int:
+    """
+    Applies ``migration`` unless it already was; returns 1 if it ran.
+    """
+    async with engine.begin() as conn:
+        if conn.dialect.name == "postgresql":
+            await conn.execute(
+                text("SELECT pg_advisory_xact_lock(:key)"),
+                {"key": MIGRATION_LOCK_KEY},
+            )
+        if migration.version in await _applied_versions(conn):
+            return 0
+        for step in migration.steps:
+            await conn.execute(text(step))
+        await conn.execute(
+            text(
+                "INSERT INTO schema_migrations (version, description) "
+                "VALUES (:version, :description)"
+            ),
+            {"version": migration.version, "description": migration.description},
+        )
+    log.info(f"Applied migration {migration.version}: {migration.description}")
+    return 1
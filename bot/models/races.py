@@ -1,5 +1,5 @@
 from models.db import Base
-from sqlalchemy import BIGINT, VARCHAR, Column, Integer
+from sqlalchemy import BIGINT, VARCHAR, Column, Index, Integer
 
 
 class Races(Base):
@@ -25,3 +25,8 @@ class Races(Base):
     location_id = Column(BIGINT, nullable=False)
     wins = Column(Integer, nullable=False, default=0)
     points = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        Index("ix_racers_location_id_points", location_id, points.desc()),
+        Index("ix_racers_discord_id_location_id", discord_id, location_id, unique=True),
+    )
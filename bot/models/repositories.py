@@ -0,0 +1,414 @@
+from __future__ import annotations
+
+import datetime
+from collections import defaultdict
+from dataclasses import dataclass
+from itertools import islice
+from typing import Any, Iterable, Iterator, Mapping, Optional
+
+from models.banned_words import BannedWord
+from models.db import Base
+from models.ping import Ping
+from models.races import Races
+from models.tags import CustomTags
+from models.users import DiscordUser
+from sqlalchemy import (
+    Insert,
+    Integer,
+    Row,
+    case,
+    column,
+    delete,
+    func,
+    or_,
+    select,
+    update,
+    values,
+)
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlalchemy.pool import StaticPool
+
+TAG_COLUMNS = (
+    CustomTags.id,
+    CustomTags.name,
+    CustomTags.content,
+    CustomTags.discord_id,
+    CustomTags.called,
+    CustomTags.date_added,
+)
+
+
+def chunked(items: Iterable, size: int) -> Iterator[list]:
+    iterator = iter(items)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+class Repository:
+    """
+    Base for the data access classes.
+
+    Every method is a single Core statement run on its own connection, in
+    its own transaction: no ORM identity map, no objects loaded only to be
+    modified and flushed back. ``INSERT ... ON CONFLICT`` is built for the
+    engine's dialect, so the same code runs on Postgres and on the in-memory
+    SQLite engine from ``memory_engine``.
+    """
+
+    def __init__(self, engine: AsyncEngine) -> None:
+        self.engine: AsyncEngine = engine
+
+    @property
+    def dialect(self) -> str:
+        return self.engine.dialect.name
+
+    def insert(self, model: type[Base]) -> Insert:
+        if self.dialect == "sqlite":
+            return sqlite.insert(model)
+        return postgresql.insert(model)
+
+
+class TagRepository(Repository):
+    async def page(
+        self, guild_id: int, *, after: Optional[str] = None, limit: int = 20
+    ) -> list[Row]:
+        """
+        ``name`` and ``called`` of up to ``limit`` tags sorted by name,
+        starting after the lower-cased name ``after``.
+        """
+        query = (
+            select(CustomTags.name, CustomTags.called)
+            .where(CustomTags.location_id == guild_id)
+            .order_by(func.lower(CustomTags.name))
+            .limit(limit)
+        )
+        if after is not None:
+            query = query.where(func.lower(CustomTags.name) > after)
+        async with self.engine.connect() as conn:
+            return list((await conn.execute(query)).all())
+
+    async def all(self, guild_id: int) -> list[Row]:
+        async with self.engine.connect() as conn:
+            query = await conn.execute(
+                select(*TAG_COLUMNS).where(CustomTags.location_id == guild_id)
+            )
+            return list(query.all())
+
+    async def get(self, guild_id: int, name: str) -> Optional[Row]:
+        async with self.engine.connect() as conn:
+            query = await conn.execute(
+                select(*TAG_COLUMNS)
+                .where(
+                    CustomTags.location_id == guild_id,
+                    func.lower(CustomTags.name) == name.lower(),
+                )
+                .limit(1)
+            )
+            return query.first()
+
+    async def similar(self, guild_id: int, name: str, *, limit: int = 10) -> list[Row]:
+        """
+        pg_trgm lookup of names similar to ``name``. Returns nothing on
+        other dialects; raises ``DBAPIError`` when the extension is missing.
+        """
+        if self.dialect != "postgresql":
+            return []
+        name = name.lower()
+        async with self.engine.connect() as conn:
+            query = await conn.execute(
+                select(*TAG_COLUMNS)
+                .where(
+                    CustomTags.location_id == guild_id,
+                    CustomTags.name.op("%")(name),
+                )
+                .order_by(func.similarity(CustomTags.name, name).desc())
+                .limit(limit)
+            )
+            return list(query.all())
+
+    async def create(
+        self,
+        guild_id: int,
+        name: str,
+        content: str,
+        owner_id: int,
+        date_added: str,
+    ) -> Optional[Row]:
+        """
+        Inserts a tag and returns it, or None if the guild already has a tag
+        with that name.
+        """
+        statement = (
+            self.insert(CustomTags)
+            .values(
+                name=name.strip().lower(),
+                content=content,
+                discord_id=str(owner_id),
+                date_added=date_added,
+                location_id=guild_id,
+                called=0,
+            )
+            .on_conflict_do_nothing()
+            .returning(*TAG_COLUMNS)
+        )
+        async with self.engine.begin() as conn:
+            return (await conn.execute(statement)).first()
+
+    async def update(self, tag_id: int, **values: Any) -> Optional[Row]:
+        """
+        Sets ``values`` on a tag and returns the updated row, or None if the
+        tag no longer exists.
+        """
+        async with self.engine.begin() as conn:
+            query = await conn.execute(
+                update(CustomTags)
+                .where(CustomTags.id == tag_id)
+                .values(**values)
+                .returning(*TAG_COLUMNS)
+            )
+            return query.first()
+
+    async def delete(self, tag_id: int) -> bool:
+        async with self.engine.begin() as conn:
+            query = await conn.execute(
+                delete(CustomTags)
+                .where(CustomTags.id == tag_id)
+                .returning(CustomTags.id)
+            )
+            return query.first() is not None
+
+    async def add_calls(self, deltas: Mapping[int, int]) -> None:
+        """
+        Adds ``deltas`` (tag id to number of calls) to ``called`` in one
+        statement: ``UPDATE ... FROM (VALUES ...)`` on Postgres, a ``CASE``
+        over the ids elsewhere.
+        """
+        if not deltas:
+            return
+        if self.dialect == "postgresql":
+            table = values(
+                column("id", Integer), column("delta", Integer), name="deltas"
+            ).data(list(deltas.items()))
+            statement = (
+                update(CustomTags)
+                .where(CustomTags.id == table.c.id)
+                .values(called=CustomTags.called + table.c.delta)
+            )
+        else:
+            statement = (
+                update(CustomTags)
+                .where(CustomTags.id.in_(list(deltas)))
+                .values(
+                    called=CustomTags.called + case(dict(deltas), value=CustomTags.id)
+                )
+            )
+        async with self.engine.begin() as conn:
+            await conn.execute(statement)
+
+
+class UserRepository(Repository):
+    def __init__(self, engine: AsyncEngine, *, batch_size: int = 500) -> None:
+        super().__init__(engine)
+        self.batch_size: int = batch_size
+
+    async def usernames(self, guild_id: int) -> dict[str, str]:
+        """
+        Maps the discord id of every stored member of a guild to its username.
+        """
+        async with self.engine.connect() as conn:
+            query = await conn.execute(
+                select(DiscordUser.discord_id, DiscordUser.username).where(
+                    DiscordUser.guild_id == str(guild_id)
+                )
+            )
+            return {discord_id: username for discord_id, username in query.all()}
+
+    async def upsert(self, rows: list[dict[str, Any]]) -> None:
+        """
+        Inserts members, only refreshing the username of those already
+        stored, in chunks of ``batch_size`` rows within one transaction.
+        """
+        if not rows:
+            return
+        async with self.engine.begin() as conn:
+            for chunk in chunked(rows, self.batch_size):
+                statement = self.insert(DiscordUser).values(chunk)
+                await conn.execute(
+                    statement.on_conflict_do_update(
+                        index_elements=[DiscordUser.discord_id, DiscordUser.guild_id],
+                        set_={"username": statement.excluded.username},
+                    )
+                )
+
+    async def delete(self, keys: Iterable[tuple[str, str]]) -> None:
+        """
+        Removes ``(discord_id, guild_id)`` pairs, one ``DELETE ... IN`` per
+        guild and chunk.
+        """
+        by_guild: defaultdict[str, list[str]] = defaultdict(list)
+        for discord_id, guild_id in keys:
+            by_guild[guild_id].append(discord_id)
+        if not by_guild:
+            return
+        async with self.engine.begin() as conn:
+            for guild_id, ids in by_guild.items():
+                for chunk in chunked(ids, self.batch_size):
+                    await conn.execute(
+                        delete(DiscordUser).where(
+                            DiscordUser.guild_id == guild_id,
+                            DiscordUser.discord_id.in_(chunk),
+                        )
+                    )
+
+    async def kira(self, row: dict[str, Any], percentage: int) -> int:
+        """
+        Returns the member's stored kira percentage, storing ``percentage``
+        first if the member has none yet (creating the member if needed).
+        """
+        statement = self.insert(DiscordUser).values(**row, kira_percentage=percentage)
+        current = DiscordUser.kira_percentage
+        statement = statement.on_conflict_do_update(
+            index_elements=[DiscordUser.discord_id, DiscordUser.guild_id],
+            set_={
+                "kira_percentage": case(
+                    (
+                        or_(current.is_(None), current == 0),
+                        statement.excluded.kira_percentage,
+                    ),
+                    else_=current,
+                )
+            },
+        ).returning(DiscordUser.kira_percentage)
+        async with self.engine.begin() as conn:
+            return (await conn.execute(statement)).scalar_one()
+
+
+class RaceRepository(Repository):
+    async def record(
+        self, discord_id: int, guild_id: int, *, points: int, won: bool
+    ) -> Row:
+        """
+        Adds a race result to a racer, creating it if needed, and returns
+        the racer's new ``wins`` and ``points``.
+        """
+        statement = self.insert(Races).values(
+            discord_id=str(discord_id),
+            location_id=guild_id,
+            wins=int(won),
+            points=points,
+        )
+        statement = statement.on_conflict_do_update(
+            index_elements=[Races.discord_id, Races.location_id],
+            set_={
+                "wins": Races.wins + statement.excluded.wins,
+                "points": Races.points + statement.excluded.points,
+            },
+        ).returning(Races.wins, Races.points)
+        async with self.engine.begin() as conn:
+            return (await conn.execute(statement)).one()
+
+    async def leaderboard(self, guild_id: int, *, limit: int = 10) -> list[Row]:
+        async with self.engine.connect() as conn:
+            query = await conn.execute(
+                select(Races.discord_id, Races.wins, Races.points)
+                .where(Races.location_id == guild_id)
+                .order_by(Races.points.desc())
+                .limit(limit)
+            )
+            return list(query.all())
+
+
+class PingRepository(Repository):
+    async def record(self, ping_ws: int, ping_rest: int) -> None:
+        async with self.engine.begin() as conn:
+            await conn.execute(
+                self.insert(Ping).values(
+                    ping_ws=ping_ws, ping_rest=ping_rest, date=datetime.date.today()
+                )
+            )
+
+    async def averages(self, since: datetime.date) -> Optional[Row]:
+        """
+        Average websocket and REST latency recorded since ``since``, or None
+        when nothing was recorded.
+        """
+        async with self.engine.connect() as conn:
+            query = await conn.execute(
+                select(
+                    func.avg(Ping.ping_ws).label("ping_ws"),
+                    func.avg(Ping.ping_rest).label("ping_rest"),
+                    func.count().label("samples"),
+                ).where(Ping.date >= since)
+            )
+            row = query.one()
+            return row if row.samples else None
+
+
+class BannedWordRepository(Repository):
+    async def words(self, guild_id: int) -> list[str]:
+        async with self.engine.connect() as conn:
+            query = await conn.execute(
+                select(BannedWord.word)
+                .where(BannedWord.guild_id == guild_id)
+                .order_by(BannedWord.word)
+            )
+            return list(query.scalars())
+
+    async def add(self, guild_id: int, word: str, added_by: int) -> bool:
+        """
+        Bans ``word`` in a guild, returning False if it was already banned
+        there in any casing.
+        """
+        statement = (
+            self.insert(BannedWord)
+            .values(guild_id=guild_id, word=word, added_by=str(added_by))
+            .on_conflict_do_nothing()
+            .returning(BannedWord.id)
+        )
+        async with self.engine.begin() as conn:
+            return (await conn.execute(statement)).first() is not None
+
+    async def remove(self, guild_id: int, word: str) -> bool:
+        async with self.engine.begin() as conn:
+            result = await conn.execute(
+                delete(BannedWord).where(
+                    BannedWord.guild_id == guild_id,
+                    func.lower(BannedWord.word) == word.lower(),
+                )
+            )
+            return result.rowcount > 0
+
+
+@dataclass(frozen=True)
+class Repositories:
+    tags: TagRepository
+    users: UserRepository
+    races: RaceRepository
+    pings: PingRepository
+    banned_words: BannedWordRepository
+
+    @classmethod
+    def from_engine(cls, engine: AsyncEngine) -> Repositories:
+        return cls(
+            tags=TagRepository(engine),
+            users=UserRepository(engine),
+            races=RaceRepository(engine),
+            pings=PingRepository(engine),
+            banned_words=BannedWordRepository(engine),
+        )
+
+
+async def memory_engine() -> AsyncEngine:
+    """
+    An in-memory SQLite engine with every table created, for exercising the
+    repositories without a Postgres server. Needs ``aiosqlite``.
+    """
+    engine = create_async_engine(
+        "sqlite+aiosqlite://",
+        poolclass=StaticPool,
+        connect_args={"check_same_thread": False},
+    )
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    return engine
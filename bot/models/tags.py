@@ -1,5 +1,5 @@
 from models.db import Base
-from sqlalchemy import BIGINT, VARCHAR, Column, Integer, String
+from sqlalchemy import BIGINT, VARCHAR, Column, Index, Integer, String, func
 
 
 class CustomTags(Base):
@@ -31,3 +31,12 @@ class CustomTags(Base):
     content = Column(VARCHAR(2000), nullable=False)
     called = Column(Integer, nullable=False, default=0)
     date_added = Column(VARCHAR(255), nullable=False)
+
+    __table_args__ = (
+        Index(
+            "ix_tags_location_id_lower_name",
+            location_id,
+            func.lower(name),
+            unique=True,
+        ),
+    )
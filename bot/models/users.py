@@ -1,5 +1,5 @@
 from models.db import Base
-from sqlalchemy import DATE, VARCHAR, Column, Integer
+from sqlalchemy import DATE, VARCHAR, Column, Index, Integer
 
 
 class DiscordUser(Base):
@@ -34,3 +34,9 @@ class DiscordUser(Base):
     kira_percentage = Column(Integer, nullable=True)
     level = Column(Integer, nullable=True)
     xp = Column(Integer, nullable=True)
+
+    __table_args__ = (
+        Index(
+            "ix_discord_users_discord_id_guild_id", discord_id, guild_id, unique=True
+        ),
+    )
@@ -0,0 +1,21 @@
+from __future__ import annotations
+
+from typing import Any
+from unittest.mock import AsyncMock, MagicMock
+
+from discord.ext.commands.view import StringView
+from utils.context import Context
+
+
+def make_context(bot: Any = None) -> Context:
+    """
+    A Context around a fake message whose ``send`` records what was sent.
+    """
+    ctx = Context(message=MagicMock(), bot=bot or MagicMock(), view=StringView(""))
+    ctx.send = AsyncMock()
+    return ctx
+
+
+def sent_text(ctx: Context) -> str:
+    args, kwargs = ctx.send.call_args
+    return args[0] if args else kwargs["content"]
@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+import unittest
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from cogs.admin import Admin
+from discord.ext.commands.bot import BotBase
+from models.db import DatabaseConfig
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from tests.helpers import make_context, sent_text
+from utils.context import Context
+from utils.http_client import HTTPClient
+from utils.response_cache import ResponseCache
+from utils.scheduler import AIScheduler
+
+from bot import Konikotaka
+
+
+class GetContextTest(unittest.IsolatedAsyncioTestCase):
+    async def test_uses_custom_context(self) -> None:
+        client = Konikotaka.__new__(Konikotaka)
+        with patch.object(BotBase, "get_context", AsyncMock()) as get_context:
+            await client.get_context(MagicMock())
+        self.assertIs(get_context.call_args.kwargs["cls"], Context)
+
+
+class AdminStatsTest(unittest.IsolatedAsyncioTestCase):
+    async def run_command(self, name: str, client: SimpleNamespace) -> str:
+        cog = Admin(client)
+        ctx = make_context(client)
+        command = next(c for c in cog.get_commands() if c.name == name)
+        await command.callback(cog, ctx)
+        return sent_text(ctx)
+
+    async def test_httpcache(self) -> None:
+        client = SimpleNamespace(
+            http_cache=SimpleNamespace(stats={"hits": 3, "misses": 1})
+        )
+        text = await self.run_command("httpcache", client)
+        self.assertIn("hits  : 3", text)
+        self.assertIn("misses: 1", text)
+
+    async def test_circuits(self) -> None:
+        http_client = HTTPClient(MagicMock(), MagicMock(), failure_threshold=1)
+        http_client.breaker("api.example.com").record_failure()
+        client = SimpleNamespace(http_client=http_client)
+        text = await self.run_command("circuits", client)
+        self.assertIn("api.example.com: open (1 failures)", text)
+
+    async def test_aiqueue(self) -> None:
+        scheduler = AIScheduler(MagicMock(), concurrency=2)
+        async with scheduler.slot(1, "chat"):
+            pass
+        cog = SimpleNamespace(scheduler=scheduler)
+        client = SimpleNamespace(get_cog=lambda name: cog if name == "Ai" else None)
+        text = await self.run_command("aiqueue", client)
+        self.assertIn("served  : 1", text)
+        self.assertIn("wait p95:", text)
+
+    async def test_aiqueue_without_ai_cog(self) -> None:
+        client = SimpleNamespace(get_cog=lambda name: None)
+        text = await self.run_command("aiqueue", client)
+        self.assertEqual(text, "The Ai cog is not loaded.")
+
+    async def test_aicache(self) -> None:
+        cache = ResponseCache()
+        cache.put("persona", "who are you", "a bot")
+        cache.get("persona", "who are you")
+        cog = SimpleNamespace(response_cache=cache)
+        client = SimpleNamespace(get_cog=lambda name: cog)
+        text = await self.run_command("aicache", client)
+        self.assertIn("entries  : 1", text)
+        self.assertIn("hits     : 1", text)
+
+    async def test_dbpool(self) -> None:
+        config = DatabaseConfig(pool_size=2, max_overflow=2)
+        engine = create_async_engine(
+            "sqlite+aiosqlite://",
+            poolclass=AsyncAdaptedQueuePool,
+            pool_size=config.pool_size,
+            max_overflow=config.max_overflow,
+        )
+        client = SimpleNamespace(engine=engine, db_config=config)
+        try:
+            async with engine.connect():
+                text = await self.run_command("dbpool", client)
+        finally:
+            await engine.dispose()
+        self.assertIn("max overflow   : 2", text)
+        self.assertIn("checked out    : 1", text)
+        self.assertIn("utilization    : 25%", text)
+
+
+if __name__ == "__main__":
+    unittest.main()
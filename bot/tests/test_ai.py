@@ -0,0 +1,35 @@
+from __future__ import annotations
+
+import unittest
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+from cogs.ai import Ai
+from tests.helpers import make_context, sent_text
+
+
+class BanwordListTest(unittest.IsolatedAsyncioTestCase):
+    async def list_words(self, words: list[str]):
+        cog = SimpleNamespace(moderator=SimpleNamespace(guild_words=AsyncMock()))
+        cog.moderator.guild_words.return_value = words
+        ctx = make_context()
+        await Ai.banword.callback(cog, ctx)
+        return ctx
+
+    async def test_lists_words(self) -> None:
+        ctx = await self.list_words(["foo", "bar"])
+        self.assertEqual(sent_text(ctx), "`foo`, `bar`")
+
+    async def test_long_list_is_sent_as_file(self) -> None:
+        ctx = await self.list_words([f"word{i}" for i in range(300)])
+        self.assertEqual(
+            ctx.send.call_args.kwargs["file"].filename, "message_too_long.txt"
+        )
+
+    async def test_no_words(self) -> None:
+        ctx = await self.list_words([])
+        self.assertEqual(sent_text(ctx), "No extra banned words in this server.")
+
+
+if __name__ == "__main__":
+    unittest.main()
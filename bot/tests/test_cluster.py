@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import signal
+import time
+import unittest
+from unittest.mock import MagicMock
+
+from cluster import Cluster, ClusterSupervisor
+from utils.ipc import ClusterClient
+
+from bot import serve
+
+
+class SupervisorIPCTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self) -> None:
+        self.supervisor = ClusterSupervisor(
+            MagicMock(), 2, "token", MagicMock(), query_timeout=5.0
+        )
+        self.supervisor.clusters = [Cluster(0, [0]), Cluster(1, [1])]
+        self.server = await asyncio.start_server(self.supervisor._serve, "127.0.0.1", 0)
+        self.port = self.server.sockets[0].getsockname()[1]
+        self.clients: list[ClusterClient] = []
+
+    async def asyncTearDown(self) -> None:
+        for client in self.clients:
+            await client.close()
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def connect(self, cluster_id: int) -> ClusterClient:
+        async def stats() -> dict:
+            return {"cluster": cluster_id}
+
+        client = ClusterClient(
+            self.port,
+            self.supervisor.secret,
+            cluster_id,
+            {"stats": stats},
+            MagicMock(),
+        )
+        client.start()
+        self.clients.append(client)
+        while self.supervisor.clusters[cluster_id].writer is None:
+            await asyncio.sleep(0.01)
+        return client
+
+    async def test_relay_answers_once_every_cluster_responded(self) -> None:
+        first = await self.connect(0)
+        await self.connect(1)
+        started = time.monotonic()
+        result = await first.query("stats")
+        self.assertEqual(result, [{"cluster": 0}, {"cluster": 1}])
+        self.assertLess(time.monotonic() - started, 1.0)
+
+    async def test_invalid_hellos_are_dropped(self) -> None:
+        secret = self.supervisor.secret
+        hellos = [
+            "not json",
+            "[]",
+            json.dumps({"op": "identify", "secret": "wrong", "cluster": 0}),
+            json.dumps({"op": "identify", "secret": 1, "cluster": 0}),
+            json.dumps({"op": "identify", "secret": secret}),
+            json.dumps({"op": "identify", "secret": secret, "cluster": "0"}),
+            json.dumps({"op": "identify", "secret": secret, "cluster": -1}),
+            json.dumps({"op": "identify", "secret": secret, "cluster": 2}),
+        ]
+        for hello in hellos:
+            reader, writer = await asyncio.open_connection("127.0.0.1", self.port)
+            writer.write(hello.encode() + b"\n")
+            await writer.drain()
+            self.assertEqual(await asyncio.wait_for(reader.read(), 1.0), b"", hello)
+            writer.close()
+        self.assertTrue(all(c.writer is None for c in self.supervisor.clusters))
+
+
+class FakeClient:
+    def __init__(self) -> None:
+        self.closed = asyncio.Event()
+        self.close_finished = False
+
+    async def __aenter__(self) -> FakeClient:
+        return self
+
+    async def __aexit__(self, *args) -> None:
+        pass
+
+    async def start(self, token: str, *, reconnect: bool) -> None:
+        await self.closed.wait()
+
+    async def close(self) -> None:
+        self.closed.set()
+        await asyncio.sleep(0.05)
+        self.close_finished = True
+
+
+class ServeTest(unittest.IsolatedAsyncioTestCase):
+    async def test_sigterm_closes_the_client(self) -> None:
+        client = FakeClient()
+        task = asyncio.create_task(serve(client, "token"))
+        await asyncio.sleep(0.05)
+        os.kill(os.getpid(), signal.SIGTERM)
+        await asyncio.wait_for(task, 1.0)
+        self.assertTrue(client.close_finished)
+
+
+if __name__ == "__main__":
+    unittest.main()
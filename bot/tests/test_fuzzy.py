@@ -0,0 +1,41 @@
+from __future__ import annotations
+
+import unittest
+
+from utils.fuzzy import TrigramIndex, trigrams
+
+
+class TrigramsTest(unittest.TestCase):
+    def test_pads_each_word_like_pg_trgm(self) -> None:
+        # SELECT show_trgm('Two words!')
+        expected = {
+            "  t",
+            " tw",
+            "two",
+            "wo ",
+            "  w",
+            " wo",
+            "wor",
+            "ord",
+            "rds",
+            "ds ",
+        }
+        self.assertEqual(trigrams("Two words!"), expected)
+
+    def test_punctuation_only(self) -> None:
+        self.assertEqual(trigrams("?!_"), frozenset())
+
+
+class TrigramIndexTest(unittest.TestCase):
+    def test_search(self) -> None:
+        index = TrigramIndex()
+        for name in ("hello world", "help", "goodbye", "!!"):
+            index.add(name)
+        names = [name for name, _ in index.search("hello")]
+        self.assertEqual(names[0], "hello world")
+        self.assertNotIn("goodbye", names)
+        self.assertEqual([name for name, _ in index.search("!")], ["!!"])
+
+
+if __name__ == "__main__":
+    unittest.main()
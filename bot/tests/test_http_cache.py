@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+import asyncio
+import itertools
+import unittest
+from types import SimpleNamespace
+from typing import Any
+
+from utils.http_cache import HTTPCache
+
+
+class FakeHTTP:
+    """
+    Returns an increasing counter for every request, once ``release`` is set.
+    """
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.release = asyncio.Event()
+        self._values = itertools.count(1)
+
+    async def get(self, url: str, **kwargs: Any) -> SimpleNamespace:
+        self.calls += 1
+        await self.release.wait()
+        value = next(self._values)
+        return SimpleNamespace(json=lambda: value, text=lambda: str(value))
+
+
+class HTTPCacheTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        self.http = FakeHTTP()
+        self.cache = HTTPCache(self.http)
+
+    async def test_coalesces_cached_urls(self) -> None:
+        first = asyncio.create_task(self.cache.get_json("u", ttl=60))
+        second = asyncio.create_task(self.cache.get_json("u", ttl=60))
+        await asyncio.sleep(0)
+        self.http.release.set()
+        self.assertEqual(await asyncio.gather(first, second), [1, 1])
+        self.assertEqual(await self.cache.get_json("u", ttl=60), 1)
+        self.assertEqual(self.http.calls, 1)
+        self.assertEqual(self.cache.stats["coalesced"], 1)
+        self.assertEqual(self.cache.stats["hits"], 1)
+
+    async def test_cancelling_first_caller_keeps_fetch_for_others(self) -> None:
+        first = asyncio.create_task(self.cache.get_json("u", ttl=60))
+        second = asyncio.create_task(self.cache.get_json("u", ttl=60))
+        await asyncio.sleep(0)
+        first.cancel()
+        await asyncio.sleep(0)
+        self.http.release.set()
+        self.assertEqual(await second, 1)
+        self.assertTrue(first.cancelled())
+        self.assertEqual(self.http.calls, 1)
+
+    async def test_random_endpoints_are_not_coalesced(self) -> None:
+        first = asyncio.create_task(self.cache.get_json("random"))
+        second = asyncio.create_task(self.cache.get_json("random"))
+        await asyncio.sleep(0)
+        self.http.release.set()
+        self.assertEqual(sorted(await asyncio.gather(first, second)), [1, 2])
+        self.assertEqual(len(self.cache), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
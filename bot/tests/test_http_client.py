@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+import os
+import tempfile
+import unittest
+from unittest.mock import MagicMock
+
+from aiohttp import ClientResponseError, ClientSession, web
+from aiohttp.test_utils import TestServer
+from utils.http_client import CircuitOpenError, HTTPClient, PayloadTooLarge
+
+
+class DownloadBreakerTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self) -> None:
+        self.statuses: list[int] = []
+
+        async def handler(request: web.Request) -> web.Response:
+            status = self.statuses.pop(0) if self.statuses else 200
+            return web.Response(status=status, body=b"image")
+
+        app = web.Application()
+        app.router.add_get("/image.png", handler)
+        self.server = TestServer(app)
+        await self.server.start_server()
+        self.session = ClientSession()
+        self.http = HTTPClient(
+            self.session, MagicMock(), failure_threshold=1, reset_after=0.0
+        )
+        self.url = str(self.server.make_url("/image.png"))
+        self.host = self.server.make_url("/").host
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, "image.png")
+
+    async def asyncTearDown(self) -> None:
+        await self.session.close()
+        await self.server.close()
+        self.dir.cleanup()
+
+    async def test_server_error_counts_as_failure(self) -> None:
+        self.statuses = [503]
+        with self.assertRaises(ClientResponseError):
+            await self.http.download(self.url, self.path)
+        self.assertEqual(self.http.breaker(self.host).failures, 1)
+        self.assertFalse(os.path.exists(self.path))
+
+    async def test_failed_probe_allows_another_probe(self) -> None:
+        self.statuses = [503, 503]
+        for _ in range(2):
+            with self.assertRaises(ClientResponseError):
+                await self.http.download(self.url, self.path)
+        breaker = self.http.breaker(self.host)
+        self.assertFalse(breaker.probing)
+        self.assertEqual(await self.http.download(self.url, self.path), 5)
+        self.assertEqual(breaker.state, "closed")
+
+    async def test_client_error_closes_probe(self) -> None:
+        self.statuses = [503, 404]
+        for _ in range(2):
+            with self.assertRaises(ClientResponseError):
+                await self.http.download(self.url, self.path)
+        self.assertEqual(self.http.breaker(self.host).state, "closed")
+
+    async def test_oversize_download_leaves_breaker_closed(self) -> None:
+        for _ in range(3):
+            with self.assertRaises(PayloadTooLarge):
+                await self.http.download(self.url, self.path, max_bytes=4)
+        breaker = self.http.breaker(self.host)
+        self.assertEqual((breaker.state, breaker.failures), ("closed", 0))
+        self.assertFalse(os.path.exists(self.path))
+        self.assertEqual(await self.http.download(self.url, self.path), 5)
+
+    async def test_open_breaker_fails_fast(self) -> None:
+        self.http.reset_after = 60.0
+        self.statuses = [503]
+        with self.assertRaises(ClientResponseError):
+            await self.http.download(self.url, self.path)
+        with self.assertRaises(CircuitOpenError):
+            await self.http.download(self.url, self.path)
+
+
+if __name__ == "__main__":
+    unittest.main()
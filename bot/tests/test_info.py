@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+import asyncio
+import datetime
+import unittest
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from cogs.info import Info
+from models.repositories import Repositories, memory_engine
+from sqlalchemy.exc import OperationalError
+from tests.helpers import make_context
+
+
+class PingTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self) -> None:
+        self.engine = await memory_engine()
+        self.client = SimpleNamespace(
+            repositories=Repositories.from_engine(self.engine),
+            get_bot_latency=42,
+            gather_cluster_stats=AsyncMock(return_value=[]),
+            log=MagicMock(),
+        )
+        with patch.dict("os.environ", {"CLIENT_ID": "1"}):
+            self.cog = Info(self.client)
+
+    async def asyncTearDown(self) -> None:
+        await self.engine.dispose()
+
+    async def ping(self) -> str:
+        ctx = make_context(self.client)
+        await self.cog.ping.callback(self.cog, ctx)
+        return ctx.send.return_value.edit.call_args.kwargs["content"]
+
+    async def recorded(self) -> None:
+        await asyncio.gather(*self.cog._recording)
+
+    async def test_records_latency(self) -> None:
+        await self.ping()
+        content = await self.ping()
+        self.assertIn("Latency: **42ms**", content)
+        await self.recorded()
+        row = await self.client.repositories.pings.averages(datetime.date.today())
+        self.assertEqual((row.ping_ws, row.samples), (42, 2))
+
+    async def test_reply_does_not_wait_for_database(self) -> None:
+        written = asyncio.Event()
+
+        async def slow_record(ws: int, rest: int) -> None:
+            await written.wait()
+
+        self.client.repositories.pings.record = AsyncMock(side_effect=slow_record)
+        content = await self.ping()
+        self.assertIn("Latency: **42ms**", content)
+        written.set()
+        await self.recorded()
+        self.client.repositories.pings.record.assert_awaited_once()
+
+    async def test_database_errors_do_not_break_ping(self) -> None:
+        self.client.repositories.pings.record = AsyncMock(
+            side_effect=OperationalError("INSERT", {}, Exception("down"))
+        )
+        content = await self.ping()
+        self.assertIn("Latency: **42ms**", content)
+        await self.recorded()
+        self.client.log.warning.assert_called_once()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+import asyncio
+import datetime
+import unittest
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+from utils.member_sync import MemberSync
+
+
+def make_member(user_id: int, name: str, guild_id: int = 10) -> SimpleNamespace:
+    return SimpleNamespace(
+        id=user_id,
+        name=name,
+        joined_at=datetime.datetime(2024, 1, 1),
+        guild=SimpleNamespace(id=guild_id),
+    )
+
+
+class MemberSyncTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        self.repository = MagicMock(upsert=AsyncMock(), delete=AsyncMock())
+        self.sync = MemberSync(self.repository, MagicMock(), delay=60)
+
+    async def asyncTearDown(self) -> None:
+        if self.sync._flush_task is not None:
+            self.sync._flush_task.cancel()
+
+    async def test_failed_batch_is_retried(self) -> None:
+        self.repository.upsert.side_effect = [RuntimeError("down"), None]
+        self.sync.queue_upsert(make_member(1, "old"))
+        self.sync.queue_delete(10, 2)
+        await self.sync.flush()
+        self.assertEqual(self.sync.pending, 2)
+        self.repository.delete.assert_not_awaited()
+
+        self.sync.queue_upsert(make_member(1, "new"))
+        await self.sync.flush()
+        self.assertEqual(self.sync.pending, 0)
+        rows = self.repository.upsert.await_args.args[0]
+        self.assertEqual([row["username"] for row in rows], ["new"])
+        self.assertEqual(self.repository.delete.await_args.args[0], {("2", "10")})
+
+    async def test_newer_delete_wins_over_failed_upsert(self) -> None:
+        self.repository.upsert.side_effect = RuntimeError("down")
+        self.sync.queue_upsert(make_member(1, "gone"))
+        write = asyncio.create_task(self.sync.flush())
+        await asyncio.sleep(0)
+        self.sync.queue_delete(10, 1)
+        await write
+        self.assertEqual(self.sync._upserts, {})
+        self.assertEqual(self.sync._deletes, {("1", "10")})
+
+    async def test_close_waits_for_flush_in_progress(self) -> None:
+        release = asyncio.Event()
+
+        async def slow_upsert(rows: list) -> None:
+            await release.wait()
+
+        self.repository.upsert.side_effect = slow_upsert
+        self.sync.delay = 0
+        self.sync.queue_upsert(make_member(1, "a"))
+        await asyncio.sleep(0.01)
+        self.assertTrue(self.sync._lock.locked())
+
+        close = asyncio.create_task(self.sync.close())
+        await asyncio.sleep(0.01)
+        self.assertFalse(close.done())
+        release.set()
+        await close
+        self.repository.upsert.assert_awaited_once()
+        self.assertEqual(self.sync.pending, 0)
+
+    async def test_cancelled_write_keeps_batch(self) -> None:
+        async def hang(rows: list) -> None:
+            await asyncio.Event().wait()
+
+        self.repository.upsert.side_effect = hang
+        self.sync.queue_upsert(make_member(1, "a"))
+        write = asyncio.create_task(self.sync.flush())
+        await asyncio.sleep(0)
+        write.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await write
+        self.assertEqual(self.sync.pending, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
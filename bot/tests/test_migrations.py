@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+import unittest
+from unittest.mock import MagicMock, patch
+
+from models.migrations import Migration, run_migrations
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+
+from bot import Konikotaka
+
+BROKEN = "CREATE EXTENSION pg_trgm"
+
+
+async def tables(engine: AsyncEngine) -> set[str]:
+    async with engine.connect() as conn:
+        query = await conn.execute(
+            text("SELECT name FROM sqlite_master WHERE type = 'table'")
+        )
+        return set(query.scalars())
+
+
+class RunMigrationsTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self) -> None:
+        self.engine = create_async_engine("sqlite+aiosqlite://")
+        self.log = MagicMock()
+
+    async def asyncTearDown(self) -> None:
+        await self.engine.dispose()
+
+    def migrations(self, optional: bool) -> tuple[Migration, ...]:
+        return (
+            Migration(1, "a", ("CREATE TABLE a (id INTEGER)",)),
+            Migration(2, "extension", (BROKEN,), optional=optional),
+            Migration(3, "b", ("CREATE TABLE b (id INTEGER)",)),
+        )
+
+    async def test_failing_optional_migration_is_skipped(self) -> None:
+        with patch("models.migrations.MIGRATIONS", self.migrations(True)):
+            self.assertEqual(await run_migrations(self.engine, self.log), 2)
+            self.assertTrue({"a", "b"} <= await tables(self.engine))
+            self.log.warning.assert_called_once()
+            # Retried, and still skipped, on the next start.
+            self.assertEqual(await run_migrations(self.engine, self.log), 0)
+            self.assertEqual(self.log.warning.call_count, 2)
+
+    async def test_failing_migration_stops_later_ones(self) -> None:
+        with patch("models.migrations.MIGRATIONS", self.migrations(False)):
+            with self.assertRaises(DBAPIError):
+                await run_migrations(self.engine, self.log)
+        found = await tables(self.engine)
+        self.assertIn("a", found)
+        self.assertNotIn("b", found)
+
+    async def test_startup_stops_on_failed_migration(self) -> None:
+        client = Konikotaka.__new__(Konikotaka)
+        client.engine = self.engine
+        client.log = self.log
+        with patch("models.migrations.MIGRATIONS", self.migrations(False)):
+            with self.assertRaises(DBAPIError):
+                await client.init_database()
+        self.log.critical.assert_called_once()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,45 @@
+from __future__ import annotations
+
+import unittest
+from unittest.mock import MagicMock
+
+from models.repositories import BannedWordRepository, memory_engine
+from utils.moderation import PromptModerator, WordFilter
+
+
+class WordFilterTest(unittest.TestCase):
+    def test_whole_words_and_plurals(self) -> None:
+        word_filter = WordFilter(["Blood", "Bloodbath", "clear"])
+        self.assertEqual(word_filter.match("a BLOODBATHS here"), "Bloodbath")
+        self.assertIsNone(word_filter.match("nuclear"))
+
+
+class PromptModeratorTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self) -> None:
+        self.engine = await memory_engine()
+        self.repository = BannedWordRepository(self.engine)
+        self.moderator = PromptModerator(self.repository, MagicMock(), ["gore"])
+
+    async def asyncTearDown(self) -> None:
+        await self.engine.dispose()
+
+    async def test_guild_words(self) -> None:
+        self.assertTrue(await self.moderator.add(1, "  Big   Dog ", 42))
+        self.assertFalse(await self.moderator.add(1, "big dog", 42))
+        self.assertEqual(await self.moderator.check(1, "a big dog"), "Big Dog")
+        self.assertEqual(await self.moderator.check(1, "gore"), "gore")
+        self.assertIsNone(await self.moderator.check(2, "a big dog"))
+
+        self.assertTrue(await self.moderator.remove(1, "BIG DOG"))
+        self.assertFalse(await self.moderator.remove(1, "big dog"))
+        self.assertIsNone(await self.moderator.check(1, "a big dog"))
+
+    async def test_word_banned_by_another_process(self) -> None:
+        self.assertEqual(await self.moderator.guild_words(1), [])
+        await self.repository.add(1, "Cat", 7)
+        self.assertFalse(await self.moderator.add(1, "cat", 42))
+        self.assertEqual(await self.moderator.guild_words(1), ["Cat"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,51 @@
+from __future__ import annotations
+
+import datetime
+import unittest
+
+from models.repositories import Repositories, memory_engine
+
+
+class RepositoriesTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self) -> None:
+        self.engine = await memory_engine()
+        self.repositories = Repositories.from_engine(self.engine)
+
+    async def asyncTearDown(self) -> None:
+        await self.engine.dispose()
+
+    async def test_ping_averages(self) -> None:
+        pings = self.repositories.pings
+        today = datetime.date.today()
+        self.assertIsNone(await pings.averages(today))
+        await pings.record(40, 100)
+        await pings.record(60, 200)
+        row = await pings.averages(today)
+        self.assertEqual((row.ping_ws, row.ping_rest, row.samples), (50, 150, 2))
+        self.assertIsNone(await pings.averages(today + datetime.timedelta(days=1)))
+
+    async def test_race_results_accumulate(self) -> None:
+        races = self.repositories.races
+        first = await races.record(1, 10, points=5, won=True)
+        self.assertEqual((first.wins, first.points), (1, 5))
+        second = await races.record(1, 10, points=3, won=False)
+        self.assertEqual((second.wins, second.points), (1, 8))
+        await races.record(2, 10, points=20, won=True)
+        await races.record(1, 11, points=50, won=True)
+        board = await races.leaderboard(10)
+        self.assertEqual(
+            [(r.discord_id, r.points) for r in board], [("2", 20), ("1", 8)]
+        )
+
+    async def test_tag_calls(self) -> None:
+        tags = self.repositories.tags
+        tag = await tags.create(1, "Hello", "world", 42, "2024-01-01")
+        self.assertIsNone(await tags.create(1, "hello ", "again", 7, "2024-01-02"))
+        await tags.add_calls({tag.id: 3})
+        row = await tags.get(1, "hello")
+        self.assertEqual((row.content, row.called), ("world", 3))
+        self.assertEqual([r.name for r in await tags.similar(1, "hel")], [])
+
+
+if __name__ == "__main__":
+    unittest.main()
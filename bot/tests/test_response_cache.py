@@ -0,0 +1,83 @@
+from __future__ import annotations
+
+import unittest
+
+from utils.response_cache import (
+    NAME_PLACEHOLDER,
+    ResponseCache,
+    name_template,
+    normalize,
+)
+
+
+class NormalizeTest(unittest.TestCase):
+    def test_folds_case_whitespace_and_mentions(self) -> None:
+        self.assertEqual(normalize("<@!1234>  Who   ARE you"), "who are you")
+
+    def test_keeps_operators(self) -> None:
+        self.assertNotEqual(normalize("what is 2+2"), normalize("what is 2-2"))
+
+
+class ResponseCacheTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.cache = ResponseCache()
+
+    def test_exact_hit(self) -> None:
+        self.cache.put("p", "Who are you", "a bot")
+        self.assertEqual(self.cache.get("p", "who  are YOU"), "a bot")
+        self.assertEqual(self.cache.stats["hits"], 1)
+
+    def test_different_operator_misses(self) -> None:
+        self.cache.put("p", "what is 2+2", "4")
+        self.assertIsNone(self.cache.get("p", "what is 2-2"))
+
+    def test_similar_prompt_misses(self) -> None:
+        self.cache.put("p", "capital of france", "Paris")
+        self.assertIsNone(self.cache.get("p", "capital of frances"))
+
+    def test_other_persona_misses(self) -> None:
+        self.cache.put("p", "who are you", "a bot")
+        self.assertIsNone(self.cache.get("q", "who are you"))
+
+
+class NearMatchTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.cache = ResponseCache(threshold=0.8)
+
+    def test_off_by_default(self) -> None:
+        self.assertIsNone(ResponseCache().threshold)
+
+    def test_serves_similar_prompt(self) -> None:
+        self.cache.put("p", "who are you?", "a bot")
+        self.assertEqual(self.cache.get("p", "who are you"), "a bot")
+        self.assertEqual(self.cache.stats["near hits"], 1)
+
+    def test_operators_must_match(self) -> None:
+        self.cache.put("p", "what is 2+2", "4")
+        self.assertIsNone(self.cache.get("p", "what is 2-2"))
+        self.assertIsNone(self.cache.get("p", "what is 2+3"))
+        self.assertEqual(self.cache.get("p", "what is 2 + 2?"), "4")
+
+    def test_other_persona_misses(self) -> None:
+        self.cache.put("p", "who are you", "a bot")
+        self.assertIsNone(self.cache.get("q", "who are you?"))
+
+
+class NameTemplateTest(unittest.TestCase):
+    def test_without_name(self) -> None:
+        self.assertEqual(name_template("Paris.", "Max"), "Paris.")
+
+    def test_greeting_is_replaced(self) -> None:
+        self.assertEqual(
+            name_template("Hey Max, it is Paris.", "Max"),
+            f"Hey {NAME_PLACEHOLDER}, it is Paris.",
+        )
+
+    def test_name_used_as_word_is_not_cached(self) -> None:
+        self.assertIsNone(name_template("Turn it up to max volume.", "Max"))
+        self.assertIsNone(name_template("Will you? I will, Will!", "Will"))
+        self.assertIsNone(name_template("Hope this helps", "Hope"))
+
+
+if __name__ == "__main__":
+    unittest.main()
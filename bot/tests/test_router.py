@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+import unittest
+from types import SimpleNamespace
+from typing import Optional
+from unittest.mock import AsyncMock, MagicMock
+
+from utils.router import MessageRouter
+
+ME = 1
+
+
+def make_message(
+    content: str = "hello",
+    author_id: int = 2,
+    bot: bool = False,
+    mentions: tuple[int, ...] = (),
+    mention_everyone: bool = False,
+    guild_id: Optional[int] = 10,
+) -> SimpleNamespace:
+    return SimpleNamespace(
+        content=content,
+        author=SimpleNamespace(id=author_id, bot=bot),
+        mentions=[SimpleNamespace(id=user_id) for user_id in mentions],
+        mention_everyone=mention_everyone,
+        guild=SimpleNamespace(id=guild_id) if guild_id is not None else None,
+    )
+
+
+class MessageRouterTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        self.router = MessageRouter(MagicMock(), "!")
+        self.router.user_id = ME
+
+    async def test_skips_own_messages(self) -> None:
+        handler = AsyncMock()
+        self.router.register(handler, allow_bots=True)
+        await self.router.dispatch(make_message(author_id=ME, bot=True))
+        handler.assert_not_awaited()
+
+    async def test_skips_bots_unless_allowed(self) -> None:
+        humans, everyone = AsyncMock(), AsyncMock()
+        self.router.register(humans)
+        self.router.register(everyone, allow_bots=True)
+        await self.router.dispatch(make_message(bot=True))
+        humans.assert_not_awaited()
+        everyone.assert_awaited_once()
+
+    async def test_prefix_and_mention_routes(self) -> None:
+        commands, mentions = AsyncMock(), AsyncMock()
+        self.router.register(commands, has_prefix=True)
+        self.router.register(mentions, mentions_me=True)
+        await self.router.dispatch(make_message("plain chat"))
+        await self.router.dispatch(make_message("!ping"))
+        await self.router.dispatch(make_message("hi", mentions=(3, ME)))
+        await self.router.dispatch(
+            make_message("hi all", mentions=(ME,), mention_everyone=True)
+        )
+        self.assertEqual(commands.await_count, 1)
+        self.assertEqual(mentions.await_count, 1)
+
+    async def test_guild_filter(self) -> None:
+        handler = AsyncMock()
+        self.router.register(handler, guilds={10})
+        await self.router.dispatch(make_message(guild_id=11))
+        await self.router.dispatch(make_message(guild_id=None))
+        handler.assert_not_awaited()
+        await self.router.dispatch(make_message(guild_id=10))
+        handler.assert_awaited_once()
+
+    async def test_register_and_unregister_refresh_routes(self) -> None:
+        first, second = AsyncMock(), AsyncMock()
+        self.router.register(first)
+        await self.router.dispatch(make_message())
+        self.router.register(second)
+        await self.router.dispatch(make_message())
+        self.router.unregister(first)
+        await self.router.dispatch(make_message())
+        self.assertEqual(first.await_count, 2)
+        self.assertEqual(second.await_count, 2)
+
+    async def test_handler_failure_does_not_stop_others(self) -> None:
+        failing, other = AsyncMock(side_effect=RuntimeError), AsyncMock()
+        self.router.register(failing)
+        self.router.register(other)
+        await self.router.dispatch(make_message())
+        other.assert_awaited_once()
+        self.router.log.exception.assert_called_once()
+
+    async def test_bot_routes_still_skip_own_messages(self) -> None:
+        handler = AsyncMock()
+        self.router.register(handler, allow_bots=True, has_prefix=True)
+        await self.router.dispatch(make_message("!x", author_id=ME, bot=True))
+        await self.router.dispatch(make_message("!x", bot=True))
+        handler.assert_awaited_once()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,44 @@
+from __future__ import annotations
+
+import asyncio
+import unittest
+from unittest.mock import MagicMock
+
+from utils.scheduler import AIScheduler, QueueFullError, TokenBucket
+
+
+class AISchedulerTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        self.scheduler = AIScheduler(
+            MagicMock(),
+            concurrency=1,
+            max_queued_per_user=1,
+            limits={"image": TokenBucket.per_minute(1)},
+        )
+
+    async def run_slot(self, user_id: int, kind: str) -> None:
+        async with self.scheduler.slot(user_id, kind):
+            pass
+
+    async def test_rate_limited_kind_does_not_hold_a_slot(self) -> None:
+        await self.run_slot(1, "image")
+        image = asyncio.create_task(self.run_slot(1, "image"))
+        await asyncio.sleep(0)
+        await asyncio.wait_for(self.run_slot(2, "chat"), timeout=1)
+        self.assertFalse(image.done())
+        self.assertEqual(self.scheduler.stats["running"], "0")
+        image.cancel()
+
+    async def test_full_queue_is_rejected_before_taking_a_token(self) -> None:
+        bucket = self.scheduler.limits["image"]
+        async with self.scheduler.slot(1, "chat"):
+            queued = asyncio.create_task(self.run_slot(1, "chat"))
+            await asyncio.sleep(0)
+            with self.assertRaises(QueueFullError):
+                await self.run_slot(1, "image")
+            self.assertEqual(bucket._tokens, 1)
+        await queued
+
+
+if __name__ == "__main__":
+    unittest.main()
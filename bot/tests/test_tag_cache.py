@@ -0,0 +1,37 @@
+from __future__ import annotations
+
+import unittest
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock
+
+from sqlalchemy.exc import DBAPIError
+from utils.tag_cache import TagCache
+
+
+def db_error(sqlstate: str) -> DBAPIError:
+    return DBAPIError("SELECT", {}, SimpleNamespace(sqlstate=sqlstate))
+
+
+class FetchSimilarTest(unittest.IsolatedAsyncioTestCase):
+    def make_cache(self, error: DBAPIError) -> TagCache:
+        repository = MagicMock()
+        repository.all = AsyncMock(return_value=[])
+        repository.similar = AsyncMock(side_effect=error)
+        return TagCache(repository, MagicMock())
+
+    async def test_missing_pg_trgm_disables_search(self) -> None:
+        cache = self.make_cache(db_error("42883"))
+        self.assertEqual(await cache.similar(1, "tag"), [])
+        self.assertFalse(cache.trigram_search)
+        self.assertEqual(await cache.similar(1, "tag"), [])
+        cache.repository.similar.assert_awaited_once()
+
+    async def test_other_errors_propagate(self) -> None:
+        cache = self.make_cache(db_error("57014"))
+        with self.assertRaises(DBAPIError):
+            await cache.similar(1, "tag")
+        self.assertTrue(cache.trigram_search)
+
+
+if __name__ == "__main__":
+    unittest.main()
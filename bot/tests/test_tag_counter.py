@@ -0,0 +1,51 @@
+from __future__ import annotations
+
+import asyncio
+import unittest
+from collections import Counter
+from typing import Mapping
+from unittest.mock import MagicMock
+
+from utils.tag_counter import TagCallCounter
+
+
+class SlowRepository:
+    def __init__(self, delay: float) -> None:
+        self.delay: float = delay
+        self.written: Counter[int] = Counter()
+        self.writing: asyncio.Event = asyncio.Event()
+
+    async def add_calls(self, deltas: Mapping[int, int]) -> None:
+        self.writing.set()
+        await asyncio.sleep(self.delay)
+        self.written.update(deltas)
+
+
+class TagCallCounterTest(unittest.IsolatedAsyncioTestCase):
+    async def test_close_waits_for_a_running_flush(self) -> None:
+        repository = SlowRepository(0.1)
+        counter = TagCallCounter(repository, MagicMock(), interval=0.01)
+        for _ in range(3):
+            counter.increment(1)
+        counter.start()
+        await repository.writing.wait()
+        counter.increment(1)
+        counter.increment(2)
+        await counter.close()
+        self.assertEqual(repository.written, Counter({1: 4, 2: 1}))
+        self.assertEqual(counter.pending, 0)
+
+    async def test_cancelled_flush_keeps_its_deltas(self) -> None:
+        repository = SlowRepository(60)
+        counter = TagCallCounter(repository, MagicMock())
+        counter.increment(1, 3)
+        task = asyncio.create_task(counter.flush())
+        await repository.writing.wait()
+        task.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await task
+        self.assertEqual(counter.pending, 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
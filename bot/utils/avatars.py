@@ -0,0 +1,136 @@
+from __future__ import annotations
+
+import asyncio
+import os
+from collections import OrderedDict
+from concurrent.futures import Executor
+from functools import partial
+from io import BytesIO
+from logging import Logger
+from typing import TYPE_CHECKING, Optional, Union
+
+from discord import Member, User
+from PIL import Image
+from utils.visa import PORTRAIT_SIZE
+
+if TYPE_CHECKING:
+    from utils.http_client import HTTPClient
+
+# Smallest CDN size that still covers the thumbnail's longest side.
+CDN_SIZE: int = 256
+
+
+class AvatarCache:
+    """
+    Size bounded LRU of avatar thumbnails, ready to paste onto a visa.
+
+    Entries are keyed by the avatar hash, which Discord changes whenever a
+    user uploads a new avatar, so a cached thumbnail never goes stale and
+    needs no revalidation against the CDN. Misses request the avatar at
+    ``CDN_SIZE`` as a static PNG, resize it in ``executor`` and, when
+    ``cache_dir`` is set, also persist it there so restarts start warm.
+    Concurrent misses for the same hash share one download.
+    """
+
+    def __init__(
+        self,
+        http: HTTPClient,
+        log: Logger,
+        *,
+        executor: Optional[Executor] = None,
+        max_entries: int = 512,
+        cache_dir: Optional[str] = None,
+    ) -> None:
+        self.http: HTTPClient = http
+        self.log: Logger = log
+        self.executor: Optional[Executor] = executor
+        self.max_entries: int = max_entries
+        self.cache_dir: Optional[str] = cache_dir
+        self.hits: int = 0
+        self.misses: int = 0
+        self._entries: OrderedDict[str, bytes] = OrderedDict()
+        self._inflight: dict[str, asyncio.Task] = {}
+        if cache_dir is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def stats(self) -> dict[str, int]:
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+    async def get(self, member: Union[Member, User]) -> bytes:
+        """
+        Returns a PNG thumbnail of the member's avatar, falling back to their
+        default avatar when they have not uploaded one.
+        """
+        asset = member.display_avatar
+        key = asset.key
+        thumbnail = self._entries.get(key)
+        if thumbnail is not None:
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return thumbnail
+
+        task = self._inflight.get(key)
+        if task is None:
+            self.misses += 1
+            url = asset.with_size(CDN_SIZE).with_static_format("png").url
+            task = self._inflight[key] = asyncio.create_task(self._load(key, url))
+            task.add_done_callback(partial(self._done, key))
+        thumbnail = await asyncio.shield(task)
+        self._entries[key] = thumbnail
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return thumbnail
+
+    def _done(self, key: str, task: asyncio.Task) -> None:
+        self._inflight.pop(key, None)
+        if not task.cancelled():
+            # Mark the exception as retrieved in case every waiter was cancelled.
+            task.exception()
+
+    def _path(self, key: str) -> Optional[str]:
+        if self.cache_dir is None:
+            return None
+        return os.path.join(self.cache_dir, f"{key}.png")
+
+    async def _load(self, key: str, url: str) -> bytes:
+        loop = asyncio.get_running_loop()
+        path = self._path(key)
+        if path is not None:
+            try:
+                return await loop.run_in_executor(self.executor, _read_file, path)
+            except OSError:
+                pass
+        response = await self.http.get(url, raise_for_status=True)
+        thumbnail = await loop.run_in_executor(
+            self.executor, _make_thumbnail, response.body
+        )
+        if path is not None:
+            try:
+                await loop.run_in_executor(self.executor, _write_file, path, thumbnail)
+            except OSError as e:
+                self.log.warning(f"Could not store avatar {key} on disk: {e}")
+        return thumbnail
+
+
+def _make_thumbnail(data: bytes) -> bytes:
+    image = Image.open(BytesIO(data)).convert("RGB").resize(PORTRAIT_SIZE)
+    buffer = BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def _read_file(path: str) -> bytes:
+    with open(path, "rb") as file:
+        return file.read()
+
+
+def _write_file(path: str, data: bytes) -> None:
+    # Write then rename so a crash never leaves a truncated thumbnail behind.
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as file:
+        file.write(data)
+    os.replace(tmp_path, path)
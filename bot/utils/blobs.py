@@ -0,0 +1,112 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import os
+from functools import partial
+from logging import Logger
+from typing import TYPE_CHECKING, Optional
+
+if TYPE_CHECKING:
+    from utils.http_client import HTTPClient
+
+
+class BlobStore:
+    """
+    Content-addressed files on local disk, sharded by the first bytes of
+    their key.
+
+    ``key`` hashes whatever identifies a blob (for generated images: the
+    model, prompt, size and style), so identical requests map to the same
+    file. Blobs are downloaded straight to disk. Once the store grows past
+    ``max_bytes`` the least recently used blobs are deleted; reads refresh a
+    blob's modification time.
+    """
+
+    def __init__(
+        self,
+        root: str,
+        http: HTTPClient,
+        log: Logger,
+        *,
+        suffix: str = "",
+        max_bytes: int = 2 * 1024**3,
+        max_blob_bytes: int = 25 * 1024**2,
+    ) -> None:
+        self.root: str = root
+        self.http: HTTPClient = http
+        self.log: Logger = log
+        self.suffix: str = suffix
+        self.max_bytes: int = max_bytes
+        self.max_blob_bytes: int = max_blob_bytes
+        self._inflight: dict[str, asyncio.Task] = {}
+        self._prune_task: Optional[asyncio.Task] = None
+        os.makedirs(root, exist_ok=True)
+
+    @staticmethod
+    def key(*parts: str) -> str:
+        return hashlib.sha256("\x1f".join(parts).encode()).hexdigest()
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], key[2:4], f"{key}{self.suffix}")
+
+    def get(self, key: str) -> Optional[str]:
+        path = self.path(key)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    async def fetch(self, key: str, url: str) -> str:
+        """
+        Downloads ``url`` into the blob for ``key`` and returns its path.
+        Concurrent fetches of the same key share one download.
+        """
+        task = self._inflight.get(key)
+        if task is None:
+            task = self._inflight[key] = asyncio.create_task(self._download(key, url))
+            task.add_done_callback(partial(self._done, key))
+        return await asyncio.shield(task)
+
+    def _done(self, key: str, task: asyncio.Task) -> None:
+        self._inflight.pop(key, None)
+        if not task.cancelled():
+            # Mark the exception as retrieved in case every waiter was cancelled.
+            task.exception()
+
+    async def _download(self, key: str, url: str) -> str:
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        await self.http.download(url, path, max_bytes=self.max_blob_bytes)
+        if self._prune_task is None or self._prune_task.done():
+            loop = asyncio.get_running_loop()
+            self._prune_task = asyncio.ensure_future(
+                loop.run_in_executor(None, self._prune)
+            )
+        return path
+
+    def _prune(self) -> None:
+        blobs = []
+        total = 0
+        for directory, _, files in os.walk(self.root):
+            for name in files:
+                path = os.path.join(directory, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                blobs.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+        if total <= self.max_bytes:
+            return
+        blobs.sort()
+        for _, size, path in blobs:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                continue
+            total -= size
+        self.log.info(f"Pruned blob store {self.root} to {total} bytes")
@@ -21,11 +21,15 @@ class Context(commands.Context):
     ]
     prefix: str
     command: commands.Command[Any, ..., Any]
-    client: Konikotaka
+    bot: Konikotaka
 
     def __init__(self, **kwargs) -> None:
         super().__init__(**kwargs)
 
+    @property
+    def client(self) -> Konikotaka:
+        return self.bot
+
     async def entry_to_code(self, entries: Iterable[tuple[str, str]]) -> None:
         width = max(len(a) for a, b in entries)
         output = ["```"]
@@ -88,4 +92,4 @@ class Context(commands.Context):
                 file=discord.File(fp, filename="message_too_long.txt"), **kwargs
             )
         else:
-            return await self.send(content)
+            return await self.send(content, **kwargs)
@@ -0,0 +1,151 @@
+from __future__ import annotations
+
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from logging import Logger
+from typing import Awaitable, Callable, Optional
+
+ChatMessage = dict[str, str]
+Summarizer = Callable[[str, list[ChatMessage]], Awaitable[str]]
+
+# Per-message overhead of the chat format, in tokens.
+MESSAGE_OVERHEAD: int = 4
+
+
+def estimate_tokens(message: ChatMessage) -> int:
+    """
+    Cheap token estimate of roughly four characters per token, close enough
+    for English text to keep prompts under budget without a tokenizer.
+    """
+    return len(message["content"]) // 4 + MESSAGE_OVERHEAD
+
+
+@dataclass
+class Conversation:
+    """
+    Rolling history of a single channel or thread.
+
+    Attributes:
+    - summary: str
+        Running summary of turns that no longer fit the token budget
+    - turns: deque
+        The most recent user and assistant messages, oldest first
+    - last_active: float
+        Monotonic time of the last recorded turn
+    """
+
+    summary: str = ""
+    turns: deque[ChatMessage] = field(default_factory=deque)
+    last_active: float = field(default_factory=time.monotonic)
+
+    @property
+    def tokens(self) -> int:
+        return sum(estimate_tokens(turn) for turn in self.turns)
+
+
+class ConversationStore:
+    """
+    Bounded per-channel chat history for the mention replies.
+
+    Each conversation keeps at most ``max_turns`` messages, each cut to
+    ``max_chars``. Once the recent turns exceed ``token_budget`` the oldest
+    ones are folded into a running summary with ``summarize``, or dropped if
+    no summarizer is set or it fails. Conversations idle for longer than
+    ``idle_timeout`` are forgotten, and the least recently used ones are
+    evicted beyond ``max_conversations``.
+    """
+
+    def __init__(
+        self,
+        log: Logger,
+        *,
+        summarize: Optional[Summarizer] = None,
+        max_conversations: int = 200,
+        max_turns: int = 24,
+        max_chars: int = 2000,
+        token_budget: int = 1500,
+        idle_timeout: float = 3600.0,
+    ) -> None:
+        self.log: Logger = log
+        self.summarize: Optional[Summarizer] = summarize
+        self.max_conversations: int = max_conversations
+        self.max_turns: int = max_turns
+        self.max_chars: int = max_chars
+        self.token_budget: int = token_budget
+        self.idle_timeout: float = idle_timeout
+        self._conversations: OrderedDict[int, Conversation] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._conversations)
+
+    def get(self, key: int) -> Conversation:
+        self._expire()
+        conversation = self._conversations.get(key)
+        if conversation is None:
+            conversation = self._conversations[key] = Conversation()
+            while len(self._conversations) > self.max_conversations:
+                self._conversations.popitem(last=False)
+        else:
+            self._conversations.move_to_end(key)
+        return conversation
+
+    def is_empty(self, key: int) -> bool:
+        conversation = self._conversations.get(key)
+        return conversation is None or not (conversation.turns or conversation.summary)
+
+    def forget(self, key: int) -> None:
+        self._conversations.pop(key, None)
+
+    def prompt(self, key: int, system: str, content: str) -> list[ChatMessage]:
+        """
+        Builds the messages for a completion: the system prompt, the running
+        summary, the recent turns and finally the new user message.
+        """
+        conversation = self.get(key)
+        messages = [{"role": "system", "content": system}]
+        if conversation.summary:
+            messages.append(
+                {
+                    "role": "system",
+                    "content": f"Summary of the conversation so far: {conversation.summary}",
+                }
+            )
+        messages.extend(conversation.turns)
+        messages.append({"role": "user", "content": content[: self.max_chars]})
+        return messages
+
+    async def record(self, key: int, content: str, reply: str) -> None:
+        conversation = self.get(key)
+        conversation.turns.append(
+            {"role": "user", "content": content[: self.max_chars]}
+        )
+        conversation.turns.append(
+            {"role": "assistant", "content": reply[: self.max_chars]}
+        )
+        conversation.last_active = time.monotonic()
+
+        folded: list[ChatMessage] = []
+        while conversation.turns and (
+            len(conversation.turns) > self.max_turns
+            or conversation.tokens > self.token_budget
+        ):
+            # Fold whole exchanges so the history never opens with a reply.
+            folded.append(conversation.turns.popleft())
+            if conversation.turns and conversation.turns[0]["role"] == "assistant":
+                folded.append(conversation.turns.popleft())
+        if not folded or self.summarize is None:
+            return
+        try:
+            summary = await self.summarize(conversation.summary, folded)
+            conversation.summary = summary[: self.max_chars]
+        except Exception as e:
+            self.log.warning(f"Could not summarize conversation {key}: {e}")
+
+    def _expire(self) -> None:
+        cutoff = time.monotonic() - self.idle_timeout
+        while self._conversations:
+            key, conversation = next(iter(self._conversations.items()))
+            if conversation.last_active >= cutoff:
+                break
+            del self._conversations[key]
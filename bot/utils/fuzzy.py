@@ -0,0 +1,86 @@
+from __future__ import annotations
+
+import heapq
+import re
+from collections import Counter, defaultdict
+
+_WORD = re.compile(r"[^\W_]+")
+
+
+def trigrams(text: str) -> frozenset[str]:
+    """
+    Returns the trigrams of ``text`` the way pg_trgm extracts them: the text
+    is split into alphanumeric words and each word is padded with two
+    spaces in front and one behind, so in-process scores line up with
+    ``similarity()`` in Postgres.
+    """
+    grams = set()
+    for word in _WORD.findall(text.lower()):
+        padded = f"  {word} "
+        grams.update(a + b + c for a, b, c in zip(padded, padded[1:], padded[2:]))
+    return frozenset(grams)
+
+
+class TrigramIndex:
+    """
+    Inverted index of trigram -> names used for "did you mean" lookups.
+
+    Candidates are scored by the Jaccard similarity of their trigram sets.
+    Names containing the query verbatim always rank first so plain
+    substring searches keep working.
+    """
+
+    def __init__(self) -> None:
+        self._postings: defaultdict[str, set[str]] = defaultdict(set)
+        self._grams: dict[str, frozenset[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._grams)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._grams
+
+    def add(self, name: str) -> None:
+        if name in self._grams:
+            return
+        grams = trigrams(name)
+        self._grams[name] = grams
+        for gram in grams:
+            self._postings[gram].add(name)
+
+    def remove(self, name: str) -> None:
+        grams = self._grams.pop(name, None)
+        if grams is None:
+            return
+        for gram in grams:
+            names = self._postings[gram]
+            names.discard(name)
+            if not names:
+                del self._postings[gram]
+
+    def search(
+        self, query: str, *, limit: int = 10, threshold: float = 0.3
+    ) -> list[tuple[str, float]]:
+        """
+        Returns up to ``limit`` ``(name, score)`` pairs, best match first.
+        """
+        query = query.lower().strip()
+        grams = trigrams(query)
+        shared: Counter[str] = Counter()
+        for gram in grams:
+            shared.update(self._postings.get(gram, ()))
+        if len(query) < 3:
+            # Too short to share a trigram with a match in the middle of a name.
+            for name in self._grams:
+                if query in name and name not in shared:
+                    shared[name] = 0
+
+        results = []
+        for name, count in shared.items():
+            total = len(grams) + len(self._grams[name]) - count
+            score = count / total if total else 0.0
+            contains = query in name
+            if contains or score >= threshold:
+                results.append((contains, score, name))
+        best = heapq.nlargest(limit, results)
+        return [(name, score) for _, score, name in best]
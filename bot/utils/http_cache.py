@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Any, Literal
+
+if TYPE_CHECKING:
+    from utils.http_client import HTTPClient
+
+Kind = Literal["json", "text"]
+
+
+class HTTPCache:
+    """
+    Size bounded LRU cache of decoded GET responses with per-call TTLs,
+    layered on top of the shared HTTPClient.
+
+    Concurrent requests for a URL that is cached (``ttl`` above 0) share a
+    single in-flight fetch. That fetch runs as its own task, so a caller
+    being cancelled does not cancel it for the others. Uncached URLs are
+    random endpoints (memes, facts, quotes) and are always fetched per call
+    so concurrent users do not get the same payload. Only successful
+    responses are cached; failures raise the underlying
+    ``aiohttp.ClientError`` to every waiter.
+    """
+
+    def __init__(self, http: HTTPClient, *, max_entries: int = 256) -> None:
+        self.http: HTTPClient = http
+        self.max_entries: int = max_entries
+        self.hits: int = 0
+        self.misses: int = 0
+        self.coalesced: int = 0
+        self._entries: OrderedDict[tuple[Kind, str], tuple[float, Any]] = OrderedDict()
+        self._inflight: dict[tuple[Kind, str], asyncio.Task] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def stats(self) -> dict[str, int]:
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+        }
+
+    async def get_json(self, url: str, *, ttl: float = 0.0) -> Any:
+        return await self._get("json", url, ttl)
+
+    async def get_text(self, url: str, *, ttl: float = 0.0) -> str:
+        return await self._get("text", url, ttl)
+
+    def invalidate(self, url: str) -> None:
+        self._entries.pop(("json", url), None)
+        self._entries.pop(("text", url), None)
+
+    async def _get(self, kind: Kind, url: str, ttl: float) -> Any:
+        key = (kind, url)
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires, value = entry
+            if expires > time.monotonic():
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return value
+            del self._entries[key]
+
+        if ttl <= 0:
+            self.misses += 1
+            return await self._fetch(kind, url)
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            self.misses += 1
+            task = asyncio.create_task(self._fetch_and_store(key, ttl))
+            self._inflight[key] = task
+            task.add_done_callback(lambda task: self._finished(key, task))
+        return await asyncio.shield(task)
+
+    def _finished(self, key: tuple[Kind, str], task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            # Mark the exception as retrieved in case every waiter was cancelled.
+            task.exception()
+
+    async def _fetch_and_store(self, key: tuple[Kind, str], ttl: float) -> Any:
+        value = await self._fetch(*key)
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return value
+
+    async def _fetch(self, kind: Kind, url: str) -> Any:
+        response = await self.http.get(url, raise_for_status=True)
+        if kind == "json":
+            return response.json()
+        return response.text()
@@ -0,0 +1,308 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import random
+import time
+from dataclasses import dataclass
+from logging import Logger
+from typing import Any, Optional
+
+from aiohttp import (
+    ClientConnectionError,
+    ClientError,
+    ClientResponseError,
+    ClientSession,
+    ClientTimeout,
+    ServerTimeoutError,
+)
+from multidict import CIMultiDictProxy
+from yarl import URL
+
+RETRY_STATUSES: frozenset[int] = frozenset({429, 500, 502, 503, 504})
+IDEMPOTENT_METHODS: frozenset[str] = frozenset({"GET", "HEAD", "OPTIONS"})
+
+
+class CircuitOpenError(ClientError):
+    """
+    Raised instead of contacting a host whose circuit breaker is open.
+    """
+
+    def __init__(self, host: str, retry_in: float) -> None:
+        super().__init__(f"Circuit for {host} is open, retry in {retry_in:.0f}s")
+        self.host: str = host
+        self.retry_in: float = retry_in
+
+
+class PayloadTooLarge(ValueError):
+    """
+    Raised when a download is bigger than the caller allowed. The host
+    answered fine, so this never counts against its circuit breaker.
+    """
+
+    def __init__(self, url: str, max_bytes: int) -> None:
+        super().__init__(f"{url} is larger than {max_bytes} bytes")
+        self.url: str = url
+        self.max_bytes: int = max_bytes
+
+
+@dataclass
+class HTTPResponse:
+    """
+    A fully read response; the connection has already been released.
+    """
+
+    url: str
+    status: int
+    reason: Optional[str]
+    headers: CIMultiDictProxy[str]
+    body: bytes
+
+    @property
+    def ok(self) -> bool:
+        return self.status < 400
+
+    def json(self) -> Any:
+        return json.loads(self.body)
+
+    def text(self, encoding: str = "utf-8") -> str:
+        return self.body.decode(encoding, errors="replace")
+
+
+class CircuitBreaker:
+    """
+    Opens after ``threshold`` consecutive failures and fast-fails requests
+    for ``reset_after`` seconds, then lets a single probe request through.
+    """
+
+    def __init__(self, threshold: int = 5, reset_after: float = 30.0) -> None:
+        self.threshold: int = threshold
+        self.reset_after: float = reset_after
+        self.failures: int = 0
+        self.opened_at: Optional[float] = None
+        self.probing: bool = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if self.probing or time.monotonic() - self.opened_at >= self.reset_after:
+            return "half-open"
+        return "open"
+
+    def retry_in(self) -> float:
+        if self.opened_at is None:
+            return 0.0
+        return max(0.0, self.reset_after - (time.monotonic() - self.opened_at))
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half-open" and not self.probing:
+            self.probing = True
+            return True
+        return False
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self.probing = False
+        if self.opened_at is not None or self.failures >= self.threshold:
+            self.opened_at = time.monotonic()
+
+
+class HTTPClient:
+    """
+    Wrapper around the shared ``aiohttp.ClientSession`` used by every cog.
+
+    - Each host gets its own concurrency limit so one slow API cannot hold
+      every connection of the pool.
+    - Every call has its own timeout (``timeout=`` seconds, default 10).
+    - Idempotent requests are retried on connection errors, timeouts and
+      429/5xx responses with jittered exponential backoff.
+    - A per-host circuit breaker fast-fails a dead upstream.
+    - Bodies are read inside ``async with`` so connections are always
+      released back to the pool.
+    """
+
+    def __init__(
+        self,
+        session: ClientSession,
+        log: Logger,
+        *,
+        per_host_limit: int = 8,
+        host_limits: Optional[dict[str, int]] = None,
+        timeout: float = 10.0,
+        retries: int = 2,
+        backoff: float = 0.5,
+        failure_threshold: int = 5,
+        reset_after: float = 30.0,
+    ) -> None:
+        self.session: ClientSession = session
+        self.log: Logger = log
+        self.per_host_limit: int = per_host_limit
+        self.host_limits: dict[str, int] = host_limits or {}
+        self.timeout: float = timeout
+        self.retries: int = retries
+        self.backoff: float = backoff
+        self.failure_threshold: int = failure_threshold
+        self.reset_after: float = reset_after
+        self._semaphores: dict[str, asyncio.Semaphore] = {}
+        self._breakers: dict[str, CircuitBreaker] = {}
+
+    def semaphore(self, host: str) -> asyncio.Semaphore:
+        semaphore = self._semaphores.get(host)
+        if semaphore is None:
+            limit = self.host_limits.get(host, self.per_host_limit)
+            semaphore = self._semaphores[host] = asyncio.Semaphore(limit)
+        return semaphore
+
+    def breaker(self, host: str) -> CircuitBreaker:
+        breaker = self._breakers.get(host)
+        if breaker is None:
+            breaker = self._breakers[host] = CircuitBreaker(
+                self.failure_threshold, self.reset_after
+            )
+        return breaker
+
+    @property
+    def stats(self) -> dict[str, str]:
+        return {
+            host: f"{breaker.state} ({breaker.failures} failures)"
+            for host, breaker in self._breakers.items()
+        }
+
+    async def get(self, url: str, **kwargs: Any) -> HTTPResponse:
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url: str, **kwargs: Any) -> HTTPResponse:
+        return await self.request("POST", url, **kwargs)
+
+    async def get_json(self, url: str, **kwargs: Any) -> Any:
+        response = await self.request("GET", url, raise_for_status=True, **kwargs)
+        return response.json()
+
+    async def download(
+        self,
+        url: str,
+        path: str,
+        *,
+        timeout: float = 60.0,
+        chunk_size: int = 64 * 1024,
+        max_bytes: Optional[int] = None,
+    ) -> int:
+        """
+        Streams the body of a GET into ``path`` chunk by chunk instead of
+        buffering it, returning the number of bytes written. The file only
+        appears at ``path`` once the download completed. Bodies over
+        ``max_bytes`` raise ``PayloadTooLarge``.
+        """
+        host = URL(url).host or url
+        breaker = self.breaker(host)
+        if not breaker.allow():
+            raise CircuitOpenError(host, breaker.retry_in())
+        loop = asyncio.get_running_loop()
+        tmp_path = f"{path}.part"
+        written = 0
+        try:
+            async with self.semaphore(host):
+                async with self.session.get(
+                    url, timeout=ClientTimeout(total=timeout)
+                ) as response:
+                    if response.status >= 500:
+                        breaker.record_failure()
+                    elif response.status >= 400:
+                        breaker.record_success()
+                    response.raise_for_status()
+                    with open(tmp_path, "wb") as file:
+                        async for chunk in response.content.iter_chunked(chunk_size):
+                            written += len(chunk)
+                            if max_bytes is not None and written > max_bytes:
+                                breaker.record_success()
+                                raise PayloadTooLarge(url, max_bytes)
+                            await loop.run_in_executor(None, file.write, chunk)
+            os.replace(tmp_path, path)
+        except ClientResponseError:
+            raise
+        except (ClientError, asyncio.TimeoutError) as e:
+            breaker.record_failure()
+            if isinstance(e, ClientError):
+                raise
+            raise ServerTimeoutError(f"GET {url} timed out") from e
+        finally:
+            # Whatever ended a half-open probe (cancellation, a disk error),
+            # the next request must be allowed to probe again.
+            breaker.probing = False
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        breaker.record_success()
+        return written
+
+    async def request(
+        self,
+        method: str,
+        url: str,
+        *,
+        timeout: Optional[float] = None,
+        retries: Optional[int] = None,
+        raise_for_status: bool = False,
+        **kwargs: Any,
+    ) -> HTTPResponse:
+        method = method.upper()
+        host = URL(url).host or url
+        breaker = self.breaker(host)
+        if retries is None:
+            retries = self.retries if method in IDEMPOTENT_METHODS else 0
+        client_timeout = ClientTimeout(total=timeout or self.timeout)
+
+        attempt = 0
+        while True:
+            if not breaker.allow():
+                raise CircuitOpenError(host, breaker.retry_in())
+            try:
+                async with self.semaphore(host):
+                    async with self.session.request(
+                        method, url, timeout=client_timeout, **kwargs
+                    ) as response:
+                        body = await response.read()
+                        if response.status in RETRY_STATUSES and attempt < retries:
+                            breaker.record_failure()
+                        else:
+                            if response.status >= 500:
+                                breaker.record_failure()
+                            else:
+                                breaker.record_success()
+                            if raise_for_status:
+                                response.raise_for_status()
+                            return HTTPResponse(
+                                url=str(response.url),
+                                status=response.status,
+                                reason=response.reason,
+                                headers=response.headers,
+                                body=body,
+                            )
+            except ClientResponseError:
+                raise
+            except (ClientConnectionError, asyncio.TimeoutError) as e:
+                breaker.record_failure()
+                if attempt >= retries:
+                    if isinstance(e, ClientError):
+                        raise
+                    raise ServerTimeoutError(f"{method} {url} timed out") from e
+                self.log.warning(f"{method} {url} failed ({e!r}), retrying")
+            except ClientError:
+                breaker.record_failure()
+                raise
+            except asyncio.CancelledError:
+                breaker.probing = False
+                raise
+            attempt += 1
+            await asyncio.sleep(
+                self.backoff * 2 ** (attempt - 1) * random.uniform(0.5, 1.5)
+            )
@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+import importlib
+import os
+from logging import Logger
+from typing import Iterable, Optional
+
+import discord
+
+# Needed by the bot core itself: guild state, prefix commands and mentions.
+BASE_INTENTS: tuple[str, ...] = (
+    "guilds",
+    "guild_messages",
+    "dm_messages",
+    "message_content",
+)
+
+
+def plan_intents(extensions: Iterable[str], log: Logger) -> discord.Intents:
+    """
+    Builds the smallest intent set covering the bot core and every
+    extension. Each extension module lists the extra intents it relies on in
+    a module level ``INTENTS`` tuple of ``discord.Intents`` flag names.
+    ``INTENTS_EXCLUDE`` (comma separated) drops intents even if requested.
+    """
+    intents = discord.Intents.none()
+    wanted: dict[str, list[str]] = {name: ["core"] for name in BASE_INTENTS}
+    for extension in extensions:
+        try:
+            module = importlib.import_module(extension)
+        except Exception as exc:
+            # setup_hook reports the failure again when loading the extension.
+            log.error(f"Could not read intents of {extension}: {exc}")
+            continue
+        for name in getattr(module, "INTENTS", ()):
+            wanted.setdefault(name, []).append(extension.rsplit(".", 1)[-1])
+    excluded = {
+        name.strip() for name in os.getenv("INTENTS_EXCLUDE", "").split(",") if name
+    }
+    for name, users in sorted(wanted.items()):
+        if name in excluded:
+            log.info(f"Intent {name} excluded (wanted by {', '.join(users)})")
+            continue
+        setattr(intents, name, True)
+        log.info(f"Intent {name} enabled for {', '.join(users)}")
+    return intents
+
+
+def message_cache_size() -> Optional[int]:
+    """
+    ``MAX_MESSAGES`` messages are kept in the message cache, 1000 by
+    default; 0 turns the cache off.
+    """
+    size = int(os.getenv("MAX_MESSAGES", 1000))
+    return size or None
+
+
+def member_cache_policy(
+    intents: discord.Intents,
+) -> tuple[discord.MemberCacheFlags, bool]:
+    """
+    Returns the member cache flags and whether to chunk every guild at
+    startup, according to ``MEMBER_CACHE``:
+
+    - ``main`` (default): cache members as they are seen, and only request
+      the full member list of the main guild once ready
+    - ``all``: request the full member list of every guild at startup
+    - ``none``: cache no members beyond what an event carries
+    """
+    policy = os.getenv("MEMBER_CACHE", "main")
+    if policy == "none" or not intents.members:
+        return discord.MemberCacheFlags.none(), False
+    return discord.MemberCacheFlags.from_intents(intents), policy == "all"
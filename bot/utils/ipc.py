@@ -0,0 +1,126 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import random
+from itertools import count
+from logging import Logger
+from typing import Any, Awaitable, Callable, Optional
+
+QueryHandler = Callable[[], Awaitable[Any]]
+
+
+async def send(writer: asyncio.StreamWriter, payload: dict[str, Any]) -> None:
+    writer.write(json.dumps(payload).encode() + b"\n")
+    await writer.drain()
+
+
+class ClusterClient:
+    """
+    A cluster's connection to the supervisor's IPC server.
+
+    The protocol is newline separated JSON over a localhost socket. A
+    cluster can ask the supervisor to run a named query on every cluster
+    (``query``) and answers the queries the supervisor forwards to it with
+    the matching entry of ``handlers``. The connection is re-established
+    with backoff if the supervisor restarts.
+    """
+
+    def __init__(
+        self,
+        port: int,
+        secret: str,
+        cluster_id: int,
+        handlers: dict[str, QueryHandler],
+        log: Logger,
+        *,
+        host: str = "127.0.0.1",
+    ) -> None:
+        self.host: str = host
+        self.port: int = port
+        self.secret: str = secret
+        self.cluster_id: int = cluster_id
+        self.handlers: dict[str, QueryHandler] = handlers
+        self.log: Logger = log
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._pending: dict[int, asyncio.Future] = {}
+        self._nonces = count()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def connected(self) -> bool:
+        return self._writer is not None and not self._writer.is_closing()
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+        if self._writer is not None:
+            self._writer.close()
+
+    async def query(self, name: str, *, timeout: float = 5.0) -> list[Any]:
+        """
+        Runs ``name`` on every connected cluster and returns their answers.
+        Raises ``ConnectionError`` when the supervisor cannot be reached.
+        """
+        if not self.connected:
+            raise ConnectionError("Not connected to the cluster supervisor")
+        nonce = next(self._nonces)
+        future = self._pending[nonce] = asyncio.get_running_loop().create_future()
+        try:
+            await send(self._writer, {"op": "request", "nonce": nonce, "query": name})
+            return await asyncio.wait_for(future, timeout)
+        finally:
+            self._pending.pop(nonce, None)
+
+    async def _run(self) -> None:
+        failures = 0
+        while True:
+            try:
+                reader, self._writer = await asyncio.open_connection(
+                    self.host, self.port
+                )
+                await send(
+                    self._writer,
+                    {
+                        "op": "identify",
+                        "cluster": self.cluster_id,
+                        "secret": self.secret,
+                    },
+                )
+                failures = 0
+                self.log.info(f"Cluster {self.cluster_id} connected to IPC")
+                while line := await reader.readline():
+                    await self._handle(json.loads(line))
+            except (OSError, ValueError) as e:
+                self.log.warning(f"IPC connection lost: {e!r}")
+            finally:
+                if self._writer is not None:
+                    self._writer.close()
+                    self._writer = None
+                for future in self._pending.values():
+                    if not future.done():
+                        future.set_exception(ConnectionError("IPC connection lost"))
+            failures += 1
+            await asyncio.sleep(min(60, 2**failures) * random.uniform(0.5, 1.0))
+
+    async def _handle(self, message: dict[str, Any]) -> None:
+        op = message.get("op")
+        if op == "result":
+            future = self._pending.get(message["nonce"])
+            if future is not None and not future.done():
+                future.set_result(message["data"])
+        elif op == "query":
+            asyncio.create_task(self._answer(message["nonce"], message["query"]))
+
+    async def _answer(self, nonce: int, name: str) -> None:
+        handler = self.handlers.get(name)
+        try:
+            data = await handler() if handler is not None else None
+        except Exception as e:
+            self.log.error(f"IPC query {name} failed: {e}")
+            data = None
+        if self.connected:
+            await send(self._writer, {"op": "response", "nonce": nonce, "data": data})
@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import defaultdict, deque
+from logging import Logger
+from typing import Awaitable, Callable
+
+from discord import Guild, Member
+
+SingleHandler = Callable[[Member], Awaitable[None]]
+BatchHandler = Callable[[Guild, list[Member]], Awaitable[None]]
+
+
+class JoinBurstCoalescer:
+    """
+    Tracks the join rate of every guild and batches member joins during bursts.
+
+    While a guild sees fewer than ``threshold`` joins within ``window``
+    seconds, every join is passed to ``on_single``. Once the rate is reached
+    the guild switches to batch mode: joins are buffered and handed to
+    ``on_batch`` once per window, until a window goes by below the threshold.
+    """
+
+    def __init__(
+        self,
+        on_single: SingleHandler,
+        on_batch: BatchHandler,
+        log: Logger,
+        *,
+        threshold: int = 5,
+        window: float = 10.0,
+    ) -> None:
+        self.on_single: SingleHandler = on_single
+        self.on_batch: BatchHandler = on_batch
+        self.log: Logger = log
+        self.threshold: int = threshold
+        self.window: float = window
+        self._joins: defaultdict[int, deque[float]] = defaultdict(deque)
+        self._batches: dict[int, list[Member]] = {}
+        self._tasks: dict[int, asyncio.Task] = {}
+
+    def is_batching(self, guild_id: int) -> bool:
+        return guild_id in self._batches
+
+    def close(self) -> None:
+        for task in self._tasks.values():
+            task.cancel()
+
+    def _rate(self, guild_id: int) -> int:
+        joins = self._joins[guild_id]
+        cutoff = time.monotonic() - self.window
+        while joins and joins[0] < cutoff:
+            joins.popleft()
+        if not joins:
+            del self._joins[guild_id]
+            return 0
+        return len(joins)
+
+    async def add(self, member: Member) -> None:
+        guild_id = member.guild.id
+        self._joins[guild_id].append(time.monotonic())
+        if guild_id in self._batches:
+            self._batches[guild_id].append(member)
+            return
+        if self._rate(guild_id) >= self.threshold:
+            self.log.warning(f"Join burst in {member.guild}, batching welcomes")
+            self._batches[guild_id] = [member]
+            self._tasks[guild_id] = asyncio.create_task(self._drain(member.guild))
+            return
+        await self.on_single(member)
+
+    async def _drain(self, guild: Guild) -> None:
+        try:
+            while True:
+                await asyncio.sleep(self.window)
+                members, self._batches[guild.id] = self._batches[guild.id], []
+                await self._flush(guild, members)
+                if self._rate(guild.id) < self.threshold:
+                    break
+        finally:
+            self._tasks.pop(guild.id, None)
+            await self._flush(guild, self._batches.pop(guild.id, []))
+
+    async def _flush(self, guild: Guild, members: list[Member]) -> None:
+        if not members:
+            return
+        try:
+            await self.on_batch(guild, members)
+        except Exception as e:
+            self.log.error(f"Could not welcome {len(members)} members to {guild}: {e}")
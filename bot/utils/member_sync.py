@@ -0,0 +1,143 @@
+from __future__ import annotations
+
+import asyncio
+from logging import Logger
+from typing import TYPE_CHECKING, Any, Optional
+
+import discord
+
+if TYPE_CHECKING:
+    from models.repositories import UserRepository
+
+
+def member_row(member: discord.Member) -> dict[str, Any]:
+    joined = member.joined_at or discord.utils.utcnow()
+    return {
+        "discord_id": str(member.id),
+        "username": member.name,
+        "joined": joined.date(),
+        "guild_id": str(member.guild.id),
+        "xp": 0,
+        "level": 0,
+    }
+
+
+class MemberSync:
+    """
+    Keeps ``discord_users`` in step with the gateway member cache.
+
+    Gateway events are queued with ``queue_upsert``/``queue_delete`` and
+    written together once ``delay`` seconds have passed since the first
+    queued change. ``reconcile`` diffs a whole guild against the table to
+    catch up on anything that happened while the bot was offline. Writes
+    go through ``UserRepository.upsert`` and ``UserRepository.delete``;
+    changes from a failed write are merged back and retried after another
+    ``delay``, unless a newer change to the same member replaced them.
+    """
+
+    def __init__(
+        self,
+        repository: UserRepository,
+        log: Logger,
+        *,
+        delay: float = 5.0,
+    ) -> None:
+        self.repository: UserRepository = repository
+        self.log: Logger = log
+        self.delay: float = delay
+        self._upserts: dict[tuple[str, str], dict[str, Any]] = {}
+        self._deletes: set[tuple[str, str]] = set()
+        self._lock: asyncio.Lock = asyncio.Lock()
+        self._flush_task: Optional[asyncio.Task] = None
+
+    def queue_upsert(self, member: discord.Member) -> None:
+        key = (str(member.id), str(member.guild.id))
+        self._deletes.discard(key)
+        self._upserts[key] = member_row(member)
+        self._schedule()
+
+    def queue_delete(self, guild_id: int, user_id: int) -> None:
+        key = (str(user_id), str(guild_id))
+        self._upserts.pop(key, None)
+        self._deletes.add(key)
+        self._schedule()
+
+    def _schedule(self) -> None:
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_later())
+
+    @property
+    def pending(self) -> int:
+        return len(self._upserts) + len(self._deletes)
+
+    async def _flush_later(self) -> None:
+        while self.pending:
+            await asyncio.sleep(self.delay)
+            await self.flush()
+
+    async def flush(self) -> None:
+        async with self._lock:
+            upserts, self._upserts = self._upserts, {}
+            deletes, self._deletes = self._deletes, set()
+            try:
+                if upserts:
+                    await self.repository.upsert(list(upserts.values()))
+                    upserts = {}
+                if deletes:
+                    await self.repository.delete(deletes)
+            except Exception as e:
+                self._requeue(upserts, deletes)
+                self.log.error(
+                    f"Could not sync {len(upserts) + len(deletes)} members: {e}"
+                )
+            except BaseException:
+                # Cancelled before the write committed: keep the changes.
+                self._requeue(upserts, deletes)
+                raise
+
+    def _requeue(
+        self,
+        upserts: dict[tuple[str, str], dict[str, Any]],
+        deletes: set[tuple[str, str]],
+    ) -> None:
+        for key, row in upserts.items():
+            if key not in self._upserts and key not in self._deletes:
+                self._upserts[key] = row
+        self._deletes.update(key for key in deletes if key not in self._upserts)
+
+    async def close(self) -> None:
+        """
+        Waits for a write in progress instead of interrupting it, then
+        writes whatever is still queued.
+        """
+        async with self._lock:
+            if self._flush_task is not None:
+                self._flush_task.cancel()
+        await self.flush()
+
+    async def reconcile(self, guild: discord.Guild) -> tuple[int, int]:
+        """
+        Brings a guild's rows in line with its cached members and returns the
+        number of rows upserted and deleted. Guilds whose member list has not
+        been fully chunked are skipped, since missing members would look like
+        departures.
+        """
+        if not guild.chunked:
+            self.log.warning(f"Skipping member sync for unchunked guild {guild}")
+            return 0, 0
+        stored = await self.repository.usernames(guild.id)
+        members = {str(member.id): member for member in guild.members}
+        upserts = [
+            member_row(member)
+            for discord_id, member in members.items()
+            if stored.get(discord_id) != member.name
+        ]
+        deletes = [
+            (discord_id, str(guild.id)) for discord_id in stored.keys() - members.keys()
+        ]
+        await self.repository.upsert(upserts)
+        await self.repository.delete(deletes)
+        self.log.info(
+            f"Synced members of {guild}: {len(upserts)} upserted, {len(deletes)} removed"
+        )
+        return len(upserts), len(deletes)
@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+import re
+from logging import Logger
+from typing import TYPE_CHECKING, Iterable, Optional
+
+if TYPE_CHECKING:
+    from models.repositories import BannedWordRepository
+
+
+class WordFilter:
+    """
+    Case-insensitive whole-word matcher over a fixed list of terms.
+
+    Every term is compiled into one alternation, longest first so
+    "Bloodbath" wins over "Blood", anchored on word boundaries so "clear"
+    does not match inside "nuclear". A trailing plural "s" or "es" is also
+    accepted. ``match`` returns the term as it was given, not as typed.
+    """
+
+    def __init__(self, words: Iterable[str]) -> None:
+        self.terms: dict[str, str] = {}
+        for word in words:
+            word = " ".join(word.split())
+            if word:
+                self.terms.setdefault(word.casefold(), word)
+        alternation = "|".join(
+            r"\s+".join(re.escape(part) for part in term.split())
+            for term in sorted(self.terms, key=len, reverse=True)
+        )
+        self.pattern: Optional[re.Pattern[str]] = (
+            re.compile(rf"(?<!\w)({alternation})(?:e?s)?(?!\w)", re.IGNORECASE)
+            if alternation
+            else None
+        )
+
+    def __len__(self) -> int:
+        return len(self.terms)
+
+    def match(self, text: str) -> Optional[str]:
+        if self.pattern is None:
+            return None
+        found = self.pattern.search(text)
+        if found is None:
+            return None
+        return self.terms[" ".join(found.group(1).split()).casefold()]
+
+
+class PromptModerator:
+    """
+    Checks AI prompts against the built-in ban list plus each guild's own
+    additions from the ``banned_words`` table.
+
+    A guild's filter is compiled the first time it is needed and rebuilt
+    whenever a word is added or removed there.
+    """
+
+    def __init__(
+        self,
+        repository: BannedWordRepository,
+        log: Logger,
+        base_words: Iterable[str],
+    ) -> None:
+        self.repository: BannedWordRepository = repository
+        self.log: Logger = log
+        self.base_words: tuple[str, ...] = tuple(base_words)
+        self.base: WordFilter = WordFilter(self.base_words)
+        self._guild_words: dict[int, list[str]] = {}
+        self._filters: dict[int, WordFilter] = {}
+
+    async def guild_words(self, guild_id: int) -> list[str]:
+        words = self._guild_words.get(guild_id)
+        if words is None:
+            words = await self.repository.words(guild_id)
+            self._guild_words[guild_id] = words
+        return words
+
+    async def check(self, guild_id: Optional[int], prompt: str) -> Optional[str]:
+        """
+        Returns the banned term found in ``prompt``, or None when it is clean.
+        """
+        if guild_id is None:
+            return self.base.match(prompt)
+        word_filter = self._filters.get(guild_id)
+        if word_filter is None:
+            words = await self.guild_words(guild_id)
+            word_filter = self.base
+            if words:
+                word_filter = WordFilter((*self.base_words, *words))
+            self._filters[guild_id] = word_filter
+        return word_filter.match(prompt)
+
+    async def add(self, guild_id: int, word: str, added_by: int) -> bool:
+        """
+        Bans ``word`` in a guild, returning False if it was already banned.
+        """
+        word = " ".join(word.split())
+        words = await self.guild_words(guild_id)
+        if word.casefold() in (existing.casefold() for existing in words):
+            return False
+        if not await self.repository.add(guild_id, word, added_by):
+            # Banned by another process since the list was loaded.
+            self._guild_words.pop(guild_id, None)
+            return False
+        words.append(word)
+        self._filters.pop(guild_id, None)
+        return True
+
+    async def remove(self, guild_id: int, word: str) -> bool:
+        """
+        Unbans ``word`` in a guild, returning False if it was not banned there.
+        """
+        word = " ".join(word.split())
+        removed = await self.repository.remove(guild_id, word)
+        self._guild_words.pop(guild_id, None)
+        self._filters.pop(guild_id, None)
+        return removed
@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Any, Optional
+
+import discord
+from discord.ext import menus
+
+if TYPE_CHECKING:
+    from utils.context import Context
+
+
+class Paginator(discord.ui.View):
+    """
+    Button driven view over a ``discord.ext.menus`` page source.
+
+    Pages are requested from the source one at a time as the user moves
+    through them, so sources that fetch lazily never load more than the
+    page currently on screen.
+    """
+
+    def __init__(
+        self, source: menus.PageSource, *, ctx: Context, timeout: float = 180.0
+    ) -> None:
+        super().__init__(timeout=timeout)
+        self.source: menus.PageSource = source
+        self.ctx: Context = ctx
+        self.current_page: int = 0
+        self.message: Optional[discord.Message] = None
+
+    async def _get_kwargs(self, page: Any) -> dict[str, Any]:
+        value = await discord.utils.maybe_coroutine(self.source.format_page, self, page)
+        if isinstance(value, dict):
+            return value
+        if isinstance(value, str):
+            return {"content": value, "embed": None}
+        if isinstance(value, discord.Embed):
+            return {"embed": value, "content": None}
+        return {}
+
+    def _update_buttons(self) -> None:
+        max_pages = self.source.get_max_pages()
+        self.previous_page.disabled = self.current_page == 0
+        self.next_page.disabled = (
+            max_pages is not None and self.current_page >= max_pages - 1
+        )
+
+    async def start(self) -> None:
+        await self.source._prepare_once()
+        page = await self.source.get_page(0)
+        kwargs = await self._get_kwargs(page)
+        self._update_buttons()
+        if not self.source.is_paginating():
+            self.stop()
+            self.message = await self.ctx.send(**kwargs)
+            return
+        self.message = await self.ctx.send(**kwargs, view=self)
+
+    async def show_page(
+        self, interaction: discord.Interaction, page_number: int
+    ) -> None:
+        page = await self.source.get_page(page_number)
+        self.current_page = page_number
+        kwargs = await self._get_kwargs(page)
+        self._update_buttons()
+        await interaction.response.edit_message(**kwargs, view=self)
+
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        if interaction.user.id == self.ctx.author.id:
+            return True
+        await interaction.response.send_message(
+            "This menu belongs to someone else.", ephemeral=True
+        )
+        return False
+
+    async def on_timeout(self) -> None:
+        if self.message is not None:
+            try:
+                await self.message.edit(view=None)
+            except discord.HTTPException:
+                pass
+
+    @discord.ui.button(label="Previous", style=discord.ButtonStyle.blurple)
+    async def previous_page(
+        self, interaction: discord.Interaction, button: discord.ui.Button
+    ) -> None:
+        await self.show_page(interaction, self.current_page - 1)
+
+    @discord.ui.button(label="Next", style=discord.ButtonStyle.blurple)
+    async def next_page(
+        self, interaction: discord.Interaction, button: discord.ui.Button
+    ) -> None:
+        await self.show_page(interaction, self.current_page + 1)
+
+    @discord.ui.button(label="Stop", style=discord.ButtonStyle.red)
+    async def stop_pages(
+        self, interaction: discord.Interaction, button: discord.ui.Button
+    ) -> None:
+        await interaction.response.edit_message(view=None)
+        self.stop()
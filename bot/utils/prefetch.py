@@ -0,0 +1,98 @@
+from __future__ import annotations
+
+import asyncio
+import random
+import time
+from collections import deque
+from logging import Logger
+from typing import TYPE_CHECKING, Optional
+
+if TYPE_CHECKING:
+    from utils.http_client import HTTPClient
+
+
+class PrefetchPool:
+    """
+    Ring buffer of ready-to-serve values from an endpoint that returns
+    something random on every call.
+
+    ``get`` pops a buffered value and schedules a background refill; only
+    when the buffer is empty does the caller wait on upstream. Refills run
+    at most ``concurrency`` requests at a time and back off exponentially
+    (with jitter) while the upstream keeps failing.
+    """
+
+    def __init__(
+        self,
+        http: HTTPClient,
+        url: str,
+        *,
+        key: str,
+        log: Logger,
+        size: int = 5,
+        concurrency: int = 2,
+        max_backoff: float = 300.0,
+    ) -> None:
+        self.http: HTTPClient = http
+        self.url: str = url
+        self.key: str = key
+        self.log: Logger = log
+        self.max_backoff: float = max_backoff
+        self._buffer: deque[str] = deque(maxlen=size)
+        self._semaphore: asyncio.Semaphore = asyncio.Semaphore(concurrency)
+        self._refill_task: Optional[asyncio.Task] = None
+        self._failures: int = 0
+        self._retry_at: float = 0.0
+
+    def __len__(self) -> int:
+        return len(self._buffer)
+
+    def start(self) -> None:
+        self._schedule_refill()
+
+    def close(self) -> None:
+        if self._refill_task is not None:
+            self._refill_task.cancel()
+
+    async def get(self) -> str:
+        try:
+            value = self._buffer.popleft()
+        except IndexError:
+            value = await self._fetch()
+        self._schedule_refill()
+        return value
+
+    def _schedule_refill(self) -> None:
+        if self._refill_task is not None and not self._refill_task.done():
+            return
+        if time.monotonic() < self._retry_at:
+            return
+        self._refill_task = asyncio.create_task(self._refill())
+
+    async def _refill(self) -> None:
+        missing = self._buffer.maxlen - len(self._buffer)
+        results = await asyncio.gather(
+            *(self._fetch_limited() for _ in range(missing)), return_exceptions=True
+        )
+        errors = [result for result in results if isinstance(result, Exception)]
+        self._buffer.extend(
+            result for result in results if not isinstance(result, BaseException)
+        )
+        if not errors:
+            self._failures = 0
+            return
+        self._failures += 1
+        backoff = min(self.max_backoff, 2**self._failures) * random.uniform(0.5, 1.0)
+        self._retry_at = time.monotonic() + backoff
+        self.log.warning(
+            f"Prefetching {self.url} failed {len(errors)} time(s), "
+            f"retrying in {backoff:.1f}s: {errors[0]!r}"
+        )
+
+    async def _fetch_limited(self) -> str:
+        async with self._semaphore:
+            return await self._fetch()
+
+    async def _fetch(self) -> str:
+        data = await self.http.get_json(self.url)
+        return data[self.key]
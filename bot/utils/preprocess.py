@@ -0,0 +1,55 @@
+from __future__ import annotations
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from PIL import Image, ImageOps
+
+# Refuse anything that would decode to more than ~64 megapixels.
+MAX_PIXELS: int = 64_000_000
+
+
+class ImagePreprocessor:
+    """
+    Shrinks images to what an image classifier actually looks at before
+    they are uploaded, in a worker thread pool.
+
+    Images are decoded straight from disk (JPEGs at a reduced scale via
+    ``draft``), rotated according to their EXIF orientation, downscaled so
+    the shorter side is ``size`` pixels and re-encoded as a small JPEG.
+    """
+
+    def __init__(self, *, size: int = 224, max_workers: int = 2) -> None:
+        self.size: int = size
+        self.executor: ThreadPoolExecutor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="preprocess"
+        )
+
+    def close(self) -> None:
+        self.executor.shutdown(wait=False)
+
+    def _prepare(self, path: str) -> bytes:
+        with Image.open(path) as image:
+            if image.width * image.height > MAX_PIXELS:
+                raise ValueError(f"{image.width}x{image.height} is too many pixels")
+            scale = self.size / min(image.size)
+            # Let the JPEG decoder skip detail we are about to throw away.
+            image.draft(
+                "RGB",
+                (round(image.width * scale) or 1, round(image.height * scale) or 1),
+            )
+            image = ImageOps.exif_transpose(image).convert("RGB")
+            scale = self.size / min(image.size)
+            if scale < 1:
+                image = image.resize(
+                    (round(image.width * scale) or 1, round(image.height * scale) or 1),
+                    Image.LANCZOS,
+                )
+            buffer = BytesIO()
+            image.save(buffer, format="JPEG", quality=90)
+        return buffer.getvalue()
+
+    async def prepare(self, path: str) -> bytes:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, self._prepare, path)
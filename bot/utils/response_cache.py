@@ -0,0 +1,164 @@
+from __future__ import annotations
+
+import hashlib
+import math
+import re
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+
+from utils.fuzzy import trigrams
+
+_MENTION = re.compile(r"<[@#][!&]?\d+>")
+_SIGNIFICANT = re.compile(r"\d+|[-+*/^=<>%]")
+
+# Stands in for the asker's name in cached replies so they can be shared.
+NAME_PLACEHOLDER: str = "\x00name\x00"
+# How far into a reply a name still counts as addressing the asker.
+_GREETING_CHARS: int = 24
+
+
+def normalize(prompt: str) -> str:
+    """
+    Folds a prompt down to what matters for reuse: no mentions, case or
+    repeated whitespace, so "Who  are you" and "who are you" match.
+    Punctuation is kept, "2+2" and "2-2" are different questions.
+    """
+    return " ".join(_MENTION.sub(" ", prompt).casefold().split())
+
+
+def persona_hash(system: str) -> str:
+    return hashlib.sha256(system.encode()).hexdigest()[:16]
+
+
+def similarity(a: frozenset[str], b: frozenset[str]) -> float:
+    """Cosine similarity of two trigram sets."""
+    if not a or not b:
+        return 0.0
+    return len(a & b) / math.sqrt(len(a) * len(b))
+
+
+def name_template(reply: str, name: str) -> Optional[str]:
+    """
+    Returns ``reply`` with the asker's name swapped for ``NAME_PLACEHOLDER``,
+    or None when the reply cannot be reused for someone else.
+
+    Only a name addressing the asker at the start ("Hey Max, ...") is
+    replaced. Anywhere else the name may be an ordinary word ("Max",
+    "Will", "Hope") or be about that person, so such replies are not cached.
+    """
+    found = list(re.finditer(rf"(?<!\w){re.escape(name)}(?!\w)", reply, re.IGNORECASE))
+    if not found:
+        return reply
+    if len(found) > 1 or found[0].start() > _GREETING_CHARS:
+        return None
+    start, end = found[0].span()
+    if not reply[end:].lstrip(" ").startswith((",", "!")):
+        return None
+    return reply[:start] + NAME_PLACEHOLDER + reply[end:]
+
+
+@dataclass
+class _Entry:
+    reply: str
+    grams: frozenset[str]
+    significant: tuple[str, ...]
+    expires: float
+
+
+class ResponseCache:
+    """
+    TTL + LRU cache of chat replies for short, frequently repeated prompts.
+
+    Entries are keyed by the persona hash and the normalized prompt. With no
+    ``threshold`` only an exact match of both is served. When ``threshold``
+    is set, a miss falls back to the cached prompt of the same persona with
+    the highest trigram cosine similarity, if the score reaches
+    ``threshold`` and both prompts have the same numbers and operators, so
+    "2+2" never answers "2-2". Alike prompts can still need different
+    answers ("capital of france" and "capital of frances" score above 0.9),
+    which is why the lookup is off unless asked for. Prompts longer than
+    ``max_prompt_chars`` are never cached; they are rarely repeated.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_entries: int = 512,
+        ttl: float = 3600.0,
+        threshold: Optional[float] = None,
+        max_prompt_chars: int = 200,
+    ) -> None:
+        self.max_entries: int = max_entries
+        self.ttl: float = ttl
+        self.threshold: Optional[float] = threshold
+        self.max_prompt_chars: int = max_prompt_chars
+        self.hits: int = 0
+        self.near_hits: int = 0
+        self.misses: int = 0
+        self._entries: OrderedDict[tuple[str, str], _Entry] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def stats(self) -> dict[str, int]:
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "near hits": self.near_hits,
+            "misses": self.misses,
+        }
+
+    def cacheable(self, prompt: str) -> bool:
+        return 0 < len(normalize(prompt)) <= self.max_prompt_chars
+
+    def get(self, persona: str, prompt: str) -> Optional[str]:
+        if not self.cacheable(prompt):
+            return None
+        self._expire()
+        key = (persona, normalize(prompt))
+        entry = self._entries.get(key)
+        if entry is not None:
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return entry.reply
+
+        if self.threshold is not None:
+            grams = trigrams(key[1])
+            significant = tuple(_SIGNIFICANT.findall(key[1]))
+            best_key, best_score = None, self.threshold
+            for other_key, other in self._entries.items():
+                if other_key[0] != persona or other.significant != significant:
+                    continue
+                score = similarity(grams, other.grams)
+                if score >= best_score:
+                    best_key, best_score = other_key, score
+            if best_key is not None:
+                self.near_hits += 1
+                self._entries.move_to_end(best_key)
+                return self._entries[best_key].reply
+
+        self.misses += 1
+        return None
+
+    def put(self, persona: str, prompt: str, reply: str) -> None:
+        if not self.cacheable(prompt) or not reply.strip():
+            return
+        text = normalize(prompt)
+        self._entries[(persona, text)] = _Entry(
+            reply,
+            trigrams(text),
+            tuple(_SIGNIFICANT.findall(text)),
+            time.monotonic() + self.ttl,
+        )
+        self._entries.move_to_end((persona, text))
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _expire(self) -> None:
+        now = time.monotonic()
+        expired = [key for key, entry in self._entries.items() if entry.expires <= now]
+        for key in expired:
+            del self._entries[key]
@@ -0,0 +1,144 @@
+from __future__ import annotations
+
+import asyncio
+from dataclasses import dataclass
+from logging import Logger
+from typing import Awaitable, Callable, Optional, Union
+
+from discord import Message
+
+Handler = Callable[[Message], Awaitable[None]]
+
+
+@dataclass(frozen=True)
+class MessageKind:
+    """
+    What routes filter on, apart from the guild.
+
+    Attributes:
+    - is_bot: bool
+        The author is a bot other than this one
+    - mentions_me: bool
+        The message mentions this bot directly, not via @everyone
+    - has_prefix: bool
+        The message starts with the command prefix
+    """
+
+    is_bot: bool
+    mentions_me: bool
+    has_prefix: bool
+
+
+@dataclass(frozen=True)
+class Route:
+    """
+    A handler plus the kind of messages it wants. ``None`` means "either".
+    """
+
+    handler: Handler
+    mentions_me: Optional[bool] = None
+    has_prefix: Optional[bool] = None
+    allow_bots: bool = False
+    guilds: Optional[frozenset[int]] = None
+
+    def wants(self, kind: MessageKind) -> bool:
+        if kind.is_bot and not self.allow_bots:
+            return False
+        if self.mentions_me is not None and kind.mentions_me != self.mentions_me:
+            return False
+        return self.has_prefix is None or kind.has_prefix == self.has_prefix
+
+    def in_guild(self, guild_id: Optional[int]) -> bool:
+        return self.guilds is None or guild_id in self.guilds
+
+
+class MessageRouter:
+    """
+    Single entry point for ``on_message``.
+
+    Each message is handed only to the routes that asked for that kind of
+    message. The routes wanting each kind (bot author, mention, prefix) are
+    worked out once and cached, so the common case (a plain chat message
+    that is neither a command nor a mention) costs a few attribute checks,
+    a dict lookup and no handler calls. Handlers never see messages from
+    this bot.
+    """
+
+    def __init__(self, log: Logger, prefix: Union[str, tuple[str, ...]]) -> None:
+        self.log: Logger = log
+        self.prefix: tuple[str, ...] = (prefix,) if isinstance(prefix, str) else prefix
+        self.user_id: Optional[int] = None
+        self.routes: list[Route] = []
+        self._kinds: dict[tuple[bool, bool, bool], tuple[Route, ...]] = {}
+
+    def register(
+        self,
+        handler: Handler,
+        *,
+        mentions_me: Optional[bool] = None,
+        has_prefix: Optional[bool] = None,
+        allow_bots: bool = False,
+        guilds: Optional[set[int]] = None,
+    ) -> Route:
+        route = Route(
+            handler,
+            mentions_me=mentions_me,
+            has_prefix=has_prefix,
+            allow_bots=allow_bots,
+            guilds=frozenset(guilds) if guilds is not None else None,
+        )
+        self.routes.append(route)
+        self._kinds.clear()
+        return route
+
+    def unregister(self, handler: Handler) -> None:
+        self.routes = [route for route in self.routes if route.handler != handler]
+        self._kinds.clear()
+
+    def mentions_me(self, message: Message) -> bool:
+        if message.mention_everyone:
+            return False
+        for user in message.mentions:
+            if user.id == self.user_id:
+                return True
+        return False
+
+    def routes_for(
+        self, is_bot: bool, mentions_me: bool, has_prefix: bool
+    ) -> tuple[Route, ...]:
+        key = (is_bot, mentions_me, has_prefix)
+        routes = self._kinds.get(key)
+        if routes is None:
+            kind = MessageKind(is_bot, mentions_me, has_prefix)
+            routes = self._kinds[key] = tuple(
+                route for route in self.routes if route.wants(kind)
+            )
+        return routes
+
+    async def dispatch(self, message: Message) -> None:
+        author = message.author
+        if author.id == self.user_id:
+            return
+        routes = self.routes_for(
+            author.bot,
+            bool(message.mentions) and self.mentions_me(message),
+            message.content.startswith(self.prefix),
+        )
+        if not routes:
+            return
+        guild_id = message.guild.id if message.guild is not None else None
+        handlers = [route.handler for route in routes if route.in_guild(guild_id)]
+        if not handlers:
+            return
+        if len(handlers) == 1:
+            await self._call(handlers[0], message)
+            return
+        await asyncio.gather(*(self._call(handler, message) for handler in handlers))
+
+    async def _call(self, handler: Handler, message: Message) -> None:
+        try:
+            await handler(message)
+        except Exception as e:
+            self.log.exception(
+                f"Message handler {getattr(handler, '__qualname__', handler)} failed: {e}"
+            )
@@ -0,0 +1,228 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import Counter, OrderedDict, deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from logging import Logger
+from typing import AsyncIterator, Awaitable, Callable, Optional
+
+QueuedHandler = Callable[[int], Awaitable[None]]
+
+
+class QueueFullError(Exception):
+    """
+    Raised when a user already has the maximum number of requests waiting.
+    """
+
+
+class TokenBucket:
+    """
+    Classic token bucket: ``rate`` tokens per second, holding at most
+    ``capacity`` so short bursts are allowed but the long run average is not.
+    """
+
+    def __init__(self, rate: float, capacity: float) -> None:
+        self.rate: float = rate
+        self.capacity: float = capacity
+        self._tokens: float = capacity
+        self._updated: float = time.monotonic()
+
+    @classmethod
+    def per_minute(cls, requests: float, *, burst: float = 1.0) -> TokenBucket:
+        return cls(requests / 60, max(1.0, burst))
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(
+            self.capacity, self._tokens + (now - self._updated) * self.rate
+        )
+        self._updated = now
+
+    async def acquire(self) -> None:
+        while True:
+            self._refill()
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+            await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+@dataclass
+class _Waiter:
+    user_id: int
+    future: asyncio.Future
+    enqueued: float = field(default_factory=time.monotonic)
+
+
+class AIScheduler:
+    """
+    Admission control for upstream AI requests.
+
+    At most ``concurrency`` requests run at once, and at most ``per_user`` of
+    them for the same user. Everything else waits in per-user queues that
+    are served round-robin, so one user spamming requests only delays their
+    own. Before it queues, a request takes a token from the bucket of its
+    ``kind``, keeping the request rate under upstream quotas; a kind that is
+    at its rate limit waits there without holding a concurrency slot, so it
+    never stalls requests of other kinds.
+    """
+
+    def __init__(
+        self,
+        log: Logger,
+        *,
+        concurrency: int = 4,
+        per_user: int = 1,
+        max_queued_per_user: int = 3,
+        limits: Optional[dict[str, TokenBucket]] = None,
+    ) -> None:
+        self.log: Logger = log
+        self.concurrency: int = concurrency
+        self.per_user: int = per_user
+        self.max_queued_per_user: int = max_queued_per_user
+        self.limits: dict[str, TokenBucket] = limits or {}
+        self.served: int = 0
+        self.rejected: int = 0
+        self.waits: deque[float] = deque(maxlen=500)
+        self._running: int = 0
+        self._active: Counter[int] = Counter()
+        self._queues: OrderedDict[int, deque[_Waiter]] = OrderedDict()
+
+    @property
+    def queued(self) -> int:
+        return sum(len(queue) for queue in self._queues.values())
+
+    @property
+    def stats(self) -> dict[str, str]:
+        waits = sorted(self.waits)
+
+        def percentile(p: float) -> str:
+            if not waits:
+                return "-"
+            return f"{waits[min(len(waits) - 1, int(len(waits) * p))]:.2f}s"
+
+        return {
+            "running": str(self._running),
+            "queued": str(self.queued),
+            "served": str(self.served),
+            "rejected": str(self.rejected),
+            "wait p50": percentile(0.5),
+            "wait p95": percentile(0.95),
+            "wait max": f"{waits[-1]:.2f}s" if waits else "-",
+        }
+
+    @asynccontextmanager
+    async def slot(
+        self,
+        user_id: int,
+        kind: str,
+        *,
+        on_queued: Optional[QueuedHandler] = None,
+    ) -> AsyncIterator[None]:
+        """
+        Waits for a turn to run a request of ``kind`` for ``user_id``. When the
+        request has to queue, ``on_queued`` is awaited once with its position.
+        """
+        bucket = self.limits.get(kind)
+        if bucket is not None:
+            self._check_queue(user_id)
+            await bucket.acquire()
+        await self._acquire(user_id, on_queued)
+        try:
+            yield
+        finally:
+            self._release(user_id)
+
+    def position(self, waiter: _Waiter) -> int:
+        """
+        Number of requests served before ``waiter`` under round-robin,
+        counting itself.
+        """
+        index = self._queues[waiter.user_id].index(waiter)
+        ahead = sum(
+            min(len(queue), index + 1)
+            for user_id, queue in self._queues.items()
+            if user_id != waiter.user_id
+        )
+        return ahead + index + 1
+
+    def _can_start(self, user_id: int) -> bool:
+        return (
+            self._running < self.concurrency and self._active[user_id] < self.per_user
+        )
+
+    def _start(self, user_id: int) -> None:
+        self._running += 1
+        self._active[user_id] += 1
+
+    async def _acquire(self, user_id: int, on_queued: Optional[QueuedHandler]) -> None:
+        if user_id not in self._queues and self._can_start(user_id):
+            self._start(user_id)
+            self.served += 1
+            self.waits.append(0.0)
+            return
+
+        self._check_queue(user_id)
+        queue = self._queues.setdefault(user_id, deque())
+        waiter = _Waiter(user_id, asyncio.get_running_loop().create_future())
+        queue.append(waiter)
+        self._dispatch()
+        try:
+            if on_queued is not None and not waiter.future.done():
+                try:
+                    await on_queued(self.position(waiter))
+                except Exception as e:
+                    self.log.warning(f"Queue feedback for {user_id} failed: {e}")
+            await waiter.future
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                self._release(user_id)
+            else:
+                self._discard(waiter)
+            raise
+        self.served += 1
+        self.waits.append(time.monotonic() - waiter.enqueued)
+
+    def _check_queue(self, user_id: int) -> None:
+        queued = len(self._queues.get(user_id, ()))
+        if queued >= self.max_queued_per_user:
+            self.rejected += 1
+            raise QueueFullError(f"User {user_id} already has {queued} requests queued")
+
+    def _discard(self, waiter: _Waiter) -> None:
+        queue = self._queues.get(waiter.user_id)
+        if queue is None:
+            return
+        try:
+            queue.remove(waiter)
+        except ValueError:
+            return
+        if not queue:
+            del self._queues[waiter.user_id]
+
+    def _release(self, user_id: int) -> None:
+        self._running -= 1
+        self._active[user_id] -= 1
+        if self._active[user_id] <= 0:
+            del self._active[user_id]
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        while self._running < self.concurrency and self._queues:
+            user_id = next(
+                (user_id for user_id in self._queues if self._can_start(user_id)),
+                None,
+            )
+            if user_id is None:
+                return
+            queue = self._queues.pop(user_id)
+            waiter = queue.popleft()
+            if queue:
+                # Back of the line, so every other user gets a turn first.
+                self._queues[user_id] = queue
+            if waiter.future.done():
+                continue
+            self._start(user_id)
+            waiter.future.set_result(None)
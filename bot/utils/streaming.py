@@ -0,0 +1,81 @@
+from __future__ import annotations
+
+import time
+from typing import Optional
+
+from discord import Message
+from discord.abc import Messageable
+
+MESSAGE_LIMIT: int = 2000
+
+
+def split_point(text: str, limit: int) -> int:
+    """
+    Returns where to cut ``text`` so the head fits in ``limit`` characters,
+    preferring a line break, then a space, over splitting a word.
+    """
+    for separator in ("\n", " "):
+        index = text.rfind(separator, 0, limit)
+        if index > 0:
+            return index
+    return limit
+
+
+class StreamedReply:
+    """
+    Incrementally posts text that arrives in pieces, such as a streamed chat
+    completion.
+
+    The first piece is sent as soon as it arrives; after that the message is
+    edited at most once every ``interval`` seconds to stay clear of the
+    per-channel edit rate limit. Text that grows past ``limit`` characters is
+    split at a line break or space and continued in a new message.
+    """
+
+    def __init__(
+        self,
+        channel: Messageable,
+        *,
+        interval: float = 1.0,
+        limit: int = MESSAGE_LIMIT,
+    ) -> None:
+        self.channel: Messageable = channel
+        self.interval: float = interval
+        self.limit: int = limit
+        self.messages: list[Message] = []
+        self._message: Optional[Message] = None
+        self._text: str = ""
+        self._buffer: str = ""
+        self._shown: str = ""
+        self._last_edit: float = 0.0
+
+    @property
+    def text(self) -> str:
+        """The full text fed so far, across every message."""
+        return self._text
+
+    async def feed(self, text: str) -> None:
+        self._text += text
+        self._buffer += text
+        while len(self._buffer) > self.limit:
+            cut = split_point(self._buffer, self.limit)
+            head, self._buffer = self._buffer[:cut], self._buffer[cut:].lstrip()
+            await self._show(head)
+            self._message = None
+            self._shown = ""
+        if self._message is None or time.monotonic() - self._last_edit >= self.interval:
+            await self._show(self._buffer)
+
+    async def finish(self) -> None:
+        await self._show(self._buffer)
+
+    async def _show(self, content: str) -> None:
+        if not content.strip() or content == self._shown:
+            return
+        if self._message is None:
+            self._message = await self.channel.send(content)
+            self.messages.append(self._message)
+        else:
+            await self._message.edit(content=content)
+        self._shown = content
+        self._last_edit = time.monotonic()
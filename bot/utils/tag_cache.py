@@ -0,0 +1,202 @@
+from __future__ import annotations
+
+import asyncio
+import random
+from collections import OrderedDict
+from dataclasses import dataclass
+from logging import Logger
+from typing import TYPE_CHECKING, Iterable, Iterator, Optional, Union
+
+from sqlalchemy.exc import DBAPIError
+from utils.fuzzy import TrigramIndex
+
+if TYPE_CHECKING:
+    from models.repositories import TagRepository
+    from models.tags import CustomTags
+    from sqlalchemy import Row
+
+# SQLSTATE Postgres raises for the ``%`` operator and ``similarity()`` when
+# the pg_trgm extension is not installed.
+UNDEFINED_FUNCTION = "42883"
+
+
+@dataclass
+class CachedTag:
+    """
+    A detached, in-memory copy of a tags row.
+    """
+
+    id: int
+    name: str
+    content: str
+    discord_id: str
+    called: int
+    date_added: str
+
+    @classmethod
+    def from_model(cls, tag: Union[CustomTags, Row]) -> CachedTag:
+        return cls(
+            id=tag.id,
+            name=str(tag.name).lower(),
+            content=str(tag.content),
+            discord_id=str(tag.discord_id).strip(),
+            called=int(tag.called or 0),
+            date_added=str(tag.date_added),
+        )
+
+
+class GuildTags:
+    """
+    Every tag of a single guild, keyed by lower-cased name.
+
+    Names are also kept in a flat list (with their positions) so a random tag
+    can be picked, and a tag removed, in constant time.
+    """
+
+    def __init__(self, tags: Iterable[CachedTag] = ()) -> None:
+        self.by_name: dict[str, CachedTag] = {}
+        self.names: list[str] = []
+        self.positions: dict[str, int] = {}
+        self.index: TrigramIndex = TrigramIndex()
+        for tag in tags:
+            self.add(tag)
+
+    def __len__(self) -> int:
+        return len(self.by_name)
+
+    def __iter__(self) -> Iterator[CachedTag]:
+        return iter(self.by_name.values())
+
+    def get(self, name: str) -> Optional[CachedTag]:
+        return self.by_name.get(name.lower())
+
+    def add(self, tag: CachedTag) -> None:
+        if tag.name not in self.positions:
+            self.positions[tag.name] = len(self.names)
+            self.names.append(tag.name)
+        self.by_name[tag.name] = tag
+        self.index.add(tag.name)
+
+    def remove(self, name: str) -> Optional[CachedTag]:
+        name = name.lower()
+        position = self.positions.pop(name, None)
+        if position is not None:
+            last = self.names.pop()
+            if last != name:
+                self.names[position] = last
+                self.positions[last] = position
+        self.index.remove(name)
+        return self.by_name.pop(name, None)
+
+    def random(self) -> Optional[CachedTag]:
+        if not self.names:
+            return None
+        return self.by_name[random.choice(self.names)]
+
+    def similar(self, name: str, *, limit: int = 10) -> list[CachedTag]:
+        return [
+            self.by_name[match] for match, _ in self.index.search(name, limit=limit)
+        ]
+
+
+class TagCache:
+    """
+    Lazily populated per-guild index of tags.
+
+    A guild is loaded from the database the first time it is used and kept
+    coherent afterwards by the write paths of the Tags cog calling ``put``
+    and ``discard``. Lookups that miss the index fall back to the database so
+    rows written outside of this process are still found.
+
+    Similar names are suggested from a per-guild trigram index; only when it
+    has nothing to offer is a guild-scoped pg_trgm query issued.
+    """
+
+    def __init__(
+        self, repository: TagRepository, log: Logger, *, max_guilds: int = 256
+    ) -> None:
+        self.repository: TagRepository = repository
+        self.log: Logger = log
+        self.max_guilds: int = max_guilds
+        self.trigram_search: bool = True
+        self._guilds: OrderedDict[int, GuildTags] = OrderedDict()
+        self._locks: dict[int, asyncio.Lock] = {}
+
+    async def guild(self, guild_id: int) -> GuildTags:
+        tags = self._guilds.get(guild_id)
+        if tags is not None:
+            self._guilds.move_to_end(guild_id)
+            return tags
+
+        lock = self._locks.setdefault(guild_id, asyncio.Lock())
+        async with lock:
+            tags = self._guilds.get(guild_id)
+            if tags is None:
+                tags = await self._load(guild_id)
+                self._guilds[guild_id] = tags
+                while len(self._guilds) > self.max_guilds:
+                    self._guilds.popitem(last=False)
+        self._locks.pop(guild_id, None)
+        return tags
+
+    async def get(self, guild_id: int, name: str) -> Optional[CachedTag]:
+        tags = await self.guild(guild_id)
+        tag = tags.get(name)
+        if tag is None:
+            tag = await self._fetch(guild_id, name)
+            if tag is not None:
+                tags.add(tag)
+        return tag
+
+    async def similar(
+        self, guild_id: int, name: str, *, limit: int = 10
+    ) -> list[CachedTag]:
+        tags = await self.guild(guild_id)
+        matches = tags.similar(name, limit=limit)
+        if not matches:
+            matches = await self._fetch_similar(guild_id, name, limit)
+            for tag in matches:
+                tags.add(tag)
+        return matches
+
+    def put(self, guild_id: int, tag: CachedTag) -> None:
+        tags = self._guilds.get(guild_id)
+        if tags is not None:
+            tags.add(tag)
+
+    def discard(self, guild_id: int, name: str) -> None:
+        tags = self._guilds.get(guild_id)
+        if tags is not None:
+            tags.remove(name)
+
+    def invalidate(self, guild_id: Optional[int] = None) -> None:
+        if guild_id is None:
+            self._guilds.clear()
+        else:
+            self._guilds.pop(guild_id, None)
+
+    async def _load(self, guild_id: int) -> GuildTags:
+        rows = await self.repository.all(guild_id)
+        return GuildTags(CachedTag.from_model(row) for row in rows)
+
+    async def _fetch(self, guild_id: int, name: str) -> Optional[CachedTag]:
+        row = await self.repository.get(guild_id, name)
+        return CachedTag.from_model(row) if row is not None else None
+
+    async def _fetch_similar(
+        self, guild_id: int, name: str, limit: int
+    ) -> list[CachedTag]:
+        """
+        Guild-scoped pg_trgm lookup for rows that are not in the index yet.
+        """
+        if not self.trigram_search:
+            return []
+        try:
+            rows = await self.repository.similar(guild_id, name, limit=limit)
+        except DBAPIError as e:
+            if getattr(e.orig, "sqlstate", None) != UNDEFINED_FUNCTION:
+                raise
+            self.log.warning(f"Disabling database tag similarity search: {e}")
+            self.trigram_search = False
+            return []
+        return [CachedTag.from_model(row) for row in rows]
@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+import asyncio
+from collections import Counter
+from logging import Logger
+from typing import TYPE_CHECKING, Optional
+
+from discord.ext import tasks
+
+if TYPE_CHECKING:
+    from models.repositories import TagRepository
+
+
+class TagCallCounter:
+    """
+    Write-behind aggregator for ``CustomTags.called``.
+
+    Calls are accumulated per tag id in memory and written back in a single
+    ``TagRepository.add_calls`` statement, either every ``interval``
+    seconds or as soon as ``max_pending`` distinct tags are waiting. Deltas
+    from a failed flush are merged back so they are retried on the next one.
+    """
+
+    def __init__(
+        self,
+        repository: TagRepository,
+        log: Logger,
+        *,
+        interval: float = 30.0,
+        max_pending: int = 500,
+    ) -> None:
+        self.repository: TagRepository = repository
+        self.log: Logger = log
+        self.max_pending: int = max_pending
+        self._pending: Counter[int] = Counter()
+        self._lock: asyncio.Lock = asyncio.Lock()
+        self._flush_task: Optional[asyncio.Task] = None
+        self.flush_loop.change_interval(seconds=interval)
+
+    @property
+    def pending(self) -> int:
+        return sum(self._pending.values())
+
+    def start(self) -> None:
+        if not self.flush_loop.is_running():
+            self.flush_loop.start()
+
+    async def close(self) -> None:
+        """
+        Stops the flush loop without interrupting a flush in progress, then
+        writes whatever is still pending.
+        """
+        self.flush_loop.stop()
+        async with self._lock:
+            pass
+        self.flush_loop.cancel()
+        if self._flush_task is not None:
+            await self._flush_task
+        await self.flush()
+
+    def increment(self, tag_id: int, amount: int = 1) -> None:
+        self._pending[tag_id] += amount
+        if len(self._pending) >= self.max_pending and (
+            self._flush_task is None or self._flush_task.done()
+        ):
+            self._flush_task = asyncio.create_task(self.flush())
+
+    async def flush(self) -> int:
+        """
+        Writes every pending delta and returns the number of tags updated.
+        """
+        async with self._lock:
+            if not self._pending:
+                return 0
+            pending, self._pending = self._pending, Counter()
+            try:
+                await self.repository.add_calls(pending)
+            except Exception as e:
+                self._pending.update(pending)
+                self.log.error(f"Could not flush {len(pending)} tag counters: {e}")
+                return 0
+            except BaseException:
+                # Cancelled before the write committed: keep the deltas.
+                self._pending.update(pending)
+                raise
+            return len(pending)
+
+    @tasks.loop(seconds=30)
+    async def flush_loop(self) -> None:
+        await self.flush()
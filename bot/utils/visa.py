@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from io import BytesIO
+
+from PIL import Image, ImageDraw, ImageFont
+
+BLACK = (0, 0, 0)
+PORTRAIT_SIZE = (150, 200)
+
+
+class VisaRenderer:
+    """
+    Renders the welcome "visa" card in a worker thread pool.
+
+    The visa background is composited onto its white canvas once, and every
+    render draws on a fresh copy of that template, so simultaneous joins
+    never share a canvas. The JPEG is encoded into an in-memory buffer that
+    can be handed straight to ``discord.File``.
+    """
+
+    def __init__(self, files_path: str, *, max_workers: int = 2) -> None:
+        self.files_path: str = files_path
+        visa = Image.open(f"{files_path}/visa.jpg")
+        self.template: Image.Image = Image.new("RGB", visa.size, (255, 255, 255))
+        self.template.paste(visa, (0, 0))
+        self.executor: ThreadPoolExecutor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="visa"
+        )
+        # FreeType font objects are not shared between threads.
+        self._fonts: threading.local = threading.local()
+
+    def close(self) -> None:
+        self.executor.shutdown(wait=False)
+
+    def _get_fonts(self) -> tuple[ImageFont.FreeTypeFont, ImageFont.FreeTypeFont]:
+        fonts = getattr(self._fonts, "fonts", None)
+        if fonts is None:
+            font_path = f"{self.files_path}/runescape_uf.ttf"
+            fonts = self._fonts.fonts = (
+                ImageFont.truetype(font_path, size=34),
+                ImageFont.truetype(font_path, size=45),
+            )
+        return fonts
+
+    def _render(
+        self,
+        avatar: bytes,
+        name: str,
+        birthday: str,
+        sex: str,
+        iss: str,
+        expiration: str,
+        number: str,
+    ) -> BytesIO:
+        font, user_font = self._get_fonts()
+        image = self.template.copy()
+        portrait = Image.open(BytesIO(avatar)).convert("RGB")
+        if portrait.size != PORTRAIT_SIZE:
+            portrait = portrait.resize(PORTRAIT_SIZE)
+        draw = ImageDraw.Draw(image)
+        draw.text((115, 525), name, fill=BLACK, font=user_font)
+        draw.text((400, 590), birthday, fill=BLACK, font=font)
+        draw.text((400, 632), sex, fill=BLACK, font=font)
+        draw.text((400, 674), iss, fill=BLACK, font=font)
+        draw.text((400, 713), expiration, fill=BLACK, font=font)
+        draw.text((75, 880), number, fill=(1, 20, 20), font=font)
+        image.paste(portrait, (100, 589))
+        buffer = BytesIO()
+        image.save(buffer, format="JPEG")
+        buffer.seek(0)
+        return buffer
+
+    async def render(
+        self,
+        avatar: bytes,
+        *,
+        name: str,
+        birthday: str,
+        sex: str,
+        iss: str,
+        expiration: str,
+        number: str,
+    ) -> BytesIO:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self.executor,
+            partial(self._render, avatar, name, birthday, sex, iss, expiration, number),
+        )